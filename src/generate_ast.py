@@ -5,8 +5,8 @@ from jinja2 import Template
 
 DIR = Path(__file__).parent
 
-#         (class, [(var_name, var_type)])
-AstNode = Tuple[str, List[Tuple[str, str]]]
+#         (class, [(var_name, var_type[, default])])
+AstNode = Tuple[str, List[Tuple[str, ...]]]
 
 EXPRESSIONS: List[AstNode] = [
     ("Assign", [("name", "Token"), ("value", "Expr")]),
@@ -37,7 +37,15 @@ STATEMENTS: List[AstNode] = [
     ("Print", [("expression", "Expr")]),
     ("Return", [("keyword", "Token"), ("value", "Optional[Expr]")]),
     ("Var", [("name", "Token"), ("intitializer", "Optional[Expr]")]),
-    ("While", [("condition", "Expr"), ("body", "Stmt")]),
+    # keyword is the while or for, for errors at a back-edge
+    (
+        "While",
+        [
+            ("condition", "Expr"),
+            ("body", "Stmt"),
+            ("keyword", "Optional[Token]", "None"),
+        ],
+    ),
 ]
 
 
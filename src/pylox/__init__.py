@@ -1 +1,4 @@
 __version__ = "0.1.0"
+
+from .interpreter import NativeFunction  # noqa: E402,F401
+from .program import CompileError, Program, compile  # noqa: E402,F401
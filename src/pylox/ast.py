@@ -42,12 +42,14 @@ class ExprVisitor(ABC):
 
 
 class Expr(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def accept(self, visitor: ExprVisitor):
         ...
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class AssignExpr(Expr):
     name: Token
     value: Expr
@@ -56,7 +58,7 @@ class AssignExpr(Expr):
         return visitor.visit_assign_expr(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class BinaryExpr(Expr):
     left: Expr
     operator: Any
@@ -66,7 +68,7 @@ class BinaryExpr(Expr):
         return visitor.visit_binary_expr(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class CallExpr(Expr):
     callee: Expr
     paren: Token
@@ -76,7 +78,7 @@ class CallExpr(Expr):
         return visitor.visit_call_expr(self)
 
 
-@dataclass
+@dataclass(frozen=True, eq=False, slots=True)
 class GroupingExpr(Expr):
     expression: Expr
 
@@ -84,7 +86,7 @@ class GroupingExpr(Expr):
         return visitor.visit_grouping_expr(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class LiteralExpr(Expr):
     value: Any
 
@@ -92,7 +94,7 @@ class LiteralExpr(Expr):
         return visitor.visit_literal_expr(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class LogicalExpr(Expr):
     left: Expr
     operator: Token
@@ -102,7 +104,7 @@ class LogicalExpr(Expr):
         return visitor.visit_logical_expr(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class UnaryExpr(Expr):
     operator: Token
     right: Expr
@@ -111,7 +113,7 @@ class UnaryExpr(Expr):
         return visitor.visit_unary_expr(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class VariableExpr(Expr):
     name: Token
 
@@ -154,12 +156,14 @@ class StmtVisitor(ABC):
 
 
 class Stmt(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def accept(self, visitor: StmtVisitor):
         ...
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class BlockStmt(Stmt):
     statements: List[Stmt]
 
@@ -167,7 +171,7 @@ class BlockStmt(Stmt):
         return visitor.visit_block_stmt(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class ExpressionStmt(Stmt):
     expression: Expr
 
@@ -175,7 +179,7 @@ class ExpressionStmt(Stmt):
         return visitor.visit_expression_stmt(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class FunctionStmt(Stmt):
     name: Token
     params: List[Token]
@@ -185,7 +189,7 @@ class FunctionStmt(Stmt):
         return visitor.visit_function_stmt(self)
 
 
-@dataclass
+@dataclass(frozen=True, eq=False, slots=True)
 class IfStmt(Stmt):
     condition: Expr
     then_branch: Stmt
@@ -195,7 +199,7 @@ class IfStmt(Stmt):
         return visitor.visit_if_stmt(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class PrintStmt(Stmt):
     expression: Expr
 
@@ -203,7 +207,7 @@ class PrintStmt(Stmt):
         return visitor.visit_print_stmt(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class ReturnStmt(Stmt):
     keyword: Token
     value: Optional[Expr]
@@ -212,7 +216,7 @@ class ReturnStmt(Stmt):
         return visitor.visit_return_stmt(self)
 
 
-@dataclass
+@dataclass(frozen=True, eq=False, slots=True)
 class VarStmt(Stmt):
     name: Token
     intitializer: Optional[Expr]
@@ -221,10 +225,11 @@ class VarStmt(Stmt):
         return visitor.visit_var_stmt(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class WhileStmt(Stmt):
     condition: Expr
     body: Stmt
+    keyword: Optional[Token] = None
 
     def accept(self, visitor: StmtVisitor):
         return visitor.visit_while_stmt(self)
@@ -0,0 +1,157 @@
+import glob
+import os
+import traceback
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from io import StringIO
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from .cache import CACHE_DIR, ProgramCache
+from .exceptions import ParseError
+from .limits import Limits
+from .lox import Lox
+
+# Exit statuses, from sysexits.h, as for a single script
+EX_OK = 0
+EX_DATAERR = 65  # syntax or resolution error
+EX_NOINPUT = 66  # couldn't read the script
+EX_SOFTWARE = 70  # runtime error, or a bug in pylox
+
+# Scripts handed to a worker at a time, per worker, so thousands of small
+# scripts don't each cost a round trip to the pool. Fewer than this per worker
+# would leave some workers idle while others still have a queue.
+CHUNKS_PER_WORKER = 4
+
+
+@dataclass
+class Options:
+    engine: str = "tree"
+    optimize: bool = False
+    cache_dir: Optional[str] = None
+    no_cache: bool = False
+    max_depth: Optional[int] = None
+    memo_size: Optional[int] = 0
+    memo_policy: str = "lru"
+    # Limits, given to each script afresh
+    max_steps: Optional[int] = None
+    timeout: Optional[float] = None
+    max_values: Optional[int] = None
+    max_string_length: Optional[int] = None
+
+    def limits(self) -> Optional[Limits]:
+        bounds = (self.max_steps, self.timeout, self.max_values, self.max_string_length)
+        if all(bound is None for bound in bounds):
+            return None
+        return Limits(*bounds)
+
+
+@dataclass
+class Result:
+    path: Path
+    status: int
+    out: str
+    err: str
+
+
+def expand(patterns: List[str]) -> List[Path]:
+    # The scripts named by each of patterns, in the order given: a file, every
+    # .lox file under a directory, or the files matching a glob (for when
+    # there are too many scripts to pass on a command line). Directories and
+    # globs are sorted, and a script named twice runs once. A directory or
+    # glob with no scripts stays in as it is, for run_script to report.
+    paths: List[Path] = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            found = sorted(path.rglob("*.lox"))
+        elif not path.exists() and glob.has_magic(pattern):
+            found = sorted(Path(match) for match in glob.glob(pattern, recursive=True))
+        else:
+            found = [path]
+        paths.extend(found or [path])
+    return list(dict.fromkeys(paths))
+
+
+def run_script(path: Path, options: Options) -> Result:
+    # Runs one script in a Lox of its own, capturing its output
+    out, err = StringIO(), StringIO()
+    if path.is_dir():
+        return Result(path, EX_NOINPUT, "", f"No .lox scripts in {path}.\n")
+    if not path.exists() and glob.has_magic(str(path)):
+        return Result(path, EX_NOINPUT, "", f"No scripts match {path}.\n")
+    try:
+        source = path.read_text()
+    except OSError as error:
+        return Result(path, EX_NOINPUT, "", f"{error}\n")
+
+    cache = None
+    if not options.no_cache:
+        cache = ProgramCache(options.cache_dir or path.parent / CACHE_DIR)
+    lox = Lox(
+        out=out, err=err, engine=options.engine, optimize=options.optimize, cache=cache
+    )
+    if options.max_depth is not None:
+        lox.interpreter.max_depth = options.max_depth
+    lox.interpreter.memo_size = options.memo_size
+    lox.interpreter.memo_policy = options.memo_policy
+    lox.interpreter.limits = options.limits()
+
+    try:
+        lox.run(source)
+    except ParseError:
+        # Already reported, and had_error set
+        pass
+    except Exception:
+        # One broken script mustn't take the rest of the batch down with it
+        print(traceback.format_exc(), end="", file=err)
+        return Result(path, EX_SOFTWARE, out.getvalue(), err.getvalue())
+
+    status = EX_OK
+    if lox.had_error:
+        status = EX_DATAERR
+    elif lox.had_runtime_error:
+        status = EX_SOFTWARE
+    return Result(path, status, out.getvalue(), err.getvalue())
+
+
+def run_batch(
+    paths: List[Path], options: Options, jobs: Optional[int] = None
+) -> Iterator[Result]:
+    # Runs each script, spread over jobs worker processes (default: one per
+    # CPU), yielding results in the order of paths as soon as each is ready
+    jobs = jobs or os.cpu_count() or 1
+    run = partial(run_script, options=options)
+    if jobs == 1 or len(paths) <= 1:
+        yield from map(run, paths)
+        return
+
+    jobs = min(jobs, len(paths))
+    chunksize = max(1, len(paths) // (jobs * CHUNKS_PER_WORKER))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(run, paths, chunksize=chunksize)
+
+
+def summarize(results: List[Result]) -> str:
+    # A count of each outcome, then the scripts which failed
+    statuses = Counter(result.status for result in results)
+    summary = (
+        f"{len(results)} scripts: {statuses[EX_OK]} passed, "
+        f"{statuses[EX_DATAERR]} with errors ({EX_DATAERR}), "
+        f"{statuses[EX_SOFTWARE]} with runtime errors ({EX_SOFTWARE})"
+    )
+    if statuses[EX_NOINPUT]:
+        summary += f", {statuses[EX_NOINPUT]} unreadable ({EX_NOINPUT})"
+
+    lines = [summary]
+    lines.extend(
+        f"  {result.status} {result.path}" for result in results if result.status
+    )
+    return "\n".join(lines)
+
+
+def status_of(results: List[Result]) -> int:
+    # The batch fails with the most serious status of any script
+    return max((result.status for result in results), default=EX_OK)
@@ -0,0 +1,165 @@
+import json
+import math
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+from io import StringIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from .. import __version__
+from ..lox import Lox
+
+# The benchmark scripts, each a classic Lox workload, live beside this module
+SUITE = Path(__file__).parent
+
+WARMUP = 1
+REPEAT = 5
+
+# A slowdown only counts as a regression if it is at least this big, and
+# unlikely to be chance
+THRESHOLD = 0.05
+SIGNIFICANCE = 0.05
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def benchmarks() -> Dict[str, Path]:
+    return {path.stem: path for path in sorted(SUITE.glob("*.lox"))}
+
+
+def time_run(source: str, engine: str) -> float:
+    # Seconds to scan, parse, resolve and run the source once, in a fresh Lox
+    lox = Lox(out=StringIO(), err=StringIO(), engine=engine)
+
+    start = time.perf_counter()
+    lox.run(source)
+    elapsed = time.perf_counter() - start
+
+    if lox.had_error or lox.had_runtime_error:
+        raise BenchmarkError(lox.err.getvalue().strip())
+    return elapsed
+
+
+def measure(
+    source: str, engine: str, warmup: int = WARMUP, repeat: int = REPEAT
+) -> Dict[str, Any]:
+    for _ in range(warmup):
+        time_run(source, engine)
+    times = [time_run(source, engine) for _ in range(repeat)]
+    return summarize(times)
+
+
+def summarize(times: List[float]) -> Dict[str, Any]:
+    return {
+        "times": times,
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def run_suite(
+    engines: List[str],
+    names: Optional[List[str]] = None,
+    warmup: int = WARMUP,
+    repeat: int = REPEAT,
+    progress=None,
+) -> Dict[str, Any]:
+    suite = benchmarks()
+    for name in names or []:
+        if name not in suite:
+            raise BenchmarkError(f"No benchmark named '{name}'.")
+
+    results: Dict[str, Any] = {}
+    for name in names or suite:
+        source = suite[name].read_text()
+        for engine in engines:
+            key = f"{name}/{engine}"
+            results[key] = measure(source, engine, warmup, repeat)
+            if progress is not None:
+                progress(key, results[key])
+
+    return {
+        "pylox": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "warmup": warmup,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def save(report: Dict[str, Any], path: Union[str, Path]) -> None:
+    Path(path).write_text(json.dumps(report, indent=2) + "\n")
+
+
+def load(path: Union[str, Path]) -> Dict[str, Any]:
+    return json.loads(Path(path).read_text())
+
+
+def slower_probability(base: List[float], new: List[float]) -> float:
+    # One-sided Mann-Whitney U test: the chance of new's times ranking at least
+    # this far above base's if both came from the same distribution. It makes
+    # no assumption about the shape of the distribution, which timings, with
+    # their long tail of slow runs, rarely fit. Uses the normal approximation,
+    # with a correction for ties.
+    n1, n2 = len(base), len(new)
+    ranked = sorted([(time, 0) for time in base] + [(time, 1) for time in new])
+
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tied = j - i + 1
+        ties += tied**3 - tied
+        i = j + 1
+
+    rank_sum = sum(rank for rank, (_, sample) in zip(ranks, ranked) if sample)
+    u = rank_sum - n2 * (n2 + 1) / 2
+    mean = n1 * n2 / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+
+    z = (u - mean - 0.5) / math.sqrt(variance)  # with continuity correction
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(
+    base: Dict[str, Any],
+    new: Dict[str, Any],
+    threshold: float = THRESHOLD,
+    significance: float = SIGNIFICANCE,
+) -> List[Dict[str, Any]]:
+    # One row per benchmark run in both reports
+    rows = []
+    for key, result in new["results"].items():
+        if key not in base["results"]:
+            continue
+        before = base["results"][key]
+        change = result["median"] / before["median"] - 1
+        p = slower_probability(before["times"], result["times"])
+        rows.append(
+            {
+                "benchmark": key,
+                "base": before["median"],
+                "new": result["median"],
+                "change": change,
+                "p": p,
+                "regression": change >= threshold and p < significance,
+            }
+        )
+    return rows
@@ -0,0 +1,113 @@
+import argparse
+import sys
+from typing import Any, Dict
+
+from ..lox import ENGINES
+from . import (
+    REPEAT,
+    SIGNIFICANCE,
+    THRESHOLD,
+    WARMUP,
+    BenchmarkError,
+    benchmarks,
+    compare,
+    load,
+    run_suite,
+    save,
+)
+
+
+def print_result(key: str, result: Dict[str, Any]) -> None:
+    spread = 100 * result["stdev"] / result["median"] if result["median"] else 0.0
+    print(f"{key:<24} {result['median']:9.4f}s ±{spread:5.1f}%", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="pylox-bench", description="Run and compare the pylox benchmarks."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="list the benchmarks")
+
+    run = commands.add_parser("run", help="run benchmarks, and report the timings")
+    run.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    run.add_argument(
+        "-e",
+        "--engine",
+        action="append",
+        choices=ENGINES,
+        help="engine to run them with; may be repeated (default: tree)",
+    )
+    run.add_argument(
+        "--warmup",
+        type=int,
+        default=WARMUP,
+        help=f"untimed runs of each before timing (default: {WARMUP})",
+    )
+    run.add_argument(
+        "--repeat",
+        type=int,
+        default=REPEAT,
+        help=f"timed runs of each (default: {REPEAT})",
+    )
+    run.add_argument("-o", "--output", help="write the results to this JSON file")
+
+    compare_ = commands.add_parser(
+        "compare", help="compare two results files, and flag regressions"
+    )
+    compare_.add_argument("base", help="results to compare against")
+    compare_.add_argument("new", help="results to check for regressions")
+    compare_.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help=f"smallest slowdown that counts, as a fraction (default: {THRESHOLD})",
+    )
+    compare_.add_argument(
+        "--significance",
+        type=float,
+        default=SIGNIFICANCE,
+        help="largest chance of the slowdown being noise that still counts "
+        f"(default: {SIGNIFICANCE})",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, path in benchmarks().items():
+            print(f"{name:<12} {path.read_text().splitlines()[0].lstrip('/ ')}")
+
+    elif args.command == "run":
+        if args.repeat < 2:
+            parser.error("--repeat must be at least 2, to measure spread")
+        try:
+            report = run_suite(
+                args.engine or ["tree"],
+                args.names,
+                args.warmup,
+                args.repeat,
+                progress=print_result,
+            )
+        except BenchmarkError as error:
+            print(f"Benchmark failed: {error}", file=sys.stderr)
+            sys.exit(1)
+        if args.output:
+            save(report, args.output)
+
+    else:
+        rows = compare(
+            load(args.base), load(args.new), args.threshold, args.significance
+        )
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(
+                f"{row['benchmark']:<24} {row['base']:9.4f}s -> {row['new']:9.4f}s"
+                f" {100 * row['change']:+6.1f}%  p={row['p']:.3f}  {flag}".rstrip()
+            )
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import struct
+from array import array
+from enum import IntEnum
+from io import StringIO
+from typing import Any, Dict, List, Tuple
+
+from .token import Token
+
+
+class OpCode(IntEnum):
+    CONSTANT = 0
+    NIL = 1
+    TRUE = 2
+    FALSE = 3
+    POP = 4
+
+    GET_LOCAL = 5
+    SET_LOCAL = 6
+    DEFINE_LOCAL = 7
+    GET_GLOBAL = 8
+    SET_GLOBAL = 9
+    DEFINE_GLOBAL = 10
+    PUSH_SCOPE = 11
+    POP_SCOPE = 12
+
+    EQUAL = 13
+    NOT_EQUAL = 14
+    GREATER = 15
+    GREATER_EQUAL = 16
+    LESS = 17
+    LESS_EQUAL = 18
+    ADD = 19
+    SUBTRACT = 20
+    MULTIPLY = 21
+    DIVIDE = 22
+    NOT = 23
+    NEGATE = 24
+
+    PRINT = 25
+    JUMP = 26
+    JUMP_IF_FALSE = 27
+    LOOP = 28
+    CALL = 29
+    CLOSURE = 30
+    RETURN = 31
+    COUNT = 32  # a statement run, only compiled in when timed
+
+
+# Number of operands following each opcode in the instruction stream
+OPERANDS = {
+    OpCode.CONSTANT: 1,  # constant
+    OpCode.GET_LOCAL: 3,  # depth, slot, name constant
+    OpCode.SET_LOCAL: 2,  # depth, slot
+    OpCode.DEFINE_LOCAL: 1,  # slot
+    OpCode.GET_GLOBAL: 1,  # GlobalSite constant
+    OpCode.SET_GLOBAL: 1,  # name constant
+    OpCode.DEFINE_GLOBAL: 1,  # name constant
+    OpCode.PUSH_SCOPE: 1,  # size
+    OpCode.GREATER: 1,  # operator constant, for error reporting
+    OpCode.GREATER_EQUAL: 1,
+    OpCode.LESS: 1,
+    OpCode.LESS_EQUAL: 1,
+    OpCode.ADD: 1,
+    OpCode.SUBTRACT: 1,
+    OpCode.MULTIPLY: 1,
+    OpCode.DIVIDE: 1,
+    OpCode.JUMP: 1,  # target offset
+    OpCode.JUMP_IF_FALSE: 1,
+    OpCode.LOOP: 2,  # target offset, while or for keyword constant
+    OpCode.CALL: 2,  # argument count, paren constant
+    OpCode.CLOSURE: 1,  # function constant
+}
+
+
+class GlobalSite:
+    # The inline cache of one global variable read in the bytecode: the value
+    # it last read, and the version of the globals it read it at. While the
+    # globals are unchanged, the read is one comparison and a load.
+    __slots__ = ("name", "version", "value")
+
+    def __init__(self, name: Token):
+        self.name = name
+        self.version = -1
+        self.value: Any = None
+
+    def __repr__(self):
+        return f"<global {self.name.lexeme}>"
+
+
+class Chunk:
+    # Compiled bytecode for one function, or the top-level script. Opcodes and
+    # their operands share one flat array of unsigned ints; everything else an
+    # instruction refers to lives in the constant pool.
+    def __init__(self, name: str, arity: int = 0, size: int = 0):
+        self.name = name
+        self.arity = arity
+        self.size = size  # number of local slots, including parameters
+        self.code = array("I")
+        self.lines = array("I")  # source line of each word in code
+        self.constants: List[Any] = []
+        self.literals: Dict[Tuple[type, Any], int] = {}
+
+    def write(self, word: int, line: int) -> int:
+        self.code.append(word)
+        self.lines.append(line)
+        return len(self.code) - 1
+
+    def add_constant(self, value: Any) -> int:
+        # Literals are deduplicated, keyed on type too so that, for example,
+        # 1, 1.0 and true stay distinct. Floats are keyed on their bits, as
+        # -0.0 == 0.0. Tokens, functions and call sites never are.
+        key = None
+        if isinstance(value, float):
+            key = (float, struct.pack("d", value))
+        elif not isinstance(value, (Token, Chunk, GlobalSite)):
+            key = (type(value), value)
+        if key is not None and key in self.literals:
+            return self.literals[key]
+
+        self.constants.append(value)
+        index = len(self.constants) - 1
+        if key is not None:
+            self.literals[key] = index
+        return index
+
+    def __repr__(self):
+        return f"<chunk {self.name}>"
+
+
+def disassemble(chunk: Chunk) -> str:
+    buffer = StringIO()
+    chunks = [chunk]
+
+    while chunks:
+        chunk = chunks.pop(0)
+        buffer.write(f"== {chunk.name} ==\n")
+
+        offset = 0
+        while offset < len(chunk.code):
+            offset = disassemble_instruction(chunk, offset, buffer)
+
+        chunks.extend(c for c in chunk.constants if isinstance(c, Chunk))
+
+    return buffer.getvalue()
+
+
+def disassemble_instruction(chunk: Chunk, offset: int, buffer: StringIO) -> int:
+    op = OpCode(chunk.code[offset])
+    operands = list(chunk.code[offset + 1 : offset + 1 + OPERANDS.get(op, 0)])
+
+    if offset > 0 and chunk.lines[offset] == chunk.lines[offset - 1]:
+        line = "   |"
+    else:
+        line = f"{chunk.lines[offset]:4d}"
+
+    text = f"{offset:04d} {line} {op.name:<16}"
+    text += " ".join(str(operand) for operand in operands)
+
+    match op:
+        case OpCode.CONSTANT | OpCode.CLOSURE:
+            text += f" ({describe(chunk.constants[operands[0]])})"
+        case OpCode.GET_GLOBAL | OpCode.SET_GLOBAL | OpCode.DEFINE_GLOBAL:
+            text += f" ({describe(chunk.constants[operands[0]])})"
+        case OpCode.GET_LOCAL:
+            text += f" ({describe(chunk.constants[operands[2]])})"
+
+    buffer.write(text.rstrip() + "\n")
+    return offset + 1 + len(operands)
+
+
+def describe(constant: Any) -> str:
+    if isinstance(constant, Token):
+        return constant.lexeme
+    if isinstance(constant, GlobalSite):
+        return constant.name.lexeme
+    if isinstance(constant, str):
+        return f'"{constant}"'
+    return repr(constant)
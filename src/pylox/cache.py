@@ -0,0 +1,172 @@
+import hashlib
+import marshal
+import os
+import zlib
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from . import __version__, ast
+from .token import TOKEN_TYPES, TYPE_INDEX, Token
+
+MAGIC = b"LOXAST"
+
+# Layout of a cached program. Bump it whenever a node gains, loses or
+# reorders a field, so entries from before the change aren't loaded into the
+# wrong fields, even by a build with the same version.
+FORMAT = 2  # 2: WhileStmt.keyword
+
+# Every node class, in a fixed order, so a node can be stored as its index
+NODES = sorted(
+    (
+        cls
+        for base in (ast.Expr, ast.Stmt)
+        for cls in vars(ast).values()
+        if isinstance(cls, type) and issubclass(cls, base) and cls is not base
+    ),
+    key=lambda cls: cls.__name__,
+)
+NODE_INDEX = {cls: index for index, cls in enumerate(NODES)}
+
+TOKEN = -1
+
+# Cache directory used next to a script, like __pycache__
+CACHE_DIR = "__loxcache__"
+MAX_SIZE = 16 * 1024 * 1024
+
+
+def dumps(statements: List[ast.Stmt]) -> bytes:
+    # Nodes become tuples of their class index and fields, and tokens tuples
+    # tagged with TOKEN, which marshal can store and load quickly without
+    # running any code. The fastest zlib level still shrinks it several times.
+    data = marshal.dumps((__version__, FORMAT, encode(statements, {})))
+    return MAGIC + zlib.compress(data, 1)
+
+
+def loads(data: bytes) -> List[ast.Stmt]:
+    if not data.startswith(MAGIC):
+        raise ValueError("Not a cached Lox program.")
+
+    version, layout, statements = marshal.loads(zlib.decompress(data[len(MAGIC) :]))
+    if version != __version__ or layout != FORMAT:
+        raise ValueError("Cached Lox program is from another version.")
+
+    return decode(statements)
+
+
+def encode(value: Any, tokens: Dict[int, tuple]) -> Any:
+    if isinstance(value, list):
+        return [encode(item, tokens) for item in value]
+    if isinstance(value, Token):
+        # A token shared by several nodes is written once, and referred to
+        token = tokens.get(id(value))
+        if token is None:
+            token = tokens[id(value)] = (
+                TOKEN,
+                TYPE_INDEX[value.type],
+                value.lexeme,
+                value.literal,
+                value.line,
+            )
+        return token
+    if isinstance(value, (ast.Expr, ast.Stmt)):
+        return (NODE_INDEX[type(value)],) + tuple(
+            encode(getattr(value, field.name), tokens) for field in fields(value)
+        )
+    # A literal value
+    return value
+
+
+def decode(statements: List[Any]) -> List[ast.Stmt]:
+    tokens: Dict[int, Token] = {}
+
+    def load(value: Any) -> Any:
+        kind = type(value)
+        if kind is tuple:
+            tag = value[0]
+            if tag != TOKEN:
+                return NODES[tag](*map(load, value[1:]))
+
+            token = tokens.get(id(value))
+            if token is None:
+                _, type_, lexeme, literal, line = value
+                token = tokens[id(value)] = Token(
+                    TOKEN_TYPES[type_], lexeme, literal, line
+                )
+            return token
+        if kind is list:
+            return list(map(load, value))
+        # A literal value
+        return value
+
+    return load(statements)
+
+
+class ProgramCache:
+    # Keeps parsed programs on disk, keyed by a hash of their source, the
+    # pylox version and FORMAT, and whether they were optimized. A changed
+    # script or a new pylox gets a new key, and entries which haven't been used
+    # for the longest are evicted once the directory grows past max_size bytes.
+
+    SUFFIX = ".loxc"
+
+    def __init__(self, directory: Union[str, Path], max_size: int = MAX_SIZE):
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def path(self, source: str, optimized: bool) -> Path:
+        key = hashlib.sha256(
+            f"{__version__}\0{FORMAT}\0{optimized:d}\0{source}".encode()
+        ).hexdigest()
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    def load(self, source: str, optimized: bool) -> Optional[List[ast.Stmt]]:
+        path = self.path(source, optimized)
+        try:
+            statements = loads(path.read_bytes())
+        except OSError:
+            return None
+        except (ValueError, EOFError, TypeError, IndexError, zlib.error):
+            # Corrupt, or from another version
+            path.unlink(missing_ok=True)
+            return None
+
+        # Mark as recently used, unless another run has just evicted it
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return statements
+
+    def store(self, source: str, optimized: bool, statements: List[ast.Stmt]):
+        path = self.path(source, optimized)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so other runs never see half a file
+            temporary = path.with_suffix(f".{os.getpid()}.tmp")
+            temporary.write_bytes(dumps(statements))
+            os.replace(temporary, path)
+            self.evict()
+        except OSError:
+            # Caching is only an optimization
+            pass
+
+    def evict(self) -> None:
+        entries = []
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            try:
+                entries.append((path.stat(), path))
+            except FileNotFoundError:
+                continue
+
+        size = sum(stat.st_size for stat, _ in entries)
+        entries.sort(key=lambda entry: entry[0].st_mtime)
+        for stat, path in entries:
+            if size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            size -= stat.st_size
+
+    def clear(self) -> None:
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            path.unlink(missing_ok=True)
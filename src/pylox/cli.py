@@ -1,23 +1,291 @@
 import argparse
+import glob
+import sys
+from pathlib import Path
+from typing import List
 
-from .lox import Lox
+from .batch import Options, expand, run_batch, status_of, summarize
+from .cache import CACHE_DIR, ProgramCache
+from .limits import MAX_STRING_LENGTH, Limits
+from .lox import ENGINES, Lox
+from .memo import POLICIES
+from .profiler import MODES, Profiler
+from .vm import FRAMES_MAX
+
+# Default number of results kept per pure function, with --memoize
+MEMO_SIZE = 1024
+
+
+def print_memo_stats(interpreter) -> None:
+    for stats in interpreter.memo_stats():
+        print(
+            "{function}: {hits} hits, {misses} misses, {evictions} evictions, "
+            "{size} results".format(**stats),
+            file=sys.stderr,
+        )
+
+
+def is_batch(files: List[str]) -> bool:
+    # Whether files name more than a single script
+    if len(files) != 1:
+        return len(files) > 1
+    path = Path(files[0])
+    return path.is_dir() or (not path.exists() and glob.has_magic(files[0]))
+
+
+def memo_size(args) -> int:
+    # Results kept per function, or 0 for no memoization
+    if not args.memoize:
+        return 0
+    return MEMO_SIZE if args.memo_size is None else args.memo_size
+
+
+def run_scripts(args) -> int:
+    options = Options(
+        engine=args.engine,
+        optimize=args.optimize,
+        cache_dir=args.cache_dir,
+        no_cache=args.no_cache,
+        max_depth=args.max_depth,
+        memo_size=memo_size(args),
+        memo_policy=args.memo_policy,
+        max_steps=args.max_steps,
+        timeout=args.timeout,
+        max_values=args.max_values,
+        max_string_length=args.max_string_length,
+    )
+
+    results = []
+    for result in run_batch(expand(args.files), options, args.jobs):
+        # Each script's output together, in the order the scripts were named
+        if result.out:
+            print(f"==> {result.path} <==\n{result.out}", end="", flush=True)
+        if result.err:
+            print(f"==> {result.path} <==\n{result.err}", end="", file=sys.stderr)
+        results.append(result)
+
+    print(summarize(results), file=sys.stderr)
+    return status_of(results)
 
 
 def main():
     parser = argparse.ArgumentParser()
 
-    parser.add_argument("file", default=None, nargs="?")
+    parser.add_argument(
+        "files",
+        nargs="*",
+        metavar="file",
+        help="script to run, or with more than one, a directory of scripts, or "
+        "a glob, run them all and summarize (default: start a prompt)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        metavar="N",
+        help="run scripts in N processes at once (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="tree",
+        help="execution engine (default: tree)",
+    )
+    parser.add_argument(
+        "-O",
+        "--optimize",
+        action="store_true",
+        help="fold constant expressions and remove dead code before running",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="run each top-level declaration as soon as it is parsed",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help=f"where to cache parsed scripts (default: {CACHE_DIR} beside the script)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always scan and parse the script, without reading or writing the cache",
+    )
+    parser.add_argument(
+        "--disassemble",
+        action="store_true",
+        help="print the compiled bytecode to stderr before running (vm engine only)",
+    )
+
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        help=f"maximum depth of Lox calls (vm engine only, default: {FRAMES_MAX})",
+    )
+
+    parser.add_argument(
+        "--memoize",
+        action="store_true",
+        help="cache the results of pure functions (tree engine only)",
+    )
+    parser.add_argument(
+        "--memo-size",
+        type=int,
+        metavar="N",
+        help=f"with --memoize, keep N results per function (default: {MEMO_SIZE})",
+    )
+    parser.add_argument(
+        "--memo-policy",
+        choices=POLICIES,
+        default="lru",
+        help="which result to evict from a full cache (default: lru)",
+    )
+    parser.add_argument(
+        "--memo-stats",
+        action="store_true",
+        help="print each memoized function's cache statistics to stderr",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="report where time goes, by Lox function and line, to stderr "
+        "(tree engine only)",
+    )
+    parser.add_argument(
+        "--profile-mode",
+        choices=MODES,
+        help="with --profile, sample or time exactly (default: sampling)",
+    )
+    parser.add_argument(
+        "--profile-stacks",
+        metavar="PATH",
+        help="with --profile, also write collapsed stacks for flame graph tools",
+    )
+
+    parser.add_argument(
+        "--max-steps",
+        type=int,
+        metavar="N",
+        help="stop the script after N loop iterations and calls",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        metavar="SECONDS",
+        help="stop the script after SECONDS of wall clock time",
+    )
+    parser.add_argument(
+        "--max-values",
+        type=int,
+        metavar="N",
+        help="stop the script once it holds N more live values than it started with",
+    )
+    parser.add_argument(
+        "--max-string-length",
+        type=int,
+        metavar="N",
+        help="stop the script before it builds a string longer than N characters "
+        f"(default, if any other limit is set: {MAX_STRING_LENGTH})",
+    )
+
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="report the time spent in each phase, and sizes, as JSON to stderr",
+    )
+    parser.add_argument(
+        "--timings-output",
+        metavar="PATH",
+        help="with --timings, write the report to PATH instead",
+    )
 
     args = parser.parse_args()
 
-    lox = Lox()
-    if args.file:
-        lox.run_file(args.file)
-    else:
-        try:
-            lox.run_prompt()
-        except KeyboardInterrupt:
-            print("")
+    if args.disassemble and args.engine != "vm":
+        parser.error("--disassemble requires --engine=vm")
+    if args.max_depth is not None and args.engine != "vm":
+        parser.error("--max-depth requires --engine=vm")
+    if args.memoize and args.engine != "tree":
+        parser.error("--memoize requires --engine=tree")
+    if args.memo_size is not None and not args.memoize:
+        parser.error("--memo-size requires --memoize")
+    if args.memo_size is not None and args.memo_size < 1:
+        parser.error("--memo-size N must be at least 1")
+    if args.profile and args.engine != "tree":
+        parser.error("--profile requires --engine=tree")
+    if args.profile_mode is not None and not args.profile:
+        parser.error("--profile-mode requires --profile")
+    if args.profile_stacks is not None and not args.profile:
+        parser.error("--profile-stacks requires --profile")
+    if args.timings_output is not None and not args.timings:
+        parser.error("--timings-output requires --timings")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs N must be at least 1")
+    if args.jobs is not None and not args.files:
+        parser.error("--jobs requires scripts to run")
+    for option in ("max_steps", "timeout", "max_values", "max_string_length"):
+        if getattr(args, option) is not None and getattr(args, option) < 0:
+            parser.error(f"--{option.replace('_', '-')} can't be negative")
+
+    if args.jobs is not None or is_batch(args.files):
+        for option in ("stream", "disassemble", "memo_stats", "profile", "timings"):
+            if getattr(args, option):
+                flag = option.replace("_", "-")
+                parser.error(f"--{flag} can't be used with more than one script")
+        sys.exit(run_scripts(args))
+    file = args.files[0] if args.files else None
+
+    cache = None
+    if file and not args.no_cache and not args.stream:
+        cache = ProgramCache(args.cache_dir or Path(file).parent / CACHE_DIR)
+
+    lox = Lox(
+        engine=args.engine,
+        optimize=args.optimize,
+        cache=cache,
+        timings=args.timings,
+    )
+    profiler = None
+    if args.profile:
+        # First, since it may replace the interpreter
+        profiler = Profiler(args.profile_mode or "sampling")
+        profiler.attach(lox)
+    if args.disassemble:
+        lox.interpreter.disassemble_to = sys.stderr
+    if args.max_depth is not None:
+        lox.interpreter.max_depth = args.max_depth
+    if args.memoize:
+        lox.interpreter.memo_size = memo_size(args)
+        lox.interpreter.memo_policy = args.memo_policy
+    bounds = (args.max_steps, args.timeout, args.max_values, args.max_string_length)
+    if any(bound is not None for bound in bounds):
+        # Last, since the clock starts now
+        lox.interpreter.limits = Limits(*bounds)
+
+    try:
+        if profiler is not None and file:
+            with profiler:
+                lox.run_file(file, stream=args.stream)
+        elif file:
+            lox.run_file(file, stream=args.stream)
+        else:
+            try:
+                lox.run_prompt()
+            except KeyboardInterrupt:
+                print("")
+    finally:
+        if args.memo_stats:
+            print_memo_stats(lox.interpreter)
+        if profiler is not None:
+            print(profiler.report(), end="", file=sys.stderr)
+            if args.profile_stacks:
+                Path(args.profile_stacks).write_text(profiler.collapsed())
+        if lox.timings is not None:
+            if args.timings_output:
+                Path(args.timings_output).write_text(lox.timings.to_json() + "\n")
+            else:
+                print(lox.timings.to_json(), file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,538 @@
+import sys
+from typing import Any
+from typing import Callable as PyCallable
+from typing import List, Optional, Tuple
+
+from . import ast
+from .environment import UNDEFINED, AnyEnvironment, CompactEnvironment
+from .exceptions import LoxRuntimeError
+from .interpreter import (
+    AsyncCallError,
+    Callable,
+    Function,
+    Interpreter,
+    LoxDivisionByZero,
+)
+from .token import Token
+from .token import TokenType as T
+
+# Compiled expressions take the current environment and return a value.
+# Compiled statements take the current environment and return None, unless a
+# return statement was executed, in which case they return a 1-tuple holding
+# the returned value, so that it can be told apart from returning nil.
+ExprFn = PyCallable[[Any], Any]
+StmtFn = PyCallable[[Any], Optional[Tuple[Any]]]
+
+NUMBER = (int, float)
+
+
+class ClosureFunction(Function):
+    def __init__(
+        self,
+        declaration: ast.FunctionStmt,
+        closure: AnyEnvironment,
+        size: int,
+        body: StmtFn,
+    ):
+        super().__init__(declaration, closure, size)
+        self.body = body
+
+    def call(self, interpreter: "Interpreter", *arguments: Any) -> Any:
+        environment = CompactEnvironment(self.size, self.closure)
+        environment.values[: len(arguments)] = arguments
+
+        completion = self.body(environment)
+        if completion is not None:
+            return completion[0]
+        return None
+
+
+class ClosureCompiler(ast.ExprVisitor, ast.StmtVisitor):
+    # Compiles a resolved syntax tree into nested Python closures, once. All of
+    # the decisions the Interpreter makes on every visit (which operator, which
+    # scope a variable lives in, whether a block needs an environment) are made
+    # here instead, and baked into the closure built for each node.
+
+    def __init__(self, interpreter: "ClosureInterpreter"):
+        self.interpreter = interpreter
+
+    def compile(self, statements: List[ast.Stmt]) -> StmtFn:
+        return self.sequence([self.compile_stmt(stmt) for stmt in statements])
+
+    def compile_stmt(self, stmt: ast.Stmt) -> StmtFn:
+        run = stmt.accept(self)
+        timings = self.interpreter.timings
+        if timings is None:
+            return run
+
+        def run_counted(env):
+            timings.statements += 1
+            return run(env)
+
+        return run_counted
+
+    def compile_expr(self, expr: ast.Expr) -> ExprFn:
+        return expr.accept(self)
+
+    def sequence(self, statements: List[StmtFn]) -> StmtFn:
+        if len(statements) == 1:
+            return statements[0]
+
+        def run_sequence(env):
+            for statement in statements:
+                completion = statement(env)
+                if completion is not None:
+                    return completion
+            return None
+
+        return run_sequence
+
+    def visit_block_stmt(self, stmt: ast.BlockStmt) -> StmtFn:
+        body = self.compile(stmt.statements)
+        size = self.interpreter.scope_sizes.get(stmt)
+        if size is None:
+            return body
+
+        def run_block(env):
+            return body(CompactEnvironment(size, env))
+
+        return run_block
+
+    def visit_expression_stmt(self, stmt: ast.ExpressionStmt) -> StmtFn:
+        expression = self.compile_expr(stmt.expression)
+
+        def run_expression(env):
+            expression(env)
+
+        return run_expression
+
+    def visit_function_stmt(self, stmt: ast.FunctionStmt) -> StmtFn:
+        body = self.compile(stmt.body)
+        size = self.interpreter.scope_sizes[stmt]
+        define = self.definer(stmt, stmt.name)
+
+        def run_function(env):
+            define(env, ClosureFunction(stmt, env, size, body))
+
+        return run_function
+
+    def visit_if_stmt(self, stmt: ast.IfStmt) -> StmtFn:
+        condition = self.compile_expr(stmt.condition)
+        then_branch = self.compile_stmt(stmt.then_branch)
+        if stmt.else_branch is None:
+
+            def run_if(env):
+                value = condition(env)
+                if value is not None and value is not False:
+                    return then_branch(env)
+                return None
+
+            return run_if
+
+        else_branch = self.compile_stmt(stmt.else_branch)
+
+        def run_if_else(env):
+            value = condition(env)
+            if value is not None and value is not False:
+                return then_branch(env)
+            return else_branch(env)
+
+        return run_if_else
+
+    def visit_print_stmt(self, stmt: ast.PrintStmt) -> StmtFn:
+        expression = self.compile_expr(stmt.expression)
+        interpreter = self.interpreter
+        stringify = interpreter.stringify
+
+        def run_print(env):
+            print(stringify(expression(env)), file=interpreter.out)
+
+        return run_print
+
+    def visit_return_stmt(self, stmt: ast.ReturnStmt) -> StmtFn:
+        if stmt.value is None:
+            return lambda env: (None,)
+
+        value = self.compile_expr(stmt.value)
+
+        def run_return(env):
+            return (value(env),)
+
+        return run_return
+
+    def visit_var_stmt(self, stmt: ast.VarStmt) -> StmtFn:
+        define = self.definer(stmt, stmt.name)
+        if stmt.intitializer is None:
+
+            def run_var(env):
+                define(env, None)
+
+            return run_var
+
+        initializer = self.compile_expr(stmt.intitializer)
+
+        def run_var_initialized(env):
+            define(env, initializer(env))
+
+        return run_var_initialized
+
+    def visit_while_stmt(self, stmt: ast.WhileStmt) -> StmtFn:
+        condition = self.compile_expr(stmt.condition)
+        body = self.compile_stmt(stmt.body)
+
+        def run_while(env):
+            while True:
+                value = condition(env)
+                if value is None or value is False:
+                    return None
+                completion = body(env)
+                if completion is not None:
+                    return completion
+
+        limits = self.interpreter.limits
+        if limits is None:
+            return run_while
+        keyword = stmt.keyword
+
+        def run_limited_while(env):
+            while True:
+                value = condition(env)
+                if value is None or value is False:
+                    return None
+                completion = body(env)
+                if completion is not None:
+                    return completion
+                limits.fuel -= 1
+                if limits.fuel < 0:
+                    limits.check(keyword)
+
+        return run_limited_while
+
+    def visit_assign_expr(self, expr: ast.AssignExpr) -> ExprFn:
+        value = self.compile_expr(expr.value)
+        name = expr.name
+        local = self.interpreter.locals.get(expr)
+
+        if local is None:
+            globals_ = self.interpreter.globals
+
+            def assign_global(env):
+                result = value(env)
+                globals_.assign(name, result)
+                return result
+
+            return assign_global
+
+        depth, slot = local
+        if depth == 0:
+
+            def assign_local(env):
+                result = env.values[slot] = value(env)
+                return result
+
+            return assign_local
+
+        def assign_enclosing(env):
+            result = value(env)
+            env.ancestor(depth).values[slot] = result
+            return result
+
+        return assign_enclosing
+
+    def visit_binary_expr(self, expr: ast.BinaryExpr) -> ExprFn:
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+        operator: Token = expr.operator
+        limits = self.interpreter.limits
+
+        def operands_error():
+            return LoxRuntimeError("Operands must be numbers", operator)
+
+        match operator.type:
+            case T.GREATER:
+
+                def greater(env):
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                        return a > b
+                    raise operands_error()
+
+                return greater
+            case T.GREATER_EQUAL:
+
+                def greater_equal(env):
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                        return a >= b
+                    raise operands_error()
+
+                return greater_equal
+            case T.LESS:
+
+                def less(env):
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                        return a < b
+                    raise operands_error()
+
+                return less
+            case T.LESS_EQUAL:
+
+                def less_equal(env):
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                        return a <= b
+                    raise operands_error()
+
+                return less_equal
+            case T.BANG_EQUAL:
+                return lambda env: not left(env) == right(env)
+            case T.EQUAL_EQUAL:
+                return lambda env: left(env) == right(env)
+            case T.MINUS:
+
+                def minus(env):
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                        return a - b
+                    raise operands_error()
+
+                return minus
+            case T.PLUS:
+
+                def plus(env):
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                        return a + b
+                    if isinstance(a, str) and isinstance(b, str):
+                        if limits is not None:
+                            limits.check_string(len(a) + len(b), operator)
+                        return a + b
+                    return None
+
+                return plus
+            case T.SLASH:
+
+                def slash(env):
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                        if b == 0:
+                            raise LoxDivisionByZero("Divison by zero", operator)
+                        return a / b
+                    raise operands_error()
+
+                return slash
+            case T.STAR:
+
+                def star(env):
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                        return a * b
+                    raise operands_error()
+
+                return star
+
+        # Unreachable
+        def unreachable(env):
+            left(env)
+            right(env)
+
+        return unreachable
+
+    def visit_call_expr(self, expr: ast.CallExpr) -> ExprFn:
+        callee = self.compile_expr(expr.callee)
+        arguments = [self.compile_expr(argument) for argument in expr.arguments]
+        count = len(arguments)
+        paren = expr.paren
+        interpreter = self.interpreter
+        limits = interpreter.limits
+
+        def call(env):
+            if limits is not None:
+                limits.fuel -= 1
+                if limits.fuel < 0:
+                    limits.check(paren)
+
+            function = callee(env)
+            values = [argument(env) for argument in arguments]
+
+            if type(function) is ClosureFunction:
+                # Fast path for Lox functions, which skips the generic checks
+                # and inlines ClosureFunction.call
+                if count > len(function.declaration.params):
+                    raise LoxRuntimeError(
+                        f"Expected {function.arity()} arguments but got {count}.",
+                        paren,
+                    )
+                environment = CompactEnvironment(function.size, function.closure)
+                environment.values[:count] = values
+                try:
+                    completion = function.body(environment)
+                except RecursionError:
+                    raise interpreter.stack_overflow(paren) from None
+                if completion is not None:
+                    return completion[0]
+                return None
+
+            if not isinstance(function, Callable):
+                raise LoxRuntimeError("Can only call functions and classes.", paren)
+
+            if count > function.arity():
+                raise LoxRuntimeError(
+                    f"Expected {function.arity()} arguments but got {count}.",
+                    paren,
+                )
+
+            try:
+                return function.call(interpreter, *values)
+            except AsyncCallError as error:
+                raise LoxRuntimeError(str(error), paren) from None
+
+        return call
+
+    def visit_grouping_expr(self, expr: ast.GroupingExpr) -> ExprFn:
+        return self.compile_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: ast.LiteralExpr) -> ExprFn:
+        value = expr.value
+        return lambda env: value
+
+    def visit_logical_expr(self, expr: ast.LogicalExpr) -> ExprFn:
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+
+        if expr.operator.type == T.OR:
+
+            def or_(env):
+                value = left(env)
+                if value is not None and value is not False:
+                    return value
+                return right(env)
+
+            return or_
+
+        def and_(env):
+            value = left(env)
+            if value is None or value is False:
+                return value
+            return right(env)
+
+        return and_
+
+    def visit_unary_expr(self, expr: ast.UnaryExpr) -> ExprFn:
+        right = self.compile_expr(expr.right)
+
+        match expr.operator.type:
+            case T.BANG:
+
+                def bang(env):
+                    value = right(env)
+                    return value is None or value is False
+
+                return bang
+            case T.MINUS:
+                return lambda env: -right(env)
+
+        # Unreachable
+        def unreachable(env):
+            right(env)
+
+        return unreachable
+
+    def visit_variable_expr(self, expr: ast.VariableExpr) -> ExprFn:
+        name = expr.name
+        local = self.interpreter.locals.get(expr)
+
+        if local is None:
+            globals_ = self.interpreter.globals
+            # An inline cache of this one read, good while globals are unchanged
+            cached_version = -1
+            cached_value = None
+
+            def get_global(env):
+                nonlocal cached_version, cached_value
+                if cached_version == globals_.version:
+                    return cached_value
+
+                cached_value = globals_.get(name)
+                cached_version = globals_.version
+                return cached_value
+
+            return get_global
+
+        depth, slot = local
+
+        def undefined():
+            return LoxRuntimeError(f"Undefined variable '{name.lexeme}'.", name)
+
+        if depth == 0:
+
+            def get_local(env):
+                value = env.values[slot]
+                if value is UNDEFINED:
+                    raise undefined()
+                return value
+
+            return get_local
+
+        if depth == 1:
+
+            def get_enclosing(env):
+                value = env.enclosing.values[slot]
+                if value is UNDEFINED:
+                    raise undefined()
+                return value
+
+            return get_enclosing
+
+        def get_ancestor(env):
+            value = env.ancestor(depth).values[slot]
+            if value is UNDEFINED:
+                raise undefined()
+            return value
+
+        return get_ancestor
+
+    def definer(self, stmt: ast.Stmt, name: Token) -> PyCallable[[Any, Any], None]:
+        slot = self.interpreter.slots.get(stmt)
+
+        if slot is None:
+            define = self.interpreter.globals.define
+
+            def define_global(env, value):
+                define(name.lexeme, value)
+
+            return define_global
+
+        def define_local(env, value):
+            env.values[slot] = value
+
+        return define_local
+
+
+class ClosureInterpreter(Interpreter):
+    # Runs programs by compiling them to closures first. Shares the resolver
+    # tables, globals and value semantics of the tree-walking Interpreter, which
+    # is still used to evaluate bare expressions typed at the REPL.
+
+    def __init__(self, lox, out=sys.stdout):
+        super().__init__(lox, out=out)
+        self.compiler = ClosureCompiler(self)
+
+    def prepare(self, statements: List[ast.Stmt]) -> StmtFn:
+        # The closures are bound to this interpreter's globals, out and limits
+        return self.compiler.compile(statements)
+
+    def run_prepared(self, prepared: StmtFn) -> None:
+        try:
+            prepared(self.environment)
+        except LoxRuntimeError as error:
+            self.lox.runtime_error(error)
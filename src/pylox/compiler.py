@@ -0,0 +1,231 @@
+from typing import List
+
+from . import ast
+from .bytecode import Chunk, GlobalSite
+from .bytecode import OpCode as Op
+from .token import Token
+from .token import TokenType as T
+
+BINARY_OPS = {
+    T.BANG_EQUAL: Op.NOT_EQUAL,
+    T.EQUAL_EQUAL: Op.EQUAL,
+    T.GREATER: Op.GREATER,
+    T.GREATER_EQUAL: Op.GREATER_EQUAL,
+    T.LESS: Op.LESS,
+    T.LESS_EQUAL: Op.LESS_EQUAL,
+    T.MINUS: Op.SUBTRACT,
+    T.PLUS: Op.ADD,
+    T.SLASH: Op.DIVIDE,
+    T.STAR: Op.MULTIPLY,
+}
+
+
+class Compiler(ast.ExprVisitor, ast.StmtVisitor):
+    # Compiles a resolved syntax tree to bytecode for the VM. Local variables
+    # are addressed by the (depth, slot) pairs the Resolver worked out.
+
+    def __init__(self, interpreter):
+        from .interpreter import Interpreter
+
+        self.interpreter: Interpreter = interpreter
+        self.chunk = Chunk("script")
+        self.line = 1
+
+    def compile(self, statements: List[ast.Stmt]) -> Chunk:
+        self.chunk = Chunk("script")
+        for statement in statements:
+            self.compile_stmt(statement)
+        self.emit(Op.NIL)
+        self.emit(Op.RETURN)
+        return self.chunk
+
+    def compile_function(self, function: ast.FunctionStmt) -> Chunk:
+        enclosing = self.chunk
+        self.chunk = Chunk(
+            function.name.lexeme,
+            len(function.params),
+            self.interpreter.scope_sizes[function],
+        )
+
+        for statement in function.body:
+            self.compile_stmt(statement)
+        self.emit(Op.NIL)
+        self.emit(Op.RETURN)
+
+        chunk, self.chunk = self.chunk, enclosing
+        return chunk
+
+    def compile_stmt(self, stmt: ast.Stmt) -> None:
+        if self.interpreter.timings is not None:
+            self.emit(Op.COUNT)
+        stmt.accept(self)
+
+    def compile_expr(self, expr: ast.Expr) -> None:
+        expr.accept(self)
+
+    def emit(self, op: Op, *operands: int) -> int:
+        offset = self.chunk.write(op, self.line)
+        for operand in operands:
+            self.chunk.write(operand, self.line)
+        return offset
+
+    def emit_jump(self, op: Op) -> int:
+        # Returns the offset of the jump target, to be patched later
+        self.emit(op, 0)
+        return len(self.chunk.code) - 1
+
+    def patch_jump(self, offset: int) -> None:
+        self.chunk.code[offset] = len(self.chunk.code)
+
+    def token(self, token: Token) -> int:
+        self.line = token.line
+        return self.chunk.add_constant(token)
+
+    def define(self, stmt: ast.Stmt, name: Token) -> None:
+        slot = self.interpreter.slots.get(stmt)
+        if slot is not None:
+            self.emit(Op.DEFINE_LOCAL, slot)
+        else:
+            self.emit(Op.DEFINE_GLOBAL, self.token(name))
+
+    def visit_block_stmt(self, stmt: ast.BlockStmt):
+        size = self.interpreter.scope_sizes.get(stmt)
+        if size is not None:
+            self.emit(Op.PUSH_SCOPE, size)
+
+        for statement in stmt.statements:
+            self.compile_stmt(statement)
+
+        if size is not None:
+            self.emit(Op.POP_SCOPE)
+
+    def visit_expression_stmt(self, stmt: ast.ExpressionStmt):
+        self.compile_expr(stmt.expression)
+        self.emit(Op.POP)
+
+    def visit_function_stmt(self, stmt: ast.FunctionStmt):
+        chunk = self.compile_function(stmt)
+        self.line = stmt.name.line
+        self.emit(Op.CLOSURE, self.chunk.add_constant(chunk))
+        self.define(stmt, stmt.name)
+
+    def visit_if_stmt(self, stmt: ast.IfStmt):
+        self.compile_expr(stmt.condition)
+        else_jump = self.emit_jump(Op.JUMP_IF_FALSE)
+        self.emit(Op.POP)
+        self.compile_stmt(stmt.then_branch)
+        end_jump = self.emit_jump(Op.JUMP)
+
+        self.patch_jump(else_jump)
+        self.emit(Op.POP)
+        if stmt.else_branch is not None:
+            self.compile_stmt(stmt.else_branch)
+        self.patch_jump(end_jump)
+
+    def visit_print_stmt(self, stmt: ast.PrintStmt):
+        self.compile_expr(stmt.expression)
+        self.emit(Op.PRINT)
+
+    def visit_return_stmt(self, stmt: ast.ReturnStmt):
+        self.line = stmt.keyword.line
+        if stmt.value is not None:
+            self.compile_expr(stmt.value)
+        else:
+            self.emit(Op.NIL)
+        self.emit(Op.RETURN)
+
+    def visit_var_stmt(self, stmt: ast.VarStmt):
+        self.line = stmt.name.line
+        if stmt.intitializer is not None:
+            self.compile_expr(stmt.intitializer)
+        else:
+            self.emit(Op.NIL)
+        self.define(stmt, stmt.name)
+
+    def visit_while_stmt(self, stmt: ast.WhileStmt):
+        loop_start = len(self.chunk.code)
+        self.compile_expr(stmt.condition)
+        exit_jump = self.emit_jump(Op.JUMP_IF_FALSE)
+        self.emit(Op.POP)
+        self.compile_stmt(stmt.body)
+        # The keyword is only for reporting a loop which runs out of steps
+        self.emit(Op.LOOP, loop_start, self.chunk.add_constant(stmt.keyword))
+
+        self.patch_jump(exit_jump)
+        self.emit(Op.POP)
+
+    def visit_assign_expr(self, expr: ast.AssignExpr):
+        self.compile_expr(expr.value)
+        self.line = expr.name.line
+
+        local = self.interpreter.locals.get(expr)
+        if local is not None:
+            self.emit(Op.SET_LOCAL, *local)
+        else:
+            self.emit(Op.SET_GLOBAL, self.token(expr.name))
+
+    def visit_binary_expr(self, expr: ast.BinaryExpr):
+        self.compile_expr(expr.left)
+        self.compile_expr(expr.right)
+
+        op = BINARY_OPS[expr.operator.type]
+        self.line = expr.operator.line
+        if op in (Op.EQUAL, Op.NOT_EQUAL):
+            # These can't fail, so don't need the operator for error reporting
+            self.emit(op)
+        else:
+            self.emit(op, self.token(expr.operator))
+
+    def visit_call_expr(self, expr: ast.CallExpr):
+        self.compile_expr(expr.callee)
+        for argument in expr.arguments:
+            self.compile_expr(argument)
+        self.emit(Op.CALL, len(expr.arguments), self.token(expr.paren))
+
+    def visit_grouping_expr(self, expr: ast.GroupingExpr):
+        self.compile_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: ast.LiteralExpr):
+        if expr.value is None:
+            self.emit(Op.NIL)
+        elif expr.value is True:
+            self.emit(Op.TRUE)
+        elif expr.value is False:
+            self.emit(Op.FALSE)
+        else:
+            self.emit(Op.CONSTANT, self.chunk.add_constant(expr.value))
+
+    def visit_logical_expr(self, expr: ast.LogicalExpr):
+        self.compile_expr(expr.left)
+        self.line = expr.operator.line
+
+        if expr.operator.type == T.OR:
+            else_jump = self.emit_jump(Op.JUMP_IF_FALSE)
+            end_jump = self.emit_jump(Op.JUMP)
+            self.patch_jump(else_jump)
+        else:
+            end_jump = self.emit_jump(Op.JUMP_IF_FALSE)
+
+        self.emit(Op.POP)
+        self.compile_expr(expr.right)
+        self.patch_jump(end_jump)
+
+    def visit_unary_expr(self, expr: ast.UnaryExpr):
+        self.compile_expr(expr.right)
+        self.line = expr.operator.line
+
+        match expr.operator.type:
+            case T.BANG:
+                self.emit(Op.NOT)
+            case T.MINUS:
+                self.emit(Op.NEGATE)
+
+    def visit_variable_expr(self, expr: ast.VariableExpr):
+        local = self.interpreter.locals.get(expr)
+        if local is not None:
+            self.emit(Op.GET_LOCAL, *local, self.token(expr.name))
+        else:
+            # Each read gets its own site, to cache the value it last read
+            self.line = expr.name.line
+            site = self.chunk.add_constant(GlobalSite(expr.name))
+            self.emit(Op.GET_GLOBAL, site)
@@ -1,4 +1,4 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from .exceptions import LoxRuntimeError
 from .token import Token
@@ -8,10 +8,14 @@ class Environment:
     def __init__(self, enclosing: Optional["Environment"] = None):
         self.values: Dict[str, Any] = {}
         self.enclosing = enclosing
+        # Changes whenever a variable is defined or assigned, so that a cached
+        # read is still good as long as the version it was read at is current
+        self.version = 0
 
     def assign(self, name: Token, value: Any) -> None:
         if name.lexeme in self.values:
             self.values[name.lexeme] = value
+            self.version += 1
             return
 
         if self.enclosing is not None:
@@ -21,6 +25,7 @@ class Environment:
 
     def define(self, key: str, value: Any) -> None:
         self.values[key] = value
+        self.version += 1
 
     def get(self, token: Token) -> Any:
         if token.lexeme in self.values:
@@ -30,3 +35,40 @@ class Environment:
             return self.enclosing.get(token)
 
         raise LoxRuntimeError(f"Undefined variable '{token.lexeme}'.", token)
+
+
+# Marks a slot whose variable has not been defined yet, e.g. a parameter the
+# caller did not pass an argument for.
+UNDEFINED = object()
+
+
+class CompactEnvironment:
+    # Storage for a local scope. The Resolver assigns every local variable a
+    # fixed slot, so values live in a list sized up front rather than a dict,
+    # and are read and written by index instead of by name.
+    __slots__ = ("values", "enclosing")
+
+    def __init__(self, size: int, enclosing: Optional["AnyEnvironment"] = None):
+        self.values: List[Any] = [UNDEFINED] * size
+        self.enclosing = enclosing
+
+    def ancestor(self, distance: int) -> "CompactEnvironment":
+        environment = self
+        for _ in range(distance):
+            environment = environment.enclosing  # type: ignore[assignment]
+        return environment
+
+    def define(self, slot: int, value: Any) -> None:
+        self.values[slot] = value
+
+    def get_at(self, distance: int, slot: int, name: Token) -> Any:
+        value = self.ancestor(distance).values[slot]
+        if value is UNDEFINED:
+            raise LoxRuntimeError(f"Undefined variable '{name.lexeme}'.", name)
+        return value
+
+    def assign_at(self, distance: int, slot: int, value: Any) -> None:
+        self.ancestor(distance).values[slot] = value
+
+
+AnyEnvironment = Union[Environment, CompactEnvironment]
@@ -0,0 +1,174 @@
+from dataclasses import fields
+from typing import Any, Callable, Dict, List, Optional
+
+from . import ast
+from .environment import AnyEnvironment, CompactEnvironment
+from .exceptions import LoxRuntimeError
+from .interpreter import AsyncCallError, Completion, Function, Interpreter
+from .token import Token
+
+# What can be hooked, and the arguments each callback is given:
+#   call       function, arguments, tail (whether it replaces the caller)
+#   return     function, value (which is also the value of any callers it
+#              replaced with tail calls, who get no return of their own)
+#   statement  statement, line (None if it has no token of its own)
+#   error      error
+#   print      text printed, without the newline
+EVENTS = ("call", "return", "statement", "error", "print")
+
+Hook = Callable[..., Any]
+
+
+def line_of(node: Any) -> Optional[int]:
+    # The line of the first token in the node, searching breadth first, so a
+    # statement's line is that of its outermost token. Literals have none.
+    nodes = [node]
+    for node in nodes:
+        for field in fields(node):
+            value = getattr(node, field.name)
+            if isinstance(value, Token):
+                return value.line
+            if isinstance(value, (ast.Expr, ast.Stmt)):
+                nodes.append(value)
+            elif isinstance(value, list):
+                nodes.extend(value)
+    return None
+
+
+class Hooks:
+    # Callbacks registered for each event, called in the order they were added
+    def __init__(self):
+        self.callbacks: Dict[str, List[Hook]] = {event: [] for event in EVENTS}
+
+    def add(self, event: str, callback: Hook) -> None:
+        if event not in self.callbacks:
+            raise ValueError(f"Unknown hook event '{event}'.")
+        self.callbacks[event].append(callback)
+
+    def remove(self, event: str, callback: Hook) -> None:
+        if event not in self.callbacks:
+            raise ValueError(f"Unknown hook event '{event}'.")
+        self.callbacks[event].remove(callback)
+
+    def __bool__(self):
+        return any(self.callbacks.values())
+
+
+class HookedInterpreter(Interpreter):
+    # The tree-walk interpreter, calling hooks as it goes. Lox switches an
+    # Interpreter's class to this one while it has hooks, and back once they
+    # are all removed, so an interpreter without hooks runs exactly as fast as
+    # it would otherwise.
+    #
+    # Lox functions are called here rather than by Function.call, to report
+    # each call, tail calls included. Memoized results aren't used, since that
+    # would skip calls.
+
+    hooks: Hooks
+    line_cache: Dict[ast.Stmt, Optional[int]]
+
+    @classmethod
+    def install(cls, interpreter: Interpreter, hooks: Hooks) -> None:
+        if type(interpreter) not in (Interpreter, cls):
+            raise ValueError("Only the tree engine supports hooks.")
+
+        if type(interpreter) is Interpreter:
+            interpreter.__class__ = cls
+            interpreter.line_cache = {}  # type: ignore[attr-defined]
+        interpreter.hooks = hooks  # type: ignore[attr-defined]
+
+    def uninstall(self) -> None:
+        self.__class__ = Interpreter  # type: ignore[assignment]
+
+    def interpret(self, statements: List[ast.Stmt]) -> None:
+        try:
+            for statement in statements:
+                self.execute(statement)
+        except LoxRuntimeError as error:
+            for callback in self.hooks.callbacks["error"]:
+                callback(error)
+            self.lox.runtime_error(error)
+
+    def execute(self, stmt: ast.Stmt) -> Completion:
+        callbacks = self.hooks.callbacks["statement"]
+        if callbacks:
+            line = self.line_of(stmt)
+            for callback in callbacks:
+                callback(stmt, line)
+        return stmt.accept(self)
+
+    def line_of(self, stmt: ast.Stmt) -> Optional[int]:
+        if stmt not in self.line_cache:
+            self.line_cache[stmt] = line_of(stmt)
+        return self.line_cache[stmt]
+
+    def execute_block(
+        self, statements: List[ast.Stmt], environment: AnyEnvironment
+    ) -> Completion:
+        previous = self.environment
+
+        try:
+            self.environment = environment
+
+            for statement in statements:
+                completion = self.execute(statement)
+                if completion is not None:
+                    return completion
+            return None
+        finally:
+            self.environment = previous
+
+    def visit_block_stmt(self, stmt: ast.BlockStmt):
+        size = self.scope_sizes.get(stmt)
+        if size is None:
+            for statement in stmt.statements:
+                completion = self.execute(statement)
+                if completion is not None:
+                    return completion
+            return None
+
+        return self.execute_block(
+            stmt.statements, CompactEnvironment(size, self.environment)
+        )
+
+    def visit_print_stmt(self, stmt: ast.PrintStmt):
+        text = self.stringify(self.evaluate(stmt.expression))
+        for callback in self.hooks.callbacks["print"]:
+            callback(text)
+        print(text, file=self.out)
+
+    def visit_call_expr(self, expr: ast.CallExpr):
+        function, arguments = self.prepare_call(expr)
+        try:
+            if type(function) is Function:
+                return self.call_function(function, arguments)
+            return function.call(self, *arguments)
+        except RecursionError:
+            raise self.stack_overflow(expr.paren) from None
+        except AsyncCallError as error:
+            raise LoxRuntimeError(str(error), expr.paren) from None
+
+    def call_function(self, function: Function, arguments: List[Any]) -> Any:
+        # Function.call's trampoline, with hooks
+        callbacks = self.hooks.callbacks
+        tail = False
+        while True:
+            for callback in callbacks["call"]:
+                callback(function, arguments, tail)
+
+            environment = CompactEnvironment(function.size, function.closure)
+            environment.values[: len(arguments)] = arguments
+            completion = self.execute_block(function.declaration.body, environment)
+            if completion is None:
+                value = None
+                break
+            if len(completion) == 1:
+                value = completion[0]
+                break
+
+            function, arguments = completion
+            tail = True
+
+        for callback in callbacks["return"]:
+            callback(function, value)
+        return value
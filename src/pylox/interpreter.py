@@ -1,11 +1,19 @@
 import sys
 import time
 from abc import ABC, abstractmethod
-from typing import Any, List
+from dataclasses import fields
+from inspect import Parameter, isawaitable, iscoroutine, signature
+from typing import Any
+from typing import Callable as PyCallable
+from typing import Dict, List, Optional, Tuple, Union
 
 from . import ast
-from .environment import Environment
+from .environment import AnyEnvironment, CompactEnvironment, Environment
 from .exceptions import LoxRuntimeError
+from .limits import Limits
+from .memo import MISSING, Memo, Purity
+from .parser import ARGUMENT_LIMIT
+from .timings import Timings
 from .token import Token
 from .token import TokenType as T
 
@@ -14,9 +22,11 @@ class LoxDivisionByZero(LoxRuntimeError):
     pass
 
 
-class Return(Exception):
-    def __init__(self, value):
-        self.value = value
+# What executing a statement returns: None to carry on with the next statement,
+# a 1-tuple holding the value of a return statement, or a (function, arguments)
+# pair for a return statement's tail call. Every enclosing statement passes it
+# straight back up to the function call.
+Completion = Optional[Tuple[Any, ...]]
 
 
 class Callable(ABC):
@@ -29,23 +39,118 @@ class Callable(ABC):
         ...
 
 
+class AsyncCallError(Exception):
+    # An async native function called by a script not run by run_async, for
+    # the engine to raise as a LoxRuntimeError at the call
+    pass
+
+
+class NativeFunction(Callable):
+    # A Python function, for embedding code to give scripts as a global. Its
+    # arity is how many positional parameters it has, or ARGUMENT_LIMIT if it
+    # takes *args or has no signature to look at (as for many builtins),
+    # unless given. It's called with nil for any required arguments a script
+    # leaves off. It may be an async function, as long as the script is run
+    # by Lox.run_async, which awaits what it returns.
+    def __init__(
+        self, name: str, function: PyCallable[..., Any], arity: Optional[int] = None
+    ):
+        self.name = name
+        self.function = function
+        self.params = ARGUMENT_LIMIT
+        self.required = 0
+        try:
+            parameters = signature(function).parameters.values()
+        except ValueError:
+            parameters = None
+        if parameters is not None:
+            positional = [
+                parameter
+                for parameter in parameters
+                if parameter.kind
+                in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)
+            ]
+            if not any(
+                parameter.kind is Parameter.VAR_POSITIONAL for parameter in parameters
+            ):
+                self.params = len(positional)
+            self.required = sum(
+                parameter.default is Parameter.empty for parameter in positional
+            )
+        if arity is not None:
+            self.params = arity
+        self.required = min(self.required, self.params)
+
+    def arity(self) -> int:
+        return self.params
+
+    def call(self, interpreter: "Interpreter", *arguments: Any) -> Any:
+        value = self.start(*arguments)
+        if isawaitable(value):
+            if iscoroutine(value):
+                value.close()  # never to be awaited
+            raise AsyncCallError(f"Can only call {self} with run_async.")
+        return value
+
+    def start(self, *arguments: Any) -> Any:
+        # Calls the function, returning an awaitable if it's async
+        missing = self.required - len(arguments)
+        return self.function(*arguments, *(None,) * missing)
+
+    def __str__(self):
+        return f"<native fn {self.name}>"
+
+
 class Function(Callable):
-    def __init__(self, declaration: ast.FunctionStmt, closure: Environment):
+    def __init__(
+        self,
+        declaration: ast.FunctionStmt,
+        closure: AnyEnvironment,
+        size: int,
+        memo: Optional[Memo] = None,
+    ):
         self.declaration = declaration
         self.closure = closure
+        self.size = size  # number of local slots, including parameters
+        self.memo = memo  # results so far, if the function is pure
 
     def arity(self) -> int:
         return len(self.declaration.params)
 
     def call(self, interpreter: "Interpreter", *arguments: Any) -> Any:
-        environment = Environment(self.closure)
-        for param, argument in zip(self.declaration.params, arguments):
-            environment.define(param.lexeme, argument)
+        # Memoized calls waiting on the result, which a chain of tail calls
+        # all share
+        pending: List[Tuple[Memo, Tuple[Any, ...]]] = []
+
+        function = self
+        while True:
+            memo = function.memo
+            if memo is not None and memo.usable(interpreter.globals):
+                key = memo.key(arguments)
+                result = memo.get(key)
+                if result is not MISSING:
+                    break
+                pending.append((memo, key))
+
+            environment = CompactEnvironment(function.size, function.closure)
+            environment.values[: len(arguments)] = arguments
+            completion = interpreter.execute_block(
+                function.declaration.body, environment
+            )
+            if completion is None:
+                result = None
+                break
+            if len(completion) == 1:
+                result = completion[0]
+                break
 
-        try:
-            interpreter.execute_block(self.declaration.body, environment)
-        except Return as ret:
-            return ret.value
+            # A tail call: run the callee in this same Python frame, rather
+            # than nesting a call to it
+            function, arguments = completion
+
+        for memo, key in pending:
+            memo.put(key, result)
+        return result
 
     def __str__(self):
         return f"<fn {self.declaration.name.lexeme}>"
@@ -58,8 +163,24 @@ class Interpreter(ast.ExprVisitor, ast.StmtVisitor):
         self.lox: Lox = lox
         self.globals = Environment()  # fixed reference to outermost environment
         self.environment = self.globals  # changes as we enter and exit blocks
+        # Static scope information, from the Resolver
+        self.locals: Dict[ast.Expr, Tuple[int, int]] = {}  # depth and slot
+        self.slots: Dict[ast.Stmt, int] = {}  # slot of local declarations
+        self.scope_sizes: Dict[ast.Stmt, int] = {}
         self.out = out
 
+        # Results of pure functions kept per declaration; 0 turns memoization
+        # off, and None keeps every result
+        self.memo_size: Optional[int] = 0
+        self.memo_policy = "lru"
+        self.memos: Dict[ast.FunctionStmt, Optional[Memo]] = {}
+
+        # Bounds on the steps, time and memory a script may use, if any
+        self.limits: Optional[Limits] = None
+
+        # Where to count the statements run, if timed
+        self.timings: Optional[Timings] = None
+
         # Native functions
 
         class _clock(Callable):
@@ -75,8 +196,17 @@ class Interpreter(ast.ExprVisitor, ast.StmtVisitor):
         self.globals.define("clock", _clock())
 
     def interpret(self, statements: List[ast.Stmt]) -> None:
+        self.run_prepared(self.prepare(statements))
+
+    def prepare(self, statements: List[ast.Stmt]) -> Any:
+        # What this engine runs statements as, once they're resolved: bytecode,
+        # closures, Python code, or here the statements themselves. It can be
+        # run again by run_prepared, with the globals as they are then.
+        return statements
+
+    def run_prepared(self, prepared: Any) -> None:
         try:
-            for statement in statements:
+            for statement in prepared:
                 self.execute(statement)
         except LoxRuntimeError as error:
             self.lox.runtime_error(error)
@@ -84,61 +214,178 @@ class Interpreter(ast.ExprVisitor, ast.StmtVisitor):
     def evaluate(self, expr: ast.Expr):
         return expr.accept(self)
 
-    def execute_block(self, statements: List[ast.Stmt], environment: Environment):
+    def resolve(self, expr: ast.Expr, depth: int, slot: int) -> None:
+        self.locals[expr] = (depth, slot)
+
+    def resolve_declaration(self, stmt: ast.Stmt, slot: int) -> None:
+        self.slots[stmt] = slot
+
+    def resolve_scope(
+        self, stmt: Union[ast.BlockStmt, ast.FunctionStmt], size: int
+    ) -> None:
+        self.scope_sizes[stmt] = size
+
+    def release(self, statements: List[ast.Stmt]) -> None:
+        # Forgets the resolver's notes on top-level statements that have run,
+        # and won't run again. Function bodies are kept, since the functions
+        # may still be called.
+        nodes: List[Any] = list(statements)
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, list):
+                nodes.extend(node)
+            elif isinstance(node, (ast.Expr, ast.Stmt)) and not isinstance(
+                node, ast.FunctionStmt
+            ):
+                self.locals.pop(node, None)
+                self.slots.pop(node, None)
+                self.scope_sizes.pop(node, None)
+                nodes.extend(getattr(node, field.name) for field in fields(node))
+
+    def execute_block(
+        self, statements: List[ast.Stmt], environment: AnyEnvironment
+    ) -> Completion:
         previous = self.environment
 
         try:
             self.environment = environment
 
             for statement in statements:
-                self.execute(statement)
+                completion = statement.accept(self)
+                if completion is not None:
+                    return completion
+            return None
         finally:
             self.environment = previous
 
-    def execute(self, stmt: ast.Stmt):
-        stmt.accept(self)
+    def execute(self, stmt: ast.Stmt) -> Completion:
+        return stmt.accept(self)
+
+    def count_statements(self, timings: Timings) -> None:
+        # Counts each statement run into timings. The compiling engines
+        # generate counting code when timings is set; here each statement
+        # visitor is wrapped, on this interpreter only, so untimed runs (and
+        # memoization) are untouched.
+        self.timings = timings
+        for name in vars(ast.StmtVisitor):
+            if name.startswith("visit_"):
+                setattr(self, name, self.counted(name))
+
+    def counted(self, name: str) -> PyCallable[[ast.Stmt], Completion]:
+        timings = self.timings
+        assert timings is not None
+
+        def visit(stmt: ast.Stmt) -> Completion:
+            timings.statements += 1
+            # Looked up each time, as hooks may change the interpreter's class
+            return getattr(type(self), name)(self, stmt)
+
+        return visit
 
     def visit_block_stmt(self, stmt: ast.BlockStmt):
-        self.execute_block(stmt.statements, Environment(self.environment))
+        size = self.scope_sizes.get(stmt)
+        if size is None:
+            # The block declares nothing, so shares the enclosing environment
+            for statement in stmt.statements:
+                completion = statement.accept(self)
+                if completion is not None:
+                    return completion
+            return None
+
+        return self.execute_block(
+            stmt.statements, CompactEnvironment(size, self.environment)
+        )
 
     def visit_expression_stmt(self, stmt: ast.ExpressionStmt):
         self.evaluate(stmt.expression)
 
     def visit_function_stmt(self, stmt: ast.FunctionStmt):
-        function = Function(stmt, self.environment)
-        self.environment.define(stmt.name.lexeme, function)
+        function = Function(
+            stmt, self.environment, self.scope_sizes[stmt], self.memo(stmt)
+        )
+        self.define(stmt, stmt.name, function)
+
+    def memo(self, stmt: ast.FunctionStmt) -> Optional[Memo]:
+        if self.memo_size == 0:
+            return None
+
+        if stmt not in self.memos:
+            purity = Purity(self)
+            self.memos[stmt] = None
+            if purity.analyze(stmt):
+                self.memos[stmt] = Memo(
+                    stmt.name.lexeme,
+                    frozenset(purity.reads),
+                    frozenset(purity.calls),
+                    self.memo_size,
+                    self.memo_policy,
+                )
+        return self.memos[stmt]
+
+    def memo_stats(self) -> List[Dict[str, Any]]:
+        return [memo.stats() for memo in self.memos.values() if memo is not None]
 
     def visit_if_stmt(self, stmt: ast.IfStmt):
         if self.is_truthy(self.evaluate(stmt.condition)):
-            self.execute(stmt.then_branch)
+            return self.execute(stmt.then_branch)
         elif stmt.else_branch is not None:
-            self.execute(stmt.else_branch)
+            return self.execute(stmt.else_branch)
+        return None
 
     def visit_print_stmt(self, stmt: ast.PrintStmt):
         value = self.evaluate(stmt.expression)
         print(self.stringify(value), file=self.out)
 
     def visit_return_stmt(self, stmt: ast.ReturnStmt):
+        expr = stmt.value
+        while isinstance(expr, ast.GroupingExpr):
+            expr = expr.expression
+
+        if isinstance(expr, ast.CallExpr):
+            function, arguments = self.prepare_call(expr)
+            if type(function) is Function:
+                # Leave the calling Function to make the call, once this one's
+                # frame has gone, so tail recursion runs in constant stack
+                return (function, arguments)
+            try:
+                return (function.call(self, *arguments),)
+            except AsyncCallError as error:
+                raise LoxRuntimeError(str(error), expr.paren) from None
+
         value = None
-        if stmt.value is not None:
-            value = self.evaluate(stmt.value)
+        if expr is not None:
+            value = self.evaluate(expr)
 
-        raise Return(value)
+        return (value,)
 
     def visit_var_stmt(self, stmt: ast.VarStmt):
         value = None
         if stmt.intitializer is not None:
             value = self.evaluate(stmt.intitializer)
 
-        self.environment.define(stmt.name.lexeme, value)
+        self.define(stmt, stmt.name, value)
 
     def visit_while_stmt(self, stmt: ast.WhileStmt):
+        limits = self.limits
         while self.is_truthy(self.evaluate(stmt.condition)):
-            self.execute(stmt.body)
+            completion = self.execute(stmt.body)
+            if completion is not None:
+                return completion
+            if limits is not None:
+                limits.fuel -= 1
+                if limits.fuel < 0:
+                    limits.check(stmt.keyword)
+        return None
 
     def visit_assign_expr(self, expr: ast.AssignExpr) -> Any:
         value = self.evaluate(expr.value)
-        self.environment.assign(expr.name, value)
+
+        local = self.locals.get(expr)
+        if local is not None:
+            self.environment.assign_at(*local, value)  # type: ignore[union-attr]
+        else:
+            self.globals.assign(expr.name, value)
+
         return value
 
     def visit_binary_expr(self, expr: ast.BinaryExpr):
@@ -171,6 +418,8 @@ class Interpreter(ast.ExprVisitor, ast.StmtVisitor):
                 if self.is_number(left) and self.is_number(right):
                     return left + right
                 if isinstance(left, str) and isinstance(right, str):
+                    if self.limits is not None:
+                        self.limits.check_string(len(left) + len(right), expr.operator)
                     return left + right
             case T.SLASH:
                 self.check_number_operands(expr.operator, left, right)
@@ -186,6 +435,24 @@ class Interpreter(ast.ExprVisitor, ast.StmtVisitor):
                 return None
 
     def visit_call_expr(self, expr: ast.CallExpr):
+        function, arguments = self.prepare_call(expr)
+        try:
+            return function.call(self, *arguments)
+        except RecursionError:
+            raise self.stack_overflow(expr.paren) from None
+        except AsyncCallError as error:
+            raise LoxRuntimeError(str(error), expr.paren) from None
+
+    def prepare_call(self, expr: ast.CallExpr) -> Tuple[Callable, List[Any]]:
+        # Evaluates the callee and arguments, and checks they can be called.
+        # Every call, tail calls included, comes through here, so it is where
+        # calls are counted as steps.
+        limits = self.limits
+        if limits is not None:
+            limits.fuel -= 1
+            if limits.fuel < 0:
+                limits.check(expr.paren)
+
         function = self.evaluate(expr.callee)
 
         arguments = [self.evaluate(arg) for arg in expr.arguments]
@@ -199,7 +466,7 @@ class Interpreter(ast.ExprVisitor, ast.StmtVisitor):
                 expr.paren,
             )
 
-        return function.call(self, *arguments)
+        return function, arguments
 
     def visit_grouping_expr(self, expr: ast.GroupingExpr):
         return self.evaluate(expr.expression)
@@ -231,7 +498,25 @@ class Interpreter(ast.ExprVisitor, ast.StmtVisitor):
         return None
 
     def visit_variable_expr(self, expr: ast.VariableExpr) -> Any:
-        return self.environment.get(expr.name)
+        return self.look_up_variable(expr.name, expr)
+
+    def look_up_variable(self, name: Token, expr: ast.Expr) -> Any:
+        local = self.locals.get(expr)
+        if local is not None:
+            return self.environment.get_at(*local, name)  # type: ignore[union-attr]
+        return self.globals.get(name)
+
+    def define(self, stmt: ast.Stmt, name: Token, value: Any) -> None:
+        slot = self.slots.get(stmt)
+        if slot is not None:
+            self.environment.define(slot, value)  # type: ignore[arg-type]
+        else:
+            self.globals.define(name.lexeme, value)
+
+    def stack_overflow(self, paren: Token) -> LoxRuntimeError:
+        # Lox calls nest Python calls in the recursive engines, so too deep a
+        # recursion runs out of Python stack first
+        return LoxRuntimeError("Stack overflow.", paren)
 
     def check_number_operand(self, operator: Token, operand):
         if self.is_number(operand):
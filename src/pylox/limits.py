@@ -0,0 +1,129 @@
+import sys
+import time
+from typing import Optional
+
+from .exceptions import LoxRuntimeError
+from .token import Token
+from .token import TokenType as T
+
+# Most steps taken between looks at the clock and memory, which cost far more
+# than counting a step
+CHECK_INTERVAL = 1024
+
+# Longest string a limited script may build unless given a string_length. The
+# other limits are only checked every CHECK_INTERVAL steps, and a loop doubling
+# a string runs out of memory in a few dozen, so any limits also bound strings.
+MAX_STRING_LENGTH = 1 << 24
+
+
+class LoxLimitError(LoxRuntimeError):
+    # A script went past one of its Limits. limit is which one: "steps",
+    # "timeout", "values" or "string_length".
+    def __init__(self, message: str, token: Token, limit: str):
+        super().__init__(message, token)
+        self.limit = limit
+
+
+class Limits:
+    # Bounds on what an untrusted script may use, each None for no bound:
+    #   steps          loop iterations and calls: each back-edge of a loop, and
+    #                  each call, including tail calls, is a step
+    #   timeout        seconds of wall clock time, from when the limits were
+    #                  made (or last reset)
+    #   values         how many more Python objects may be alive than when the
+    #                  limits were made, as counted by sys.getallocatedblocks()
+    #                  for the whole process, so scripts running at once share it
+    #   string_length  characters in the longest string the script may build,
+    #                  checked before concatenating, so it is never allocated;
+    #                  MAX_STRING_LENGTH if None
+    #
+    # Engines count steps by decrementing fuel, and call check() once it goes
+    # negative, so a step costs a decrement and a comparison. check() tallies
+    # the steps, looks at the clock and memory, and hands out at most
+    # CHECK_INTERVAL more steps of fuel.
+    __slots__ = (
+        "steps",
+        "timeout",
+        "values",
+        "string_length",
+        "used",
+        "deadline",
+        "baseline",
+        "granted",
+        "fuel",
+    )
+
+    def __init__(
+        self,
+        steps: Optional[int] = None,
+        timeout: Optional[float] = None,
+        values: Optional[int] = None,
+        string_length: Optional[int] = None,
+    ):
+        self.steps = steps
+        self.timeout = timeout
+        self.values = values
+        if string_length is None:
+            string_length = MAX_STRING_LENGTH
+        self.string_length = string_length
+        self.reset()
+
+    def reset(self) -> None:
+        self.used = 0  # steps taken, up to the last check
+        self.deadline = None
+        if self.timeout is not None:
+            self.deadline = time.monotonic() + self.timeout
+        self.baseline = sys.getallocatedblocks()
+        self.granted = self.fuel = self.grant()
+
+    def adopt(self, other: "Limits") -> None:
+        # Takes other's bounds, and starts counting afresh
+        self.steps = other.steps
+        self.timeout = other.timeout
+        self.values = other.values
+        self.string_length = other.string_length
+        self.reset()
+
+    def grant(self) -> int:
+        if self.steps is None:
+            return CHECK_INTERVAL
+        return min(CHECK_INTERVAL, self.steps - self.used)
+
+    def check(self, token: Optional[Token]) -> None:
+        # Called with the token of the loop or call whose step took the fuel
+        # below zero, which is the step after the last one granted
+        self.used += self.granted + 1
+        if self.steps is not None and self.used > self.steps:
+            raise self.exceeded(
+                "steps", f"Exceeded the limit of {self.steps} steps.", token
+            )
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise self.exceeded(
+                "timeout", f"Exceeded the time limit of {self.timeout}s.", token
+            )
+        if (
+            self.values is not None
+            and sys.getallocatedblocks() - self.baseline > self.values
+        ):
+            raise self.exceeded(
+                "values", f"Exceeded the limit of {self.values} live values.", token
+            )
+
+        self.granted = self.fuel = self.grant()
+
+    def check_string(self, length: int, token: Optional[Token]) -> None:
+        # Called before building a string of length characters
+        if length > self.string_length:
+            raise self.exceeded(
+                "string_length",
+                f"Exceeded the limit of {self.string_length} characters in a string.",
+                token,
+            )
+
+    def exceeded(
+        self, limit: str, message: str, token: Optional[Token]
+    ) -> LoxLimitError:
+        # Hand-built syntax trees may have loops without a keyword token
+        if token is None:
+            token = Token(T.WHILE, "while", None, 0)
+        return LoxLimitError(message, token, limit)
@@ -1,28 +1,71 @@
 import sys
+from contextlib import nullcontext
 from functools import singledispatchmethod
 from pathlib import Path
-from typing import List
+from typing import ContextManager, Iterable, Iterator, List, Optional
 
+from . import ast
+from .cache import ProgramCache
+from .closure import ClosureInterpreter
+from .exceptions import ParseError
+from .hooks import Hook, HookedInterpreter, Hooks
 from .interpreter import Interpreter, LoxRuntimeError
-from .parser import Parser
-from .scanner import Scanner
+from .optimizer import Optimizer
+from .parser import BufferParser, Parser, StreamingParser
+from .resolver import Resolver
+from .scanner import RegexScanner
+from .timings import Timings, count_nodes
 from .token import Token
 from .token import TokenType as T
+from .transpiler import TranspilingInterpreter
+from .vm import VMInterpreter
+
+# Characters read from a file at a time, when streaming
+CHUNK_SIZE = 64 * 1024
+
+UNTIMED = nullcontext()
+
+ENGINES = {
+    "tree": Interpreter,
+    "closure": ClosureInterpreter,
+    "vm": VMInterpreter,
+    "python": TranspilingInterpreter,
+}
 
 
 class Lox:
     PROMPT = "> "
 
-    def __init__(self, out=sys.stdout, err=sys.stderr):
-        self.interpreter = Interpreter(self, out=out)
+    def __init__(
+        self,
+        out=sys.stdout,
+        err=sys.stderr,
+        engine: str = "tree",
+        optimize: bool = False,
+        cache: Optional[ProgramCache] = None,
+        timings: bool = False,
+    ):
+        self.interpreter = ENGINES[engine](self, out=out)
+        self.optimize = optimize
+        self.cache = cache  # parsed programs, to skip scanning and parsing
+        self.hooks = Hooks()
+
+        # Time spent in each phase, and sizes, if asked for
+        self.timings: Optional[Timings] = None
+        if timings:
+            self.timings = Timings()
+            self.interpreter.count_statements(self.timings)
         self.had_error = False
         self.had_runtime_error = False
         self.out = out
         self.err = err
 
-    def run_file(self, path: Path):
+    def run_file(self, path: Path, stream: bool = False):
         with open(path) as f:
-            self.run(f.read())
+            if stream:
+                self.run_stream(iter(lambda: f.read(CHUNK_SIZE), ""))
+            else:
+                self.run(f.read())
 
         if self.had_error:
             sys.exit(65)
@@ -46,25 +89,157 @@ class Lox:
                 print(value, file=self.out)
             else:
                 statements = parser.parse()
-                self.interpreter.interpret(statements)
+                self.resolve(statements)
+                if not self.had_error:
+                    self.interpreter.interpret(statements)
             self.had_error = False
 
     def run(self, source: str):
-        tokens = self.scan(source)
-        parser = Parser(self, tokens)
-
-        statements = parser.parse()
+        statements = self.parse(source)
 
         # Stop if there was a syntax error
+        if statements is None:
+            return
+
+        with self.phase("resolve"):
+            self.resolve(statements)
+
+        # Stop if there was a resolution error
         if self.had_error:
             return
 
-        self.interpreter.interpret(statements)
+        with self.phase("interpret"):
+            self.interpreter.interpret(statements)
+
+    async def run_async(self, source: str):
+        # Like run, but lets other tasks on the event loop run while the
+        # script does, and awaits async native functions. Only the vm engine
+        # can pause a script part way through.
+        if not isinstance(self.interpreter, VMInterpreter):
+            raise ValueError("run_async needs the vm engine.")
+
+        statements = self.parse(source)
+        if statements is None:
+            return
+
+        with self.phase("resolve"):
+            self.resolve(statements)
+        if self.had_error:
+            return
+
+        with self.phase("interpret"):
+            await self.interpreter.interpret_async(statements)
+
+    def parse(self, source: str) -> Optional[List[ast.Stmt]]:
+        # Returns None if there was a syntax error
+        if self.timings is not None:
+            self.timings.source_bytes += len(source.encode())
+
+        if self.cache is not None:
+            with self.phase("cache"):
+                statements = self.cache.load(source, self.optimize)
+            if statements is not None:
+                self.count_nodes(statements)
+                return statements
+
+        with self.phase("scan"):
+            tokens = RegexScanner(self, source).scan_buffer()
+        with self.phase("parse"):
+            statements = BufferParser(self, tokens).parse()
+        if self.timings is not None:
+            self.timings.tokens += len(tokens)
+        if self.had_error:
+            return None
+
+        if self.optimize:
+            with self.phase("optimize"):
+                statements = Optimizer().optimize(statements)
+        self.count_nodes(statements)
+
+        if self.cache is not None:
+            with self.phase("cache"):
+                self.cache.store(source, self.optimize, statements)
+        return statements
+
+    def phase(self, name: str) -> ContextManager:
+        if self.timings is None:
+            return UNTIMED
+        return self.timings.phase(name)
+
+    def count_nodes(self, statements: List[ast.Stmt]) -> None:
+        if self.timings is not None:
+            self.timings.nodes += count_nodes(statements)
+
+    def run_stream(self, chunks: Iterable[str]):
+        # Runs each top-level declaration as soon as it has been parsed, so
+        # output starts straight away and memory use is bounded by the largest
+        # declaration, not the whole program. Declarations before a syntax or
+        # resolution error have already run; everything after is still checked
+        # for errors, but not run.
+        if self.timings is not None:
+            chunks = self.timings.count_source(chunks)
+        tokens = RegexScanner(self, "").stream(chunks)
+        if self.timings is not None:
+            tokens = self.timings.count_tokens(tokens)
+        parser = StreamingParser(self, tokens)
+
+        declarations = self.parse_stream(parser)
+        while True:
+            # Scanning happens as the parser asks for tokens, so its time is
+            # part of the parse phase's
+            with self.phase("parse"):
+                statement = next(declarations, None)
+            if statement is None:
+                break
+
+            statements = [statement]
+            if self.optimize:
+                with self.phase("optimize"):
+                    statements = Optimizer().optimize(statements)
+            self.count_nodes(statements)
+
+            with self.phase("resolve"):
+                self.resolve(statements)
+            if self.had_error:
+                continue
+
+            with self.phase("interpret"):
+                self.interpreter.interpret(statements)
+            if self.had_runtime_error:
+                return
+            self.interpreter.release(statements)
+
+    def parse_stream(self, parser: Parser) -> Iterator[ast.Stmt]:
+        while not parser.is_at_end():
+            try:
+                yield parser.declaration()
+            except ParseError:
+                # Already reported, and the parser has synchronized
+                continue
 
     def scan(self, source: str) -> List[Token]:
-        scanner = Scanner(self, source)
+        scanner = RegexScanner(self, source)
         return scanner.scan_tokens()
 
+    def resolve(self, statements: List[ast.Stmt]):
+        resolver = Resolver(self, self.interpreter)
+        resolver.resolve(statements)
+
+    def add_hook(self, event: str, callback: Hook) -> None:
+        # Calls callback on each event of the kind, one of hooks.EVENTS, from
+        # now on. Only the tree engine has hooks.
+        self.hooks.add(event, callback)
+        try:
+            HookedInterpreter.install(self.interpreter, self.hooks)
+        except ValueError:
+            self.hooks.remove(event, callback)
+            raise
+
+    def remove_hook(self, event: str, callback: Hook) -> None:
+        self.hooks.remove(event, callback)
+        if not self.hooks and isinstance(self.interpreter, HookedInterpreter):
+            self.interpreter.uninstall()
+
     @singledispatchmethod
     def error(self, arg, message: str):
         raise NotImplementedError("Invalid error argument.")
@@ -0,0 +1,217 @@
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from . import ast
+from .environment import UNDEFINED, Environment
+
+POLICIES = ("lru", "fifo")
+
+MISSING = object()
+
+
+class Purity(ast.ExprVisitor, ast.StmtVisitor):
+    # Works out whether a function declaration is pure: whether its result
+    # depends only on its arguments and the globals it reads, and calling it
+    # has no effect besides returning that result. So it mustn't print, assign
+    # anything but its own locals, read variables captured from enclosing
+    # functions, or declare functions, whose closures would differ from call to
+    # call. Calls are only allowed to globals; whether those hold pure
+    # functions is only known at runtime, so is checked then, by Memo.
+    def __init__(self, interpreter):
+        from .interpreter import Interpreter
+
+        self.interpreter: Interpreter = interpreter
+        self.depth = 0  # scopes entered since the function's own
+        self.pure = True
+        self.reads: set = set()  # global names
+        self.calls: set = set()  # global names called
+
+    def analyze(self, function: ast.FunctionStmt) -> bool:
+        for statement in function.body:
+            statement.accept(self)
+        return self.pure
+
+    def is_local(self, expr: ast.Expr) -> Optional[bool]:
+        # True for the function's own locals, False for captured variables, and
+        # None for globals
+        local = self.interpreter.locals.get(expr)
+        if local is None:
+            return None
+        return local[0] <= self.depth
+
+    def visit_block_stmt(self, stmt: ast.BlockStmt):
+        scoped = stmt in self.interpreter.scope_sizes
+        self.depth += scoped
+        for statement in stmt.statements:
+            statement.accept(self)
+        self.depth -= scoped
+
+    def visit_expression_stmt(self, stmt: ast.ExpressionStmt):
+        stmt.expression.accept(self)
+
+    def visit_function_stmt(self, stmt: ast.FunctionStmt):
+        self.pure = False
+
+    def visit_if_stmt(self, stmt: ast.IfStmt):
+        stmt.condition.accept(self)
+        stmt.then_branch.accept(self)
+        if stmt.else_branch is not None:
+            stmt.else_branch.accept(self)
+
+    def visit_print_stmt(self, stmt: ast.PrintStmt):
+        self.pure = False
+
+    def visit_return_stmt(self, stmt: ast.ReturnStmt):
+        if stmt.value is not None:
+            stmt.value.accept(self)
+
+    def visit_var_stmt(self, stmt: ast.VarStmt):
+        if stmt.intitializer is not None:
+            stmt.intitializer.accept(self)
+
+    def visit_while_stmt(self, stmt: ast.WhileStmt):
+        stmt.condition.accept(self)
+        stmt.body.accept(self)
+
+    def visit_assign_expr(self, expr: ast.AssignExpr):
+        if not self.is_local(expr):
+            self.pure = False
+        expr.value.accept(self)
+
+    def visit_binary_expr(self, expr: ast.BinaryExpr):
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_call_expr(self, expr: ast.CallExpr):
+        callee = expr.callee
+        while isinstance(callee, ast.GroupingExpr):
+            callee = callee.expression
+
+        if isinstance(callee, ast.VariableExpr) and self.is_local(callee) is None:
+            self.calls.add(callee.name.lexeme)
+        else:
+            self.pure = False
+
+        for argument in expr.arguments:
+            argument.accept(self)
+
+    def visit_grouping_expr(self, expr: ast.GroupingExpr):
+        expr.expression.accept(self)
+
+    def visit_literal_expr(self, expr: ast.LiteralExpr):
+        pass
+
+    def visit_logical_expr(self, expr: ast.LogicalExpr):
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_unary_expr(self, expr: ast.UnaryExpr):
+        expr.right.accept(self)
+
+    def visit_variable_expr(self, expr: ast.VariableExpr):
+        local = self.is_local(expr)
+        if local is None:
+            self.reads.add(expr.name.lexeme)
+        elif not local:
+            self.pure = False
+
+
+class Memo:
+    # The results of a pure function declaration, keyed by the arguments they
+    # were computed from, and shared by every function object made from it:
+    # without captured variables, they all compute the same thing.
+    #
+    # Results also depend on the globals the function, and the functions it
+    # calls, read. Those are checked whenever the globals' version changes, and
+    # the results dropped if any of them differ. Until then, checking is one
+    # comparison. The memo is only usable while everything it calls is pure.
+    def __init__(
+        self,
+        name: str,
+        reads: FrozenSet[str],
+        calls: FrozenSet[str],
+        size: Optional[int],
+        policy: str = "lru",
+    ):
+        self.name = name
+        self.reads = reads
+        self.calls = calls
+        self.size = size  # maximum number of results, or None for no limit
+        self.lru = policy == "lru"  # else evict the oldest result first
+
+        self.results: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.version = -1  # of the globals, when last checked
+        self.snapshot: Optional[Tuple[Any, ...]] = None
+        self.active = False
+
+    def usable(self, globals_: Environment) -> bool:
+        if self.version == globals_.version:
+            return self.active
+
+        self.version = globals_.version
+        snapshot = self.dependencies(globals_.values)
+        self.active = snapshot is not None
+        if snapshot != self.snapshot:
+            self.results.clear()
+            self.snapshot = snapshot
+        return self.active
+
+    def dependencies(self, values: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+        # The current value of every global this memo's results depend on, or
+        # None if it calls something impure
+        names = set()
+        memos = [self]
+        seen = {self}
+        while memos:
+            memo = memos.pop()
+            names.update(memo.reads, memo.calls)
+            for name in memo.calls:
+                callee = getattr(values.get(name), "memo", None)
+                if callee is None:
+                    return None
+                if callee not in seen:
+                    seen.add(callee)
+                    memos.append(callee)
+
+        snapshot = []
+        for name in sorted(names):
+            value = values.get(name, UNDEFINED)
+            # With its type, so that changing 1 to true counts as a change
+            snapshot.append((name, type(value), value))
+        return tuple(snapshot)
+
+    def key(self, arguments: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        # Arguments' types are part of the key, since 1 == 1.0 == true
+        return (*arguments, *map(type, arguments))
+
+    def get(self, key: Tuple[Any, ...]) -> Any:
+        result = self.results.get(key, MISSING)
+        if result is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            if self.lru:
+                self.results.move_to_end(key)
+        return result
+
+    def put(self, key: Tuple[Any, ...], result: Any) -> None:
+        self.results[key] = result
+        if self.size is not None and len(self.results) > self.size:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "function": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.results),
+        }
+
+    def __len__(self):
+        return len(self.results)
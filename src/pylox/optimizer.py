@@ -0,0 +1,164 @@
+from typing import Any, List, Optional
+
+from . import ast
+from .exceptions import LoxRuntimeError
+from .token import TokenType as T
+
+
+class Optimizer(ast.ExprVisitor, ast.StmtVisitor):
+    # Rewrites a parsed program before it is resolved: folds operators whose
+    # operands are all literals, prunes branches and loops whose condition is a
+    # literal, and drops statements after a return. Anything that would raise a
+    # runtime error is left in place, so the error still happens when, and
+    # only if, the code runs.
+
+    def __init__(self):
+        from .interpreter import Interpreter
+
+        # Folding evaluates operators with the interpreter's own visit methods,
+        # so folded values are exactly what execution would have produced. They
+        # never touch the lox instance, or run any user code.
+        self.evaluator = Interpreter(None)
+
+    def optimize(self, statements: List[ast.Stmt]) -> List[ast.Stmt]:
+        optimized: List[ast.Stmt] = []
+        for statement in statements:
+            result = self.optimize_stmt(statement)
+            if result is None:
+                continue
+
+            optimized.append(result)
+            if isinstance(result, ast.ReturnStmt):
+                # Anything else in this block is unreachable
+                break
+
+        return optimized
+
+    def optimize_stmt(self, stmt: ast.Stmt) -> Optional[ast.Stmt]:
+        # Returns None if the statement can be removed entirely
+        return stmt.accept(self)
+
+    def optimize_nested(self, stmt: ast.Stmt) -> ast.Stmt:
+        # For statements that can't simply be removed, like the body of a loop
+        result = self.optimize_stmt(stmt)
+        if result is None:
+            return ast.BlockStmt([])
+        return result
+
+    def optimize_expr(self, expr: ast.Expr) -> ast.Expr:
+        return expr.accept(self)
+
+    def fold(self, expr: ast.Expr) -> ast.Expr:
+        try:
+            value = self.evaluator.evaluate(expr)
+        except (LoxRuntimeError, TypeError):
+            # Leave it to fail at runtime
+            return expr
+        return ast.LiteralExpr(value)
+
+    def is_literal(self, *exprs: ast.Expr) -> bool:
+        return all(isinstance(expr, ast.LiteralExpr) for expr in exprs)
+
+    def is_truthy(self, value: Any) -> bool:
+        return self.evaluator.is_truthy(value)
+
+    def visit_block_stmt(self, stmt: ast.BlockStmt):
+        return ast.BlockStmt(self.optimize(stmt.statements))
+
+    def visit_expression_stmt(self, stmt: ast.ExpressionStmt):
+        expression = self.optimize_expr(stmt.expression)
+        if self.is_literal(expression):
+            # Evaluating a literal has no effect
+            return None
+        return ast.ExpressionStmt(expression)
+
+    def visit_function_stmt(self, stmt: ast.FunctionStmt):
+        return ast.FunctionStmt(stmt.name, stmt.params, self.optimize(stmt.body))
+
+    def visit_if_stmt(self, stmt: ast.IfStmt):
+        condition = self.optimize_expr(stmt.condition)
+
+        if isinstance(condition, ast.LiteralExpr):
+            if self.is_truthy(condition.value):
+                return self.optimize_stmt(stmt.then_branch)
+            if stmt.else_branch is not None:
+                return self.optimize_stmt(stmt.else_branch)
+            return None
+
+        else_branch = None
+        if stmt.else_branch is not None:
+            else_branch = self.optimize_stmt(stmt.else_branch)
+        return ast.IfStmt(
+            condition, self.optimize_nested(stmt.then_branch), else_branch
+        )
+
+    def visit_print_stmt(self, stmt: ast.PrintStmt):
+        return ast.PrintStmt(self.optimize_expr(stmt.expression))
+
+    def visit_return_stmt(self, stmt: ast.ReturnStmt):
+        if stmt.value is None:
+            return stmt
+        return ast.ReturnStmt(stmt.keyword, self.optimize_expr(stmt.value))
+
+    def visit_var_stmt(self, stmt: ast.VarStmt):
+        if stmt.intitializer is None:
+            return stmt
+        return ast.VarStmt(stmt.name, self.optimize_expr(stmt.intitializer))
+
+    def visit_while_stmt(self, stmt: ast.WhileStmt):
+        condition = self.optimize_expr(stmt.condition)
+        if isinstance(condition, ast.LiteralExpr) and not self.is_truthy(
+            condition.value
+        ):
+            return None
+        return ast.WhileStmt(condition, self.optimize_nested(stmt.body), stmt.keyword)
+
+    def visit_assign_expr(self, expr: ast.AssignExpr):
+        return ast.AssignExpr(expr.name, self.optimize_expr(expr.value))
+
+    def visit_binary_expr(self, expr: ast.BinaryExpr):
+        left = self.optimize_expr(expr.left)
+        right = self.optimize_expr(expr.right)
+        optimized = ast.BinaryExpr(left, expr.operator, right)
+
+        if self.is_literal(left, right):
+            return self.fold(optimized)
+        return optimized
+
+    def visit_call_expr(self, expr: ast.CallExpr):
+        return ast.CallExpr(
+            self.optimize_expr(expr.callee),
+            expr.paren,
+            [self.optimize_expr(argument) for argument in expr.arguments],
+        )
+
+    def visit_grouping_expr(self, expr: ast.GroupingExpr):
+        # Grouping only matters to the parser
+        return self.optimize_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: ast.LiteralExpr):
+        return expr
+
+    def visit_logical_expr(self, expr: ast.LogicalExpr):
+        left = self.optimize_expr(expr.left)
+        right = self.optimize_expr(expr.right)
+
+        if isinstance(left, ast.LiteralExpr):
+            # The left operand alone decides which operand is the result
+            truthy = self.is_truthy(left.value)
+            if expr.operator.type == T.OR:
+                return left if truthy else right
+            return right if truthy else left
+
+        return ast.LogicalExpr(left, expr.operator, right)
+
+    def visit_unary_expr(self, expr: ast.UnaryExpr):
+        right = self.optimize_expr(expr.right)
+        optimized = ast.UnaryExpr(expr.operator, right)
+
+        if self.is_literal(right):
+            return self.fold(optimized)
+        return optimized
+
+    def visit_variable_expr(self, expr: ast.VariableExpr):
+        return expr
@@ -1,12 +1,50 @@
-from typing import List, Optional
+from enum import IntEnum
+from typing import Iterable, List, Optional
 
 from . import ast
 from .exceptions import ParseError
-from .token import Token
+from .token import TOKEN_TYPES, TYPE_INDEX, Token, TokenBuffer
 from .token import TokenType as T
 
 ARGUMENT_LIMIT = 255
 
+# How many levels an expression's syntax tree may have. Every pass over the
+# tree recurses into each level, so deeper expressions would exhaust Python's
+# stack rather than report an error.
+MAX_NESTING = 128
+
+
+class Precedence(IntEnum):
+    # Lowest to highest
+    ASSIGNMENT = 1
+    OR = 2
+    AND = 3
+    EQUALITY = 4
+    COMPARISON = 5
+    TERM = 6
+    FACTOR = 7
+    UNARY = 8
+    CALL = 9
+
+
+# How tightly each infix operator binds its left operand
+BINDING_POWER = {
+    T.EQUAL: Precedence.ASSIGNMENT,
+    T.OR: Precedence.OR,
+    T.AND: Precedence.AND,
+    T.BANG_EQUAL: Precedence.EQUALITY,
+    T.EQUAL_EQUAL: Precedence.EQUALITY,
+    T.GREATER: Precedence.COMPARISON,
+    T.GREATER_EQUAL: Precedence.COMPARISON,
+    T.LESS: Precedence.COMPARISON,
+    T.LESS_EQUAL: Precedence.COMPARISON,
+    T.MINUS: Precedence.TERM,
+    T.PLUS: Precedence.TERM,
+    T.SLASH: Precedence.FACTOR,
+    T.STAR: Precedence.FACTOR,
+    T.LEFT_PAREN: Precedence.CALL,
+}
+
 
 class Parser:
     def __init__(self, lox, tokens: List[Token]):
@@ -15,6 +53,10 @@ class Parser:
         self.lox: Lox = lox
         self.tokens = tokens
         self.current = 0
+        # Nested parse_precedence calls, and the height of the expression
+        # parsed last
+        self.depth = 0
+        self.height = 0
 
     def parse(self) -> List[ast.Stmt]:
         statements: List[ast.Stmt] = []
@@ -23,7 +65,7 @@ class Parser:
         return statements
 
     def expression(self) -> ast.Expr:
-        return self.assignment()
+        return self.parse_precedence(Precedence.ASSIGNMENT)
 
     def declaration(self) -> ast.Stmt:
         try:
@@ -52,6 +94,7 @@ class Parser:
         return self.expression_statement()
 
     def for_statement(self) -> ast.Stmt:
+        keyword = self.previous()
         self.consume(T.LEFT_PAREN, 'Expect "(" after "for".')
 
         initializer: Optional[ast.Stmt] = None
@@ -80,7 +123,7 @@ class Parser:
         if condition is None:
             condition = ast.LiteralExpr(True)
 
-        body = ast.WhileStmt(condition, body)
+        body = ast.WhileStmt(condition, body, keyword)
 
         if initializer is not None:
             body = ast.BlockStmt([initializer, body])
@@ -123,11 +166,12 @@ class Parser:
         return ast.VarStmt(name, initializer)
 
     def while_statement(self) -> ast.Stmt:
+        keyword = self.previous()
         self.consume(T.LEFT_PAREN, 'Expect "(" after "while".')
         condition = self.expression()
         self.consume(T.RIGHT_PAREN, 'Expect ")" after condition.')
         body = self.statement()
-        return ast.WhileStmt(condition, body)
+        return ast.WhileStmt(condition, body, keyword)
 
     def expression_statement(self) -> ast.Stmt:
         expr = self.expression()
@@ -162,97 +206,73 @@ class Parser:
         self.consume(T.RIGHT_BRACE, 'Expect "}" after block.')
         return statements
 
-    def assignment(self) -> ast.Expr:
-        expr = self.or_()
-
-        if self.match(T.EQUAL):
-            equals = self.previous()
-            value = self.assignment()
-
-            if isinstance(expr, ast.VariableExpr):
-                name = expr.name
-                return ast.AssignExpr(name, value)
-
-            self.error(equals, "Invalid assignment target.")
-
-        return expr
-
-    def or_(self) -> ast.Expr:
-        expr = self.and_()
-        while self.match(T.OR):
-            operator = self.previous()
-            right = self.and_()
-            expr = ast.LogicalExpr(expr, operator, right)
-        return expr
-
-    def and_(self) -> ast.Expr:
-        expr = self.equality()
-
-        while self.match(T.AND):
-            operator = self.previous()
-            right = self.equality()
-            expr = ast.LogicalExpr(expr, operator, right)
-        return expr
-
-    def equality(self) -> ast.Expr:
-        expr = self.comparison()
-
-        while self.match(T.BANG_EQUAL, T.EQUAL_EQUAL):
-            operator = self.previous()
-            right = self.comparison()
-            expr = ast.BinaryExpr(expr, operator, right)
-
-        return expr
-
-    def comparison(self) -> ast.Expr:
-        expr = self.term()
-
-        while self.match(T.GREATER, T.GREATER_EQUAL, T.LESS, T.LESS_EQUAL):
-            operator = self.previous()
-            right = self.term()
-            expr = ast.BinaryExpr(expr, operator, right)
-
-        return expr
-
-    def term(self) -> ast.Expr:
-        expr = self.factor()
+    def parse_precedence(self, precedence: int) -> ast.Expr:
+        # Parses a prefix expression, then keeps folding it into the left
+        # operand of any infix operator binding at least as tightly as
+        # precedence. Left-associative operators parse their right operand one
+        # level tighter, so a chain of them is a loop rather than recursion.
+        self.depth += 1
+        if self.depth > MAX_NESTING:
+            raise self.too_deep(self.previous())
+        try:
+            expr = self.prefix()
 
-        while self.match(T.MINUS, T.PLUS):
-            operator = self.previous()
-            right = self.factor()
-            expr = ast.BinaryExpr(expr, operator, right)
+            while True:
+                type_ = self.peek_type()
+                binding = BINDING_POWER.get(type_)
+                if binding is None or binding < precedence:
+                    return expr
+
+                if type_ is T.LEFT_PAREN:
+                    expr = self.parse_calls(expr)
+                    continue
+
+                operator = self.advance()
+                if type_ is T.EQUAL:
+                    return self.finish_assignment(expr, operator)
+
+                left = self.height
+                right = self.parse_precedence(binding + 1)
+                self.nest(max(left, self.height), operator)
+                if type_ is T.OR or type_ is T.AND:
+                    expr = ast.LogicalExpr(expr, operator, right)
+                else:
+                    expr = ast.BinaryExpr(expr, operator, right)
+        finally:
+            self.depth -= 1
+
+    def prefix(self) -> ast.Expr:
+        # Unary operators are gathered in a loop, and applied innermost first
+        operators = []
+        while self.match(T.BANG, T.MINUS):
+            operators.append(self.previous())
 
+        expr = self.primary()
+        if operators:
+            expr = self.parse_calls(expr)
+            self.nest(self.height + len(operators) - 1, operators[0])
+            for operator in reversed(operators):
+                expr = ast.UnaryExpr(operator, expr)
         return expr
 
-    def factor(self) -> ast.Expr:
-        expr = self.unary()
-
-        while self.match(T.SLASH, T.STAR):
-            operator = self.previous()
-            right = self.unary()
-            expr = ast.BinaryExpr(expr, operator, right)
-
+    def parse_calls(self, expr: ast.Expr) -> ast.Expr:
+        while self.match(T.LEFT_PAREN):
+            expr = self.finish_call(expr)
         return expr
 
-    def unary(self) -> ast.Expr:
-        if self.match(T.BANG, T.MINUS):
-            operator = self.previous()
-            right = self.unary()
-            return ast.UnaryExpr(operator, right)
-        return self.call()
+    def finish_assignment(self, target: ast.Expr, equals: Token) -> ast.Expr:
+        # Assignment is right-associative
+        value = self.parse_precedence(Precedence.ASSIGNMENT)
+        self.nest(self.height, equals)
 
-    def call(self) -> ast.Expr:
-        expr = self.primary()
+        if isinstance(target, ast.VariableExpr):
+            return ast.AssignExpr(target.name, value)
 
-        while True:
-            if self.match(T.LEFT_PAREN):
-                expr = self.finish_call(expr)
-            else:
-                break
-
-        return expr
+        self.error(equals, "Invalid assignment target.")
+        return target
 
     def finish_call(self, callee: ast.Expr) -> ast.Expr:
+        height = self.height
         arguments: List[ast.Expr] = []
         if not self.check(T.RIGHT_PAREN):
 
@@ -263,29 +283,34 @@ class Parser:
                         self.peek(), f"Can't have more than {ARGUMENT_LIMIT} arguments."
                     )
                 arguments.append(self.expression())
+                height = max(height, self.height)
                 if not self.match(T.COMMA):
                     break
 
         paren = self.consume(T.RIGHT_PAREN, 'Expect ")" after arguments.')
+        self.nest(height, paren)
 
         return ast.CallExpr(callee, paren, arguments)
 
     def primary(self) -> ast.Expr:
-        if self.match(T.FALSE):
-            return ast.LiteralExpr(False)
-        if self.match(T.TRUE):
-            return ast.LiteralExpr(True)
-
-        if self.match(T.NUMBER, T.STRING):
-            return ast.LiteralExpr(self.previous().literal)
-
-        if self.match(T.IDENTIFIER):
-            return ast.VariableExpr(self.previous())
-
-        if self.match(T.LEFT_PAREN):
-            expr = self.expression()
-            self.consume(T.RIGHT_PAREN, 'Expect ")" after expression.')
-            return ast.GroupingExpr(expr)
+        self.height = 1
+        match self.peek_type():
+            case T.IDENTIFIER:
+                return ast.VariableExpr(self.advance())
+            case T.NUMBER | T.STRING:
+                return ast.LiteralExpr(self.advance().literal)
+            case T.FALSE:
+                self.advance()
+                return ast.LiteralExpr(False)
+            case T.TRUE:
+                self.advance()
+                return ast.LiteralExpr(True)
+            case T.LEFT_PAREN:
+                paren = self.advance()
+                expr = self.expression()
+                self.consume(T.RIGHT_PAREN, 'Expect ")" after expression.')
+                self.nest(self.height, paren)
+                return ast.GroupingExpr(expr)
 
         raise self.error(self.peek(), "Expect expression.")
 
@@ -307,6 +332,9 @@ class Parser:
             return False
         return self.peek().type == type_
 
+    def peek_type(self) -> T:
+        return self.peek().type
+
     def advance(self) -> Token:
         if not self.is_at_end():
             self.current += 1
@@ -321,6 +349,18 @@ class Parser:
     def previous(self) -> Token:
         return self.tokens[self.current - 1]
 
+    def nest(self, height: int, token: Token):
+        # Records the height of an expression one level above a subexpression
+        # of the given height
+        if height >= MAX_NESTING:
+            raise self.too_deep(token)
+        self.height = height + 1
+
+    def too_deep(self, token: Token) -> ParseError:
+        return self.error(
+            token, f"Can't nest expressions more than {MAX_NESTING} levels deep."
+        )
+
     def error(self, token: Token, message: str) -> ParseError:
         self.lox.error(token, message)
         return ParseError()
@@ -346,3 +386,68 @@ class Parser:
                     return
 
             self.advance()
+
+
+class StreamingParser(Parser):
+    # Pulls tokens from an iterator as it needs them, rather than indexing into
+    # a list, so only the current and previous tokens are held at any time.
+
+    def __init__(self, lox, tokens: Iterable[Token]):
+        super().__init__(lox, [])
+        self.stream = iter(tokens)
+        self.next_token = next(self.stream)
+        self.previous_token = self.next_token
+
+    def advance(self) -> Token:
+        if not self.is_at_end():
+            self.previous_token = self.next_token
+            self.next_token = next(self.stream)
+        return self.previous_token
+
+    def peek(self) -> Token:
+        return self.next_token
+
+    def previous(self) -> Token:
+        return self.previous_token
+
+
+class BufferParser(Parser):
+    # Parses from a TokenBuffer. Token types are compared as the buffer's ints,
+    # and Token objects are only created for tokens the parser keeps, like
+    # names and operators.
+
+    def __init__(self, lox, tokens: TokenBuffer):
+        super().__init__(lox, [])
+        self.buffer = tokens
+        self.types = tokens.types
+        self.eof = TYPE_INDEX[T.EOF]
+
+    def match(self, *types: T) -> bool:
+        type_ = self.types[self.current]
+        if type_ != self.eof and TOKEN_TYPES[type_] in types:
+            self.current += 1
+            return True
+        return False
+
+    def consume(self, type_: T, message: str):
+        if self.check(type_):
+            self.current += 1
+            return self.previous()
+
+        raise self.error(self.peek(), message)
+
+    def check(self, type_: T) -> bool:
+        current = TOKEN_TYPES[self.types[self.current]]
+        return current is type_ and current is not T.EOF
+
+    def is_at_end(self):
+        return self.types[self.current] == self.eof
+
+    def peek_type(self) -> T:
+        return TOKEN_TYPES[self.types[self.current]]
+
+    def peek(self) -> Token:
+        return self.buffer[self.current]
+
+    def previous(self) -> Token:
+        return self.buffer[self.current - 1]
@@ -0,0 +1,228 @@
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import ast
+from .hooks import HookedInterpreter, line_of
+from .interpreter import Function, Interpreter
+
+MODES = ("sampling", "exact")
+
+# Seconds between samples, in sampling mode
+INTERVAL = 0.001
+
+# The outermost frame of every stack
+SCRIPT = "<script>"
+
+Stack = Tuple[str, ...]
+
+
+def label(declaration: ast.FunctionStmt) -> str:
+    return f"{declaration.name.lexeme}:{declaration.name.line}"
+
+
+class Profiler:
+    # Attributes the time a script takes to the Lox functions and source lines
+    # running, for the tree-walk interpreter.
+    #
+    # In exact mode, hooks report every function call and statement, and the
+    # time between each report is added to the stack of functions and the line
+    # running. It counts calls, but slows everything down. In sampling mode, a
+    # thread looks at what the interpreter's Python stack is doing every
+    # interval seconds, so the script runs at nearly full speed, and time is
+    # estimated from the number of samples.
+    def __init__(self, mode: str = "sampling", interval: float = INTERVAL):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}'.")
+
+        self.mode = mode
+        self.interval = interval
+        # Time (exact mode) or samples (sampling mode) per stack and line
+        self.weights: Counter[Tuple[Stack, Optional[int]]] = Counter()
+        self.calls: Counter[str] = Counter()
+        self.elapsed = 0.0
+
+        # Exact mode state: the stack of functions, and the line each is on
+        self.stacks: List[Stack] = [(SCRIPT,)]
+        self.lines: List[Optional[int]] = [None]
+        self.last = 0.0
+
+        # Sampling mode state
+        self.thread_id = 0
+        self.sampler: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+        self.line_cache: Dict[Any, Optional[int]] = {}
+
+    def attach(self, lox) -> None:
+        if type(lox.interpreter) not in (Interpreter, HookedInterpreter):
+            raise ValueError("Only the tree engine can be profiled.")
+
+        if self.mode == "exact":
+            lox.add_hook("call", self.call)
+            lox.add_hook("return", self.leave)
+            lox.add_hook("statement", self.statement)
+
+    def __enter__(self) -> "Profiler":
+        self.elapsed = time.perf_counter()
+        self.last = self.elapsed
+        if self.mode == "sampling":
+            self.thread_id = threading.get_ident()
+            self.sampler = threading.Thread(target=self.sample_loop, daemon=True)
+            self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.sampler is not None:
+            self.stopped.set()
+            self.sampler.join()
+        else:
+            self.tick()
+        self.elapsed = time.perf_counter() - self.elapsed
+
+    # Exact mode
+
+    def tick(self) -> None:
+        # Adds the time since the last event to whatever was running
+        now = time.perf_counter()
+        self.weights[self.stacks[-1], self.lines[-1]] += now - self.last
+        self.last = now
+
+    def call(self, function: Function, arguments: List[Any], tail: bool) -> None:
+        self.tick()
+        if tail:
+            # The callee runs in place of its caller
+            self.stacks.pop()
+            self.lines.pop()
+
+        name = label(function.declaration)
+        self.calls[name] += 1
+        self.stacks.append(self.stacks[-1] + (name,))
+        self.lines.append(self.lines[-1])
+
+    def leave(self, function: Function, value: Any) -> None:
+        self.tick()
+        self.stacks.pop()
+        self.lines.pop()
+
+    def statement(self, stmt: ast.Stmt, line: Optional[int]) -> None:
+        # Time is the latest statement's until the next one starts. A statement
+        # without a line of its own is part of the enclosing one.
+        self.tick()
+        if line is not None:
+            self.lines[-1] = line
+
+    # Sampling mode
+
+    def sample_loop(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.weights[self.sample(frame)] += 1
+
+    def sample(self, frame: Any) -> Tuple[Stack, Optional[int]]:
+        # Rebuilds the Lox stack from the Python one: each Function.call (or
+        # HookedInterpreter.call_function) frame is running one Lox function,
+        # and the innermost visit method with a node that has a line says where
+        names: List[str] = []
+        line = None
+        while frame is not None:
+            code = frame.f_code
+            if code in CALL_CODES:
+                # Tail calls change the function a frame runs; until the first
+                # statement, it is the one called
+                local = frame.f_locals
+                function = local.get("function", local.get("self"))
+                names.append(label(function.declaration))
+            elif line is None and code.co_name.startswith("visit_"):
+                node = frame.f_locals.get("stmt", frame.f_locals.get("expr"))
+                if node is not None:
+                    line = self.cached_line_of(node)
+            frame = frame.f_back
+
+        names.append(SCRIPT)
+        return tuple(reversed(names)), line
+
+    def cached_line_of(self, node: Any) -> Optional[int]:
+        if node not in self.line_cache:
+            self.line_cache[node] = line_of(node)
+        return self.line_cache[node]
+
+    # Results
+
+    def seconds(self) -> float:
+        # Seconds per unit of weight
+        if self.mode == "exact":
+            return 1.0
+        total = sum(self.weights.values())
+        return self.elapsed / total if total else 0.0
+
+    def functions(self) -> Dict[str, Tuple[float, float]]:
+        # Self and total seconds of each function
+        scale = self.seconds()
+        times: Dict[str, Tuple[float, float]] = {}
+        for (stack, _), weight in self.weights.items():
+            seconds = weight * scale
+            for name in set(stack):
+                self_time, total = times.get(name, (0.0, 0.0))
+                if name == stack[-1]:
+                    self_time += seconds
+                times[name] = (self_time, total + seconds)
+        return times
+
+    def line_times(self) -> Dict[Optional[int], float]:
+        scale = self.seconds()
+        times: Counter[Optional[int]] = Counter()
+        for (_, line), weight in self.weights.items():
+            times[line] += weight * scale
+        return dict(times)
+
+    def report(self, limit: int = 20) -> str:
+        lines = [f"Profile ({self.mode}): {self.elapsed:.3f}s"]
+        total = self.elapsed or 1.0
+
+        lines.append("")
+        lines.append(
+            f"{'function':<24} {'calls':>8} {'self s':>9} {'%':>6} {'total s':>9}"
+        )
+        functions = sorted(
+            self.functions().items(), key=lambda item: item[1][0], reverse=True
+        )
+        for name, (self_time, total_time) in functions[:limit]:
+            calls = str(self.calls[name]) if self.mode == "exact" else "-"
+            if name == SCRIPT:
+                calls = ""
+            lines.append(
+                f"{name:<24} {calls:>8} {self_time:9.3f}"
+                f" {100 * self_time / total:6.1f} {total_time:9.3f}"
+            )
+
+        lines.append("")
+        lines.append(f"{'line':<8} {'self s':>9} {'%':>6}")
+        line_times = sorted(self.line_times().items(), key=lambda item: -item[1])
+        for line, seconds in line_times[:limit]:
+            where = "?" if line is None else str(line)
+            lines.append(f"{where:<8} {seconds:9.3f} {100 * seconds / total:6.1f}")
+
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self) -> str:
+        # One "frame;frame;...;line N weight" line per stack, the format
+        # flamegraph.pl and most other flame graph tools read. Weights are
+        # microseconds in exact mode, and samples in sampling mode.
+        scale = 1_000_000 if self.mode == "exact" else 1
+        counts: Counter[str] = Counter()
+        for (stack, line), weight in self.weights.items():
+            frames = ";".join(stack)
+            if line is not None:
+                frames += f";line {line}"
+            counts[frames] += round(weight * scale)
+
+        return "".join(
+            f"{frames} {count}\n" for frames, count in sorted(counts.items()) if count
+        )
+
+
+# Frames of these run Lox functions, with hooks or without
+CALL_CODES = {Function.call.__code__, HookedInterpreter.call_function.__code__}
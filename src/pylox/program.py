@@ -0,0 +1,210 @@
+import sys
+from dataclasses import dataclass
+from io import StringIO
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from . import ast
+from .exceptions import LoxRuntimeError
+from .interpreter import Callable
+from .limits import Limits
+from .lox import ENGINES, Lox
+from .optimizer import Optimizer
+from .parser import BufferParser
+from .scanner import RegexScanner
+
+# Python values which are also Lox values, and so can be given to a program
+# as globals
+LOX_TYPES = (type(None), bool, int, float, str, Callable)
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    line: int
+    where: str  # e.g. " at 'x'", or "" if the error isn't at a token
+    message: str
+
+    def __str__(self):
+        return f"[line {self.line}] Error{self.where}: {self.message}"
+
+
+class CompileError(Exception):
+    # Every syntax and resolution error found while compiling, in order
+    def __init__(self, errors: List[Diagnostic]):
+        super().__init__("\n".join(str(error) for error in errors))
+        self.errors = errors
+
+
+class EmbeddedLox(Lox):
+    # Collects errors instead of printing them, for compile() to raise
+    # together, and raises runtime errors for Program.run's caller
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.errors: List[Diagnostic] = []
+
+    def report(self, line: int, where: str, message: str):
+        self.errors.append(Diagnostic(line, where, message))
+        self.had_error = True
+
+    def runtime_error(self, error: LoxRuntimeError):
+        self.had_runtime_error = True
+        raise error
+
+
+class Runner:
+    # An interpreter with a program prepared for it (as bytecode, closures or
+    # Python code), to run the program for one caller at a time. Each run
+    # starts from the natives it was made with, and limits of its own, which
+    # take each run's bounds, as the closure engine binds them in.
+    __slots__ = ("interpreter", "prepared", "limits", "natives")
+
+    def __init__(self, program: "Program", limited: bool):
+        lox = EmbeddedLox(out=StringIO(), err=StringIO(), engine=program.engine)
+        interpreter = self.interpreter = lox.interpreter
+        interpreter.locals = dict(program.locals)
+        interpreter.slots = dict(program.slots)
+        interpreter.scope_sizes = dict(program.scope_sizes)
+        self.limits = Limits() if limited else None
+        interpreter.limits = self.limits
+        self.natives = dict(interpreter.globals.values)
+        self.prepared = interpreter.prepare(list(program.statements))
+
+    def start(self, globals: Dict[str, Any], out, limits: Optional[Limits]):
+        interpreter = self.interpreter
+        interpreter.out = out
+        if self.limits is not None and limits is not None:
+            self.limits.adopt(limits)
+
+        # Values are replaced in place, as prepared code may hold the globals.
+        # Their version only ever goes up, so no cached read from a run before
+        # is good in this one.
+        environment = interpreter.environment = interpreter.globals
+        environment.values.clear()
+        environment.values.update(self.natives)
+        environment.version += 1
+        for name, value in globals.items():
+            environment.define(name, value)
+        return interpreter
+
+
+class Program:
+    # A script scanned, parsed, resolved and prepared for its engine once, to
+    # be run any number of times. Runs share nothing but the program: each
+    # starts from fresh globals, on a Runner no other run is using at the
+    # time, so a program can be run from several threads at once. Runners are
+    # kept for the next run, limited and unlimited apart, and made as needed.
+    __slots__ = (
+        "engine",
+        "optimize",
+        "statements",
+        "locals",
+        "slots",
+        "scope_sizes",
+        "runners",
+    )
+
+    engine: str
+    optimize: bool
+    statements: Tuple[ast.Stmt, ...]
+    locals: Mapping[ast.Expr, Tuple[int, int]]
+    slots: Mapping[ast.Stmt, int]
+    scope_sizes: Mapping[ast.Stmt, int]
+    runners: Dict[bool, List[Runner]]  # idle, by whether they're limited
+
+    def __init__(
+        self, engine: str, optimize: bool, lox: EmbeddedLox, statements: List[ast.Stmt]
+    ):
+        interpreter = lox.interpreter
+        values = {
+            "engine": engine,
+            "optimize": optimize,
+            "statements": tuple(statements),
+            "locals": MappingProxyType(dict(interpreter.locals)),
+            "slots": MappingProxyType(dict(interpreter.slots)),
+            "scope_sizes": MappingProxyType(dict(interpreter.scope_sizes)),
+            "runners": {False: [], True: []},
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+        # Prepared now, so the first run doesn't pay for it
+        self.runners[False].append(Runner(self, False))
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("Programs are immutable.")
+
+    def run(
+        self,
+        globals: Optional[Dict[str, Any]] = None,
+        out=sys.stdout,
+        limits: Optional[Limits] = None,
+    ) -> Dict[str, Any]:
+        # Runs the program with the given globals defined, returning the
+        # globals as it left them. Raises LoxRuntimeError if it fails, or
+        # LoxLimitError if it goes past the bounds of limits, which are
+        # counted afresh for each run.
+        globals = self.check(globals)
+        runner = self.checkout(limits is not None)
+        try:
+            interpreter = runner.start(globals, out, limits)
+            interpreter.run_prepared(runner.prepared)
+            return dict(interpreter.globals.values)
+        finally:
+            self.runners[runner.limits is not None].append(runner)
+
+    async def run_async(
+        self,
+        globals: Optional[Dict[str, Any]] = None,
+        out=sys.stdout,
+        limits: Optional[Limits] = None,
+    ) -> Dict[str, Any]:
+        # Like run, but lets other tasks on the event loop run while the
+        # program does, and awaits async native functions. Needs a program
+        # compiled for the vm engine.
+        if self.engine != "vm":
+            raise ValueError("run_async needs the vm engine.")
+        globals = self.check(globals)
+        runner = self.checkout(limits is not None)
+        try:
+            interpreter = runner.start(globals, out, limits)
+            await interpreter.run_prepared_async(runner.prepared)
+            return dict(interpreter.globals.values)
+        finally:
+            self.runners[runner.limits is not None].append(runner)
+
+    def checkout(self, limited: bool) -> Runner:
+        # list.pop is atomic, so no two threads get the same runner
+        try:
+            return self.runners[limited].pop()
+        except IndexError:
+            return Runner(self, limited)
+
+    def check(self, globals: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        globals = globals or {}
+        for name, value in globals.items():
+            if not isinstance(value, LOX_TYPES):
+                raise TypeError(
+                    f"Global '{name}' is a {type(value).__name__}, "
+                    "which isn't a Lox value."
+                )
+        return globals
+
+
+def compile(source: str, engine: str = "tree", optimize: bool = False) -> Program:
+    # Scans, parses and resolves source, raising CompileError with every
+    # error found if there are any
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'.")
+
+    lox = EmbeddedLox(out=StringIO(), err=StringIO(), engine=engine)
+    tokens = RegexScanner(lox, source).scan_buffer()
+    # Parsed a declaration at a time, like a stream, to go on past a syntax
+    # error and find any others
+    statements = list(lox.parse_stream(BufferParser(lox, tokens)))
+    if not lox.had_error:
+        if optimize:
+            statements = Optimizer().optimize(statements)
+        lox.resolve(statements)
+    if lox.had_error:
+        raise CompileError(lox.errors)
+
+    return Program(engine, optimize, lox, statements)
@@ -0,0 +1,175 @@
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Dict, List, Union
+
+from . import ast
+from .token import Token
+
+
+class FunctionType(Enum):
+    NONE = auto()
+    FUNCTION = auto()
+
+
+@dataclass
+class Local:
+    slot: int
+    defined: bool = False
+
+
+# Static pass between the parser and interpreter, which works out how many
+# environments away each local variable lives, and which slot it occupies there.
+# Unresolved variables are global.
+class Resolver(ast.ExprVisitor, ast.StmtVisitor):
+    def __init__(self, lox, interpreter):
+        from .interpreter import Interpreter
+        from .lox import Lox
+
+        self.lox: Lox = lox
+        self.interpreter: Interpreter = interpreter
+        # Innermost scope last. Slots are numbered in declaration order.
+        self.scopes: List[Dict[str, Local]] = []
+        self.current_function = FunctionType.NONE
+
+    def resolve(self, statements: List[ast.Stmt]) -> None:
+        for statement in statements:
+            self.resolve_stmt(statement)
+
+    def resolve_stmt(self, stmt: ast.Stmt) -> None:
+        stmt.accept(self)
+
+    def resolve_expr(self, expr: ast.Expr) -> None:
+        expr.accept(self)
+
+    def resolve_local(self, expr: ast.Expr, name: Token) -> None:
+        for depth, scope in enumerate(reversed(self.scopes)):
+            if name.lexeme in scope:
+                self.interpreter.resolve(expr, depth, scope[name.lexeme].slot)
+                return
+
+    def resolve_function(self, function: ast.FunctionStmt, type_: FunctionType):
+        enclosing_function = self.current_function
+        self.current_function = type_
+
+        self.begin_scope()
+        for param in function.params:
+            self.declare(param)
+            self.define(param)
+        self.resolve(function.body)
+        self.end_scope(function)
+
+        self.current_function = enclosing_function
+
+    def begin_scope(self) -> None:
+        self.scopes.append({})
+
+    def end_scope(self, owner: Union[ast.BlockStmt, ast.FunctionStmt]) -> None:
+        scope = self.scopes.pop()
+        self.interpreter.resolve_scope(owner, len(scope))
+
+    def declare(self, name: Token) -> None:
+        if not self.scopes:
+            return
+
+        scope = self.scopes[-1]
+        if name.lexeme in scope:
+            self.lox.error(name, "Already a variable with this name in this scope.")
+            return
+        scope[name.lexeme] = Local(len(scope))
+
+    def define(self, name: Token) -> None:
+        if not self.scopes:
+            return
+        self.scopes[-1][name.lexeme].defined = True
+
+    def declare_slot(self, stmt: ast.Stmt, name: Token) -> None:
+        if self.scopes:
+            self.interpreter.resolve_declaration(
+                stmt, self.scopes[-1][name.lexeme].slot
+            )
+
+    def visit_block_stmt(self, stmt: ast.BlockStmt):
+        # A block which declares nothing directly doesn't need its own scope, so
+        # we save the interpreter from creating an environment for it.
+        if not any(
+            isinstance(statement, (ast.VarStmt, ast.FunctionStmt))
+            for statement in stmt.statements
+        ):
+            self.resolve(stmt.statements)
+            return
+
+        self.begin_scope()
+        self.resolve(stmt.statements)
+        self.end_scope(stmt)
+
+    def visit_expression_stmt(self, stmt: ast.ExpressionStmt):
+        self.resolve_expr(stmt.expression)
+
+    def visit_function_stmt(self, stmt: ast.FunctionStmt):
+        # Define eagerly, so the function can refer to itself recursively
+        self.declare(stmt.name)
+        self.define(stmt.name)
+        self.declare_slot(stmt, stmt.name)
+        self.resolve_function(stmt, FunctionType.FUNCTION)
+
+    def visit_if_stmt(self, stmt: ast.IfStmt):
+        self.resolve_expr(stmt.condition)
+        self.resolve_stmt(stmt.then_branch)
+        if stmt.else_branch is not None:
+            self.resolve_stmt(stmt.else_branch)
+
+    def visit_print_stmt(self, stmt: ast.PrintStmt):
+        self.resolve_expr(stmt.expression)
+
+    def visit_return_stmt(self, stmt: ast.ReturnStmt):
+        if self.current_function == FunctionType.NONE:
+            self.lox.error(stmt.keyword, "Can't return from top-level code.")
+
+        if stmt.value is not None:
+            self.resolve_expr(stmt.value)
+
+    def visit_var_stmt(self, stmt: ast.VarStmt):
+        self.declare(stmt.name)
+        if stmt.intitializer is not None:
+            self.resolve_expr(stmt.intitializer)
+        self.define(stmt.name)
+        self.declare_slot(stmt, stmt.name)
+
+    def visit_while_stmt(self, stmt: ast.WhileStmt):
+        self.resolve_expr(stmt.condition)
+        self.resolve_stmt(stmt.body)
+
+    def visit_assign_expr(self, expr: ast.AssignExpr):
+        self.resolve_expr(expr.value)
+        self.resolve_local(expr, expr.name)
+
+    def visit_binary_expr(self, expr: ast.BinaryExpr):
+        self.resolve_expr(expr.left)
+        self.resolve_expr(expr.right)
+
+    def visit_call_expr(self, expr: ast.CallExpr):
+        self.resolve_expr(expr.callee)
+        for argument in expr.arguments:
+            self.resolve_expr(argument)
+
+    def visit_grouping_expr(self, expr: ast.GroupingExpr):
+        self.resolve_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: ast.LiteralExpr):
+        pass
+
+    def visit_logical_expr(self, expr: ast.LogicalExpr):
+        self.resolve_expr(expr.left)
+        self.resolve_expr(expr.right)
+
+    def visit_unary_expr(self, expr: ast.UnaryExpr):
+        self.resolve_expr(expr.right)
+
+    def visit_variable_expr(self, expr: ast.VariableExpr):
+        local = self.scopes[-1].get(expr.name.lexeme) if self.scopes else None
+        if local is not None and not local.defined:
+            self.lox.error(
+                expr.name, "Can't read local variable in its own initializer."
+            )
+
+        self.resolve_local(expr, expr.name)
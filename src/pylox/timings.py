@@ -0,0 +1,73 @@
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import fields
+from typing import Any, Dict, Iterable, Iterator, List
+
+from . import ast
+
+
+def count_nodes(statements: List[ast.Stmt]) -> int:
+    count = 0
+    nodes: List[Any] = list(statements)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, list):
+            nodes.extend(node)
+        elif isinstance(node, (ast.Expr, ast.Stmt)):
+            count += 1
+            nodes.extend(getattr(node, field.name) for field in fields(node))
+    return count
+
+
+class Timings:
+    # Wall clock and CPU time spent in each phase of running a script (cache,
+    # scan, parse, optimize, resolve and interpret), and the size of what each
+    # phase worked on. Phases which run more than once, as when streaming, add
+    # up. Lox only keeps one when asked to, so an ordinary run doesn't pay for
+    # any of it.
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.source_bytes = 0
+        self.tokens = 0  # scanned, so none for a program from the cache
+        self.nodes = 0
+        self.statements = 0  # executed
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            totals = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            totals["wall"] += time.perf_counter() - wall
+            totals["cpu"] += time.process_time() - cpu
+
+    def count_source(self, chunks: Iterable[str]) -> Iterator[str]:
+        for chunk in chunks:
+            self.source_bytes += len(chunk.encode())
+            yield chunk
+
+    def count_tokens(self, tokens: Iterable[Any]) -> Iterator[Any]:
+        for token in tokens:
+            self.tokens += 1
+            yield token
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "phases": self.phases,
+            "total": {
+                "wall": sum(phase["wall"] for phase in self.phases.values()),
+                "cpu": sum(phase["cpu"] for phase in self.phases.values()),
+            },
+            "sizes": {
+                "source_bytes": self.source_bytes,
+                "tokens": self.tokens,
+                "nodes": self.nodes,
+                "statements_executed": self.statements,
+            },
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
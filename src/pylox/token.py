@@ -1,4 +1,8 @@
+from array import array
+from bisect import bisect_right
 from enum import Enum
+from sys import intern
+from typing import Dict, Tuple
 
 
 class TokenType(Enum):
@@ -52,6 +56,8 @@ class TokenType(Enum):
 
 
 class Token:
+    __slots__ = ("type", "lexeme", "literal", "line")
+
     def __init__(self, type_: TokenType, lexeme: str, literal: object, line: int):
         self.type = type_
         self.lexeme = lexeme
@@ -68,3 +74,73 @@ class Token:
             f'Token({self.type.name}, "{self.lexeme}", '
             f"{self.literal}, line={self.line})"
         )
+
+
+# Token types by index, as stored in a TokenBuffer
+TOKEN_TYPES = list(TokenType)
+TYPE_INDEX = {type_: index for index, type_ in enumerate(TOKEN_TYPES)}
+
+
+class TokenBuffer:
+    # Holds scanned tokens as parallel arrays of type index, start offset and
+    # length into the source, rather than as Token objects. Lexemes, literals
+    # and line numbers are only worked out when asked for, and a Token is
+    # only created for the tokens something actually keeps hold of.
+
+    def __init__(self, source: str):
+        self.source = source
+        self.types = array("i")
+        self.starts = array("i")
+        self.lengths = array("i")
+        self.newlines = array("i")  # offset of every newline in the source
+        self.shared: Dict[Tuple[int, str, int], Token] = {}
+
+    def append(self, type_: TokenType, start: int, length: int) -> None:
+        self.types.append(TYPE_INDEX[type_])
+        self.starts.append(start)
+        self.lengths.append(length)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __getitem__(self, index: int) -> Token:
+        type_index = self.types[index]
+        start = self.starts[index]
+        end = start + self.lengths[index]
+        line = self.line_at(end - 1)
+        type_ = TOKEN_TYPES[type_index]
+        if type_ is TokenType.NUMBER or type_ is TokenType.STRING:
+            return Token(type_, self.source[start:end], self.literal(index), line)
+
+        # Other tokens are fully described by their type, lexeme and line, so
+        # are shared between every node that refers to the same one, and
+        # names share the one interned string.
+        lexeme = intern(self.source[start:end])
+        key = (type_index, lexeme, line)
+        token = self.shared.get(key)
+        if token is None:
+            token = self.shared[key] = Token(type_, lexeme, None, line)
+        return token
+
+    def type(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.types[index]]
+
+    def lexeme(self, index: int) -> str:
+        start = self.starts[index]
+        return self.source[start : start + self.lengths[index]]
+
+    def literal(self, index: int) -> object:
+        type_ = self.type(index)
+        if type_ == TokenType.NUMBER:
+            text = self.lexeme(index)
+            return float(text) if "." in text else int(text)
+        if type_ == TokenType.STRING:
+            return self.lexeme(index)[1:-1]
+        return None
+
+    def line(self, index: int) -> int:
+        # A string token's line is the one it ends on
+        return self.line_at(self.starts[index] + self.lengths[index] - 1)
+
+    def line_at(self, offset: int) -> int:
+        return bisect_right(self.newlines, offset) + 1
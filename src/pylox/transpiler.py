@@ -0,0 +1,491 @@
+import marshal
+import math
+import sys
+from types import CodeType
+from typing import Any, Dict, List, Tuple, Union
+
+from . import __version__, ast
+from .environment import UNDEFINED, AnyEnvironment, CompactEnvironment
+from .exceptions import LoxRuntimeError
+from .interpreter import AsyncCallError, Callable, Interpreter, LoxDivisionByZero
+from .limits import Limits
+from .timings import Timings
+from .token import Token
+from .token import TokenType as T
+
+# Every place in the generated code that can raise a Lox runtime error refers to
+# an entry in the line map by index. Each entry is the (lexeme, line) of the
+# token the error should be reported at.
+LineMap = Tuple[Tuple[str, int], ...]
+
+NUMBER = (int, float, bool)
+
+
+class TranspiledFunction(Callable):
+    def __init__(
+        self,
+        name: str,
+        params: int,
+        size: int,
+        body: Any,
+        closure: AnyEnvironment,
+    ):
+        self.name = name
+        self.params = params
+        self.size = size  # number of local slots, including parameters
+        self.body = body  # generated Python function, taking the environment
+        self.closure = closure
+
+    def arity(self) -> int:
+        return self.params
+
+    def call(self, interpreter: "Interpreter", *arguments: Any) -> Any:
+        environment = CompactEnvironment(self.size, self.closure)
+        environment.values[: len(arguments)] = arguments
+        return self.body(environment)
+
+    def __str__(self):
+        return f"<fn {self.name}>"
+
+
+class TranspiledProgram:
+    # A Lox program translated to a Python code object. Holds no references to
+    # the syntax tree or interpreter it came from, so it can be cached with
+    # dumps() and reused by any interpreter.
+    MAGIC = b"LOXPY"
+
+    def __init__(self, source: str, code: CodeType, line_map: LineMap):
+        self.source = source  # the generated Python, for debugging
+        self.code = code
+        self.line_map = line_map
+
+    def run(self, interpreter: Interpreter) -> None:
+        namespace = runtime(interpreter, self.line_map)
+        exec(self.code, namespace)
+        namespace["_main"](interpreter.globals)
+
+    def dumps(self) -> bytes:
+        # Code objects can only be loaded by the Python version which made them
+        header = (__version__, sys.implementation.cache_tag)
+        return self.MAGIC + marshal.dumps(
+            (header, self.source, self.code, self.line_map)
+        )
+
+    @classmethod
+    def loads(cls, data: bytes) -> "TranspiledProgram":
+        if not data.startswith(cls.MAGIC):
+            raise ValueError("Not a transpiled Lox program.")
+
+        header, source, code, line_map = marshal.loads(data[len(cls.MAGIC) :])
+        if tuple(header) != (__version__, sys.implementation.cache_tag):
+            raise ValueError("Transpiled Lox program is from another version.")
+
+        return cls(source, code, tuple(tuple(site) for site in line_map))
+
+
+def runtime(interpreter: Interpreter, line_map: LineMap) -> Dict[str, Any]:
+    # The helpers generated code calls into, bound to the running interpreter
+    globals_ = interpreter.globals
+    limits = interpreter.limits
+    # Loops and string concatenation are only counted in code generated for
+    # an interpreter with limits. Should that code run on one without, it
+    # counts against limits of its own which never run out.
+    generated_limits = limits if limits is not None else Limits()
+
+    def token(site: int) -> Token:
+        lexeme, line = line_map[site]
+        type_ = T._value2member_map_.get(lexeme, T.IDENTIFIER)
+        return Token(type_, lexeme, None, line)  # type: ignore[arg-type]
+
+    def undefined(site: int):
+        name = token(site)
+        raise LoxRuntimeError(f"Undefined variable '{name.lexeme}'.", name)
+
+    def operands(site: int):
+        raise LoxRuntimeError("Operands must be numbers", token(site))
+
+    def divide(left: Any, right: Any, site: int) -> Any:
+        if type(left) in NUMBER and type(right) in NUMBER:
+            if right == 0:
+                raise LoxDivisionByZero("Divison by zero", token(site))
+            return left / right
+        operands(site)
+
+    def assign_global(value: Any, site: int) -> Any:
+        globals_.assign(token(site), value)
+        return value
+
+    def call(callee: Any, arguments: Tuple[Any, ...], site: int) -> Any:
+        if limits is not None:
+            limits.fuel -= 1
+            if limits.fuel < 0:
+                limits.check(token(site))
+
+        if type(callee) is TranspiledFunction:
+            if len(arguments) > callee.params:
+                raise LoxRuntimeError(
+                    f"Expected {callee.params} arguments but got {len(arguments)}.",
+                    token(site),
+                )
+            environment = CompactEnvironment(callee.size, callee.closure)
+            environment.values[: len(arguments)] = arguments
+            try:
+                return callee.body(environment)
+            except RecursionError:
+                raise interpreter.stack_overflow(token(site)) from None
+
+        if not isinstance(callee, Callable):
+            raise LoxRuntimeError("Can only call functions and classes.", token(site))
+
+        if len(arguments) > callee.arity():
+            raise LoxRuntimeError(
+                f"Expected {callee.arity()} arguments but got {len(arguments)}.",
+                token(site),
+            )
+
+        try:
+            return callee.call(interpreter, *arguments)
+        except AsyncCallError as error:
+            raise LoxRuntimeError(str(error), token(site)) from None
+
+    def step(site: int) -> None:
+        # A loop's back-edge has run out of fuel; only generated when limited
+        generated_limits.check(token(site))
+
+    def add(left: Any, right: Any, site: int) -> Any:
+        # Adds what generated code with limits can't add inline: strings too
+        # long to build, and values which can't be added at all
+        if type(left) is str and type(right) is str:
+            generated_limits.check_string(len(left) + len(right), token(site))
+            return left + right
+        return None
+
+    def print_(value: Any) -> None:
+        print(interpreter.stringify(value), file=interpreter.out)
+
+    return {
+        "_g": globals_.values,
+        "_define": globals_.define,
+        "_UNDEFINED": UNDEFINED,
+        "_NUM": NUMBER,
+        "_Env": CompactEnvironment,
+        "_Function": TranspiledFunction,
+        "_undefined": undefined,
+        "_operands": operands,
+        "_divide": divide,
+        "_assign_global": assign_global,
+        "_call": call,
+        "_limits": generated_limits,
+        # Likewise, code generated to count statements counts somewhere
+        "_timings": interpreter.timings or Timings(),
+        "_step": step,
+        "_add": add,
+        "_MAX_STRING": generated_limits.string_length,
+        "_print": print_,
+    }
+
+
+class Scope:
+    def __init__(self, params: int = 0):
+        self.params = params  # leading slots which hold function parameters
+
+
+class Transpiler(ast.ExprVisitor, ast.StmtVisitor):
+    # Translates a resolved syntax tree to Python source, in three-address
+    # form: every intermediate value is stored in a temporary, so evaluation
+    # order matches the Interpreter exactly, and deeply nested Lox expressions
+    # don't become deeply nested Python expressions. Locals live in the same
+    # slot-indexed environments as the other engines, which keeps closure
+    # semantics identical.
+
+    def __init__(self, interpreter: Interpreter):
+        self.interpreter = interpreter
+        self.functions: List[List[str]] = []  # generated source of each function
+        self.output: List[str] = []
+        self.indent = 1
+        self.temporaries = 0
+        self.line_map: List[Tuple[str, int]] = []
+        self.scopes: List[Scope] = []
+
+    def transpile(self, statements: List[ast.Stmt]) -> TranspiledProgram:
+        self.output = []
+        self.transpile_body(statements)
+        main = ["def _main(env):"] + self.output
+
+        source = "\n".join(line for function in self.functions for line in function)
+        source += "\n" + "\n".join(main) + "\n"
+        code = compile(source, "<lox>", "exec")
+        return TranspiledProgram(source, code, tuple(self.line_map))
+
+    def transpile_body(self, statements: List[ast.Stmt]) -> None:
+        start = len(self.output)
+        for statement in statements:
+            if self.interpreter.timings is not None:
+                self.emit("_timings.statements += 1")
+            statement.accept(self)
+        if len(self.output) == start:
+            self.emit("pass")
+
+    def transpile_nested(self, stmt: ast.Stmt) -> None:
+        self.indent += 1
+        self.transpile_body([stmt])
+        self.indent -= 1
+
+    def transpile_expr(self, expr: ast.Expr) -> str:
+        # Returns a Python literal or temporary holding the expression's value
+        return expr.accept(self)
+
+    def is_truthy(self, expr: ast.Expr) -> str:
+        # A Python condition for whether the expression's value is truthy
+        while isinstance(expr, ast.GroupingExpr):
+            expr = expr.expression
+        if isinstance(expr, ast.LiteralExpr):
+            # Folded, as Python warns about "is" with a literal
+            return repr(expr.value is not None and expr.value is not False)
+        value = self.transpile_expr(expr)
+        return f"{value} is not None and {value} is not False"
+
+    def is_falsey(self, expr: ast.Expr) -> str:
+        while isinstance(expr, ast.GroupingExpr):
+            expr = expr.expression
+        if isinstance(expr, ast.LiteralExpr):
+            return repr(expr.value is None or expr.value is False)
+        value = self.transpile_expr(expr)
+        return f"{value} is None or {value} is False"
+
+    def emit(self, line: str) -> None:
+        self.output.append("    " * self.indent + line)
+
+    def temporary(self) -> str:
+        self.temporaries += 1
+        return f"_t{self.temporaries}"
+
+    def site(self, token: Token) -> int:
+        self.line_map.append((token.lexeme, token.line))
+        return len(self.line_map) - 1
+
+    def local(self, depth: int, slot: int) -> str:
+        return "env" + ".enclosing" * depth + f".values[{slot}]"
+
+    def is_number_literal(self, atom: str) -> bool:
+        return atom[:1].isdigit()
+
+    def define(self, stmt: ast.Stmt, name: Token, value: str) -> None:
+        slot = self.interpreter.slots.get(stmt)
+        if slot is not None:
+            self.emit(f"{self.local(0, slot)} = {value}")
+        else:
+            self.emit(f"_define({name.lexeme!r}, {value})")
+
+    def visit_block_stmt(self, stmt: ast.BlockStmt):
+        size = self.interpreter.scope_sizes.get(stmt)
+        if size is None:
+            self.transpile_body(stmt.statements)
+            return
+
+        self.scopes.append(Scope())
+        self.emit(f"env = _Env({size}, env)")
+        self.transpile_body(stmt.statements)
+        self.emit("env = env.enclosing")
+        self.scopes.pop()
+
+    def visit_expression_stmt(self, stmt: ast.ExpressionStmt):
+        self.transpile_expr(stmt.expression)
+
+    def visit_function_stmt(self, stmt: ast.FunctionStmt):
+        index = len(self.functions)
+        name = f"_fn{index}_{stmt.name.lexeme}"
+        self.functions.append([])
+
+        output, indent = self.output, self.indent
+        self.output, self.indent = [f"def {name}(env):"], 1
+        self.scopes.append(Scope(len(stmt.params)))
+        self.transpile_body(stmt.body)
+        self.scopes.pop()
+        self.functions[index] = self.output
+        self.output, self.indent = output, indent
+
+        size = self.interpreter.scope_sizes[stmt]
+        function = (
+            f"_Function({stmt.name.lexeme!r}, {len(stmt.params)}, {size}, {name}, env)"
+        )
+        self.define(stmt, stmt.name, function)
+
+    def visit_if_stmt(self, stmt: ast.IfStmt):
+        self.emit(f"if {self.is_truthy(stmt.condition)}:")
+        self.transpile_nested(stmt.then_branch)
+        if stmt.else_branch is not None:
+            self.emit("else:")
+            self.transpile_nested(stmt.else_branch)
+
+    def visit_print_stmt(self, stmt: ast.PrintStmt):
+        self.emit(f"_print({self.transpile_expr(stmt.expression)})")
+
+    def visit_return_stmt(self, stmt: ast.ReturnStmt):
+        if stmt.value is None:
+            self.emit("return None")
+        else:
+            self.emit(f"return {self.transpile_expr(stmt.value)}")
+
+    def visit_var_stmt(self, stmt: ast.VarStmt):
+        value = "None"
+        if stmt.intitializer is not None:
+            value = self.transpile_expr(stmt.intitializer)
+        self.define(stmt, stmt.name, value)
+
+    def visit_while_stmt(self, stmt: ast.WhileStmt):
+        self.emit("while True:")
+        self.indent += 1
+        self.emit(f"if {self.is_falsey(stmt.condition)}:")
+        self.emit("    break")
+        self.transpile_body([stmt.body])
+        if self.interpreter.limits is not None:
+            self.emit("_limits.fuel -= 1")
+            self.emit("if _limits.fuel < 0:")
+            keyword = stmt.keyword or Token(T.WHILE, "while", None, 0)
+            self.emit(f"    _step({self.site(keyword)})")
+        self.indent -= 1
+
+    def visit_assign_expr(self, expr: ast.AssignExpr) -> str:
+        value = self.transpile_expr(expr.value)
+
+        local = self.interpreter.locals.get(expr)
+        if local is not None:
+            self.emit(f"{self.local(*local)} = {value}")
+        else:
+            self.emit(f"_assign_global({value}, {self.site(expr.name)})")
+        return value
+
+    def visit_binary_expr(self, expr: ast.BinaryExpr) -> str:
+        left = self.transpile_expr(expr.left)
+        right = self.transpile_expr(expr.right)
+        result = self.temporary()
+
+        match expr.operator.type:
+            case T.BANG_EQUAL:
+                self.emit(f"{result} = not {left} == {right}")
+            case T.EQUAL_EQUAL:
+                self.emit(f"{result} = {left} == {right}")
+            case T.PLUS if self.interpreter.limits is not None:
+                site = self.site(expr.operator)
+                self.emit(
+                    f"{result} = {left} + {right} if "
+                    f"(type({left}) in _NUM and type({right}) in _NUM) or "
+                    f"(type({left}) is str and type({right}) is str and "
+                    f"len({left}) + len({right}) <= _MAX_STRING) "
+                    f"else _add({left}, {right}, {site})"
+                )
+            case T.PLUS:
+                self.emit(
+                    f"{result} = {left} + {right} if "
+                    f"(type({left}) in _NUM and type({right}) in _NUM) or "
+                    f"(type({left}) is str and type({right}) is str) else None"
+                )
+            case T.SLASH:
+                site = self.site(expr.operator)
+                self.emit(f"{result} = _divide({left}, {right}, {site})")
+            case _:
+                checks = " and ".join(
+                    f"type({operand}) in _NUM"
+                    for operand in (left, right)
+                    if not self.is_number_literal(operand)
+                )
+                operation = f"{left} {expr.operator.lexeme} {right}"
+                if checks:
+                    site = self.site(expr.operator)
+                    operation += f" if {checks} else _operands({site})"
+                self.emit(f"{result} = {operation}")
+
+        return result
+
+    def visit_call_expr(self, expr: ast.CallExpr) -> str:
+        callee = self.transpile_expr(expr.callee)
+        arguments = [self.transpile_expr(argument) for argument in expr.arguments]
+        result = self.temporary()
+        self.emit(
+            f"{result} = _call({callee}, ({''.join(a + ', ' for a in arguments)}), "
+            f"{self.site(expr.paren)})"
+        )
+        return result
+
+    def visit_grouping_expr(self, expr: ast.GroupingExpr) -> str:
+        return self.transpile_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: ast.LiteralExpr) -> str:
+        value = expr.value
+        if type(value) is float and not math.isfinite(value):
+            # A number too big for a float, or folded from one: repr gives
+            # inf or nan, which aren't Python literals
+            return f"float({repr(value)!r})"
+        return repr(value)
+
+    def visit_logical_expr(self, expr: ast.LogicalExpr) -> str:
+        result = self.temporary()
+        self.emit(f"{result} = {self.transpile_expr(expr.left)}")
+
+        if expr.operator.type == T.OR:
+            self.emit(f"if {result} is None or {result} is False:")
+        else:
+            self.emit(f"if {result} is not None and {result} is not False:")
+
+        self.indent += 1
+        self.emit(f"{result} = {self.transpile_expr(expr.right)}")
+        self.indent -= 1
+        return result
+
+    def visit_unary_expr(self, expr: ast.UnaryExpr) -> str:
+        match expr.operator.type:
+            case T.BANG:
+                value = self.is_falsey(expr.right)
+            case T.MINUS:
+                value = f"-{self.transpile_expr(expr.right)}"
+        result = self.temporary()
+        self.emit(f"{result} = {value}")
+        return result
+
+    def visit_variable_expr(self, expr: ast.VariableExpr) -> str:
+        result = self.temporary()
+
+        local = self.interpreter.locals.get(expr)
+        if local is None:
+            self.emit(f"{result} = _g.get({expr.name.lexeme!r}, _UNDEFINED)")
+        else:
+            self.emit(f"{result} = {self.local(*local)}")
+            depth, slot = local
+            # Only parameters can be undefined, when the caller passes too
+            # few arguments; the Resolver guarantees the rest are declared.
+            if slot >= self.scopes[-1 - depth].params:
+                return result
+
+        self.emit(f"if {result} is _UNDEFINED:")
+        self.emit(f"    _undefined({self.site(expr.name)})")
+        return result
+
+
+class TranspilingInterpreter(Interpreter):
+    # Runs programs by translating them to Python code objects first. Shares the
+    # resolver tables, globals and value semantics of the tree-walking
+    # Interpreter, which is still used to evaluate bare expressions typed at the
+    # REPL.
+
+    def prepare(
+        self, statements: List[ast.Stmt]
+    ) -> Union[TranspiledProgram, List[ast.Stmt]]:
+        try:
+            return self.transpile(statements)
+        except (SyntaxError, RecursionError):
+            # Nested deeper than Python allows: more than 20 loops, or 100
+            # indented blocks, in one function. Such a program is walked by
+            # the tree interpreter instead, which shares these globals.
+            return statements
+
+    def run_prepared(self, prepared: Union[TranspiledProgram, List[ast.Stmt]]) -> None:
+        if not isinstance(prepared, TranspiledProgram):
+            return super().run_prepared(prepared)
+        try:
+            prepared.run(self)
+        except LoxRuntimeError as error:
+            self.lox.runtime_error(error)
+
+    def transpile(self, statements: List[ast.Stmt]) -> TranspiledProgram:
+        return Transpiler(self).transpile(statements)
@@ -0,0 +1,411 @@
+import asyncio
+import sys
+from inspect import isawaitable
+from typing import Any, Generator, List, Optional, TextIO
+
+from . import ast
+from .bytecode import Chunk, OpCode, disassemble
+from .compiler import Compiler
+from .environment import UNDEFINED, AnyEnvironment, CompactEnvironment
+from .exceptions import LoxRuntimeError
+from .interpreter import (
+    AsyncCallError,
+    Callable,
+    Interpreter,
+    LoxDivisionByZero,
+    NativeFunction,
+)
+
+# Default maximum depth of Lox calls, beyond which the VM reports a stack
+# overflow. Frames live in a list rather than on Python's stack, so this can be
+# raised as far as memory allows.
+FRAMES_MAX = 10_000
+
+# Loop iterations and calls between yields to the event loop, when running
+# asynchronously. Few enough that scripts sharing a loop take turns every
+# millisecond or so, and many enough that yielding costs next to nothing.
+YIELD_INTERVAL = 1000
+
+# What the VM yields, running asynchronously: None to let other tasks run, or
+# an awaitable an async native function returned, to be sent back its result
+Steps = Generator[Any, Any, Any]
+
+# Plain ints, so the dispatch loop compares ints rather than enum members
+(
+    CONSTANT,
+    NIL,
+    TRUE,
+    FALSE,
+    POP,
+    GET_LOCAL,
+    SET_LOCAL,
+    DEFINE_LOCAL,
+    GET_GLOBAL,
+    SET_GLOBAL,
+    DEFINE_GLOBAL,
+    PUSH_SCOPE,
+    POP_SCOPE,
+    EQUAL,
+    NOT_EQUAL,
+    GREATER,
+    GREATER_EQUAL,
+    LESS,
+    LESS_EQUAL,
+    ADD,
+    SUBTRACT,
+    MULTIPLY,
+    DIVIDE,
+    NOT,
+    NEGATE,
+    PRINT,
+    JUMP,
+    JUMP_IF_FALSE,
+    LOOP,
+    CALL,
+    CLOSURE,
+    RETURN,
+    COUNT,
+) = (int(op) for op in OpCode)
+
+NUMBER = (int, float)
+
+
+class VMFunction(Callable):
+    def __init__(self, chunk: Chunk, closure: AnyEnvironment):
+        self.chunk = chunk
+        self.closure = closure
+
+    def arity(self) -> int:
+        return self.chunk.arity
+
+    def call(self, interpreter: "VMInterpreter", *arguments: Any) -> Any:
+        # Only used when something outside the VM calls a Lox function
+        environment = CompactEnvironment(self.chunk.size, self.closure)
+        environment.values[: len(arguments)] = arguments
+        return interpreter.run(self.chunk, environment)
+
+    def __str__(self):
+        return f"<fn {self.chunk.name}>"
+
+
+class VMInterpreter(Interpreter):
+    # Compiles programs to bytecode, and runs them on a stack-based virtual
+    # machine. Shares the resolver tables, globals and value semantics of the
+    # tree-walking Interpreter, which is still used to evaluate bare
+    # expressions typed at the REPL.
+    #
+    # The VM is stackless: a Lox call pushes a frame onto a list instead of
+    # recursing in Python, so Lox recursion is only limited by max_depth.
+
+    def __init__(self, lox, out=sys.stdout):
+        super().__init__(lox, out=out)
+        self.compiler = Compiler(self)
+        # When set, the disassembly of each compiled program is written here
+        self.disassemble_to: Optional[TextIO] = None
+        self.max_depth = FRAMES_MAX
+
+    def prepare(self, statements: List[ast.Stmt]) -> Chunk:
+        chunk = self.compiler.compile(statements)
+        if self.disassemble_to is not None:
+            print(disassemble(chunk), file=self.disassemble_to)
+        return chunk
+
+    def run_prepared(self, prepared: Chunk) -> None:
+        try:
+            self.run(prepared, self.environment)
+        except LoxRuntimeError as error:
+            self.lox.runtime_error(error)
+
+    async def interpret_async(self, statements: List[ast.Stmt]) -> None:
+        await self.run_prepared_async(self.prepare(statements))
+
+    async def run_prepared_async(self, prepared: Chunk) -> None:
+        # A values limit counts every allocation in the process, so scripts
+        # sharing an event loop would be charged for each other's
+        if self.limits is not None and self.limits.values is not None:
+            raise ValueError("run_async can't limit values, which are per process.")
+
+        try:
+            await self.run_async(prepared, self.environment)
+        except LoxRuntimeError as error:
+            self.lox.runtime_error(error)
+
+    def run(self, chunk: Chunk, environment: AnyEnvironment) -> Any:
+        # Runs the chunk to completion, never yielding
+        steps = self.dispatch(chunk, environment, asynchronous=False)
+        try:
+            while True:
+                next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+    async def run_async(self, chunk: Chunk, environment: AnyEnvironment) -> Any:
+        # Runs the chunk, letting other tasks run every YIELD_INTERVAL steps,
+        # and awaiting async native functions
+        steps = self.dispatch(chunk, environment, asynchronous=True)
+        value = None
+        try:
+            while True:
+                awaitable = steps.send(value)
+                if awaitable is None:
+                    await asyncio.sleep(0)
+                    value = None
+                else:
+                    value = await awaitable
+        except StopIteration as stop:
+            return stop.value
+
+    def dispatch(
+        self, chunk: Chunk, environment: AnyEnvironment, asynchronous: bool
+    ) -> Steps:
+        # The dispatch loop, shared by run and run_async. It only yields when
+        # running asynchronously.
+        interval = YIELD_INTERVAL if asynchronous else sys.maxsize
+        budget = interval
+        stack: List[Any] = []
+        push = stack.append
+        pop = stack.pop
+        frames: List[Any] = []  # saved (code, constants, ip, env) of callers
+        globals_ = self.globals
+        stringify = self.stringify
+        max_depth = self.max_depth
+        limits = self.limits
+        timings = self.timings
+
+        code = chunk.code
+        constants = chunk.constants
+        ip = 0
+        env: Any = environment
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            if op == GET_LOCAL:
+                depth = code[ip]
+                scope = env
+                while depth:
+                    scope = scope.enclosing
+                    depth -= 1
+                value = scope.values[code[ip + 1]]
+                if value is UNDEFINED:
+                    name = constants[code[ip + 2]]
+                    raise LoxRuntimeError(f"Undefined variable '{name.lexeme}'.", name)
+                push(value)
+                ip += 3
+            elif op == CONSTANT:
+                push(constants[code[ip]])
+                ip += 1
+            elif op == GET_GLOBAL:
+                site = constants[code[ip]]
+                ip += 1
+                if site.version != globals_.version:
+                    site.value = globals_.get(site.name)
+                    site.version = globals_.version
+                push(site.value)
+            elif op == POP:
+                pop()
+            elif op == JUMP_IF_FALSE:
+                value = stack[-1]
+                if value is None or value is False:
+                    ip = code[ip]
+                else:
+                    ip += 1
+            elif op == JUMP:
+                ip = code[ip]
+            elif op == LOOP:
+                if limits is not None:
+                    limits.fuel -= 1
+                    if limits.fuel < 0:
+                        limits.check(constants[code[ip + 1]])
+                budget -= 1
+                if budget < 0:
+                    yield None
+                    budget = interval
+                ip = code[ip]
+            elif op == LESS:
+                b = pop()
+                a = pop()
+                if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                    push(a < b)
+                    ip += 1
+                else:
+                    raise self.operands_error(constants[code[ip]])
+            elif op == ADD:
+                b = pop()
+                a = pop()
+                if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                    push(a + b)
+                elif isinstance(a, str) and isinstance(b, str):
+                    if limits is not None:
+                        limits.check_string(len(a) + len(b), constants[code[ip]])
+                    push(a + b)
+                else:
+                    push(None)
+                ip += 1
+            elif op == SUBTRACT:
+                b = pop()
+                a = pop()
+                if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                    push(a - b)
+                    ip += 1
+                else:
+                    raise self.operands_error(constants[code[ip]])
+            elif op == SET_LOCAL:
+                depth = code[ip]
+                scope = env
+                while depth:
+                    scope = scope.enclosing
+                    depth -= 1
+                scope.values[code[ip + 1]] = stack[-1]
+                ip += 2
+            elif op == CALL:
+                if limits is not None:
+                    limits.fuel -= 1
+                    if limits.fuel < 0:
+                        limits.check(constants[code[ip + 1]])
+                budget -= 1
+                if budget < 0:
+                    yield None
+                    budget = interval
+                count = code[ip]
+                function = stack[-1 - count]
+
+                if type(function) is VMFunction:
+                    function_chunk = function.chunk
+                    if count > function_chunk.arity:
+                        raise LoxRuntimeError(
+                            f"Expected {function_chunk.arity} arguments "
+                            f"but got {count}.",
+                            constants[code[ip + 1]],
+                        )
+                    if len(frames) >= max_depth:
+                        raise self.stack_overflow(constants[code[ip + 1]])
+
+                    scope = CompactEnvironment(function_chunk.size, function.closure)
+                    if count:
+                        scope.values[:count] = stack[-count:]
+                    del stack[-count - 1 :]
+
+                    frames.append((code, constants, ip + 2, env))
+                    code = function_chunk.code
+                    constants = function_chunk.constants
+                    ip = 0
+                    env = scope
+                    continue
+
+                paren = constants[code[ip + 1]]
+                ip += 2
+                arguments = stack[len(stack) - count :]
+                del stack[-count - 1 :]
+
+                if not isinstance(function, Callable):
+                    raise LoxRuntimeError("Can only call functions and classes.", paren)
+
+                if count > function.arity():
+                    raise LoxRuntimeError(
+                        f"Expected {function.arity()} arguments but got {count}.",
+                        paren,
+                    )
+
+                if asynchronous and type(function) is NativeFunction:
+                    value = function.start(*arguments)
+                    if isawaitable(value):
+                        value = yield value
+                else:
+                    try:
+                        value = function.call(self, *arguments)
+                    except AsyncCallError as error:
+                        raise LoxRuntimeError(str(error), paren) from None
+                push(value)
+            elif op == RETURN:
+                value = pop()
+                if not frames:
+                    return value
+                code, constants, ip, env = frames.pop()
+                push(value)
+            elif op == NIL:
+                push(None)
+            elif op == TRUE:
+                push(True)
+            elif op == FALSE:
+                push(False)
+            elif op == DEFINE_LOCAL:
+                env.values[code[ip]] = pop()
+                ip += 1
+            elif op == SET_GLOBAL:
+                globals_.assign(constants[code[ip]], stack[-1])
+                ip += 1
+            elif op == DEFINE_GLOBAL:
+                globals_.define(constants[code[ip]].lexeme, pop())
+                ip += 1
+            elif op == PUSH_SCOPE:
+                env = CompactEnvironment(code[ip], env)
+                ip += 1
+            elif op == POP_SCOPE:
+                env = env.enclosing
+            elif op == EQUAL:
+                b = pop()
+                stack[-1] = stack[-1] == b
+            elif op == NOT_EQUAL:
+                b = pop()
+                stack[-1] = not stack[-1] == b
+            elif op == GREATER:
+                b = pop()
+                a = pop()
+                if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                    push(a > b)
+                    ip += 1
+                else:
+                    raise self.operands_error(constants[code[ip]])
+            elif op == GREATER_EQUAL:
+                b = pop()
+                a = pop()
+                if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                    push(a >= b)
+                    ip += 1
+                else:
+                    raise self.operands_error(constants[code[ip]])
+            elif op == LESS_EQUAL:
+                b = pop()
+                a = pop()
+                if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                    push(a <= b)
+                    ip += 1
+                else:
+                    raise self.operands_error(constants[code[ip]])
+            elif op == MULTIPLY:
+                b = pop()
+                a = pop()
+                if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                    push(a * b)
+                    ip += 1
+                else:
+                    raise self.operands_error(constants[code[ip]])
+            elif op == DIVIDE:
+                b = pop()
+                a = pop()
+                if isinstance(a, NUMBER) and isinstance(b, NUMBER):
+                    if b == 0:
+                        raise LoxDivisionByZero("Divison by zero", constants[code[ip]])
+                    push(a / b)
+                    ip += 1
+                else:
+                    raise self.operands_error(constants[code[ip]])
+            elif op == NOT:
+                value = stack[-1]
+                stack[-1] = value is None or value is False
+            elif op == NEGATE:
+                stack[-1] = -stack[-1]
+            elif op == PRINT:
+                print(stringify(pop()), file=self.out)
+            elif op == CLOSURE:
+                push(VMFunction(constants[code[ip]], env))
+                ip += 1
+            elif op == COUNT:
+                timings.statements += 1  # type: ignore[union-attr]
+            else:
+                raise RuntimeError(f"Unknown opcode {op}.")
+
+    def operands_error(self, operator) -> LoxRuntimeError:
+        return LoxRuntimeError("Operands must be numbers", operator)
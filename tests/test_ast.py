@@ -1,3 +1,7 @@
+from dataclasses import FrozenInstanceError
+
+import pytest
+
 from pylox import ast
 from pylox.token import Token
 from pylox.token import TokenType as T
@@ -7,3 +11,17 @@ def test_hashable_expr():
     var_expr = ast.VariableExpr(name=Token(T.IDENTIFIER, "a", None, 1))
 
     {var_expr: True}
+
+
+@pytest.mark.parametrize(
+    "node,field",
+    [
+        (ast.GroupingExpr(ast.LiteralExpr(1)), "expression"),
+        (ast.LiteralExpr(1), "value"),
+        (ast.IfStmt(ast.LiteralExpr(1), ast.BlockStmt([]), None), "else_branch"),
+    ],
+)
+def test_nodes_are_slotted_and_immutable(node, field):
+    assert not hasattr(node, "__dict__")
+    with pytest.raises(FrozenInstanceError):
+        setattr(node, field, None)
@@ -0,0 +1,173 @@
+import asyncio
+import time
+from io import StringIO
+
+import pytest
+
+import pylox
+from pylox import vm
+from pylox.exceptions import LoxRuntimeError, ParseError
+from pylox.interpreter import NativeFunction
+from pylox.limits import Limits, LoxLimitError
+from pylox.lox import Lox
+
+ENGINES = ["tree", "closure", "vm", "python"]
+
+
+def run_async(source: str, **natives) -> Lox:
+    lox = Lox(out=StringIO(), err=StringIO(), engine="vm")
+    for name, function in natives.items():
+        lox.interpreter.globals.define(name, NativeFunction(name, function))
+    asyncio.run(lox.run_async(source))
+    return lox
+
+
+def test_run_async():
+    lox = run_async(
+        """
+        fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+        for (var i = 0; i < 3; i = i + 1) print fib(i + 10);
+        """
+    )
+
+    assert lox.out.getvalue() == "55\n89\n144\n"
+
+
+def test_run_async_needs_vm():
+    lox = Lox(out=StringIO(), err=StringIO())
+
+    with pytest.raises(ValueError, match="vm engine"):
+        asyncio.run(lox.run_async("print 1;"))
+
+
+def test_runtime_error():
+    lox = run_async("print 1;\nprint missing;")
+
+    assert lox.out.getvalue() == "1\n"
+    assert lox.err.getvalue() == "Undefined variable 'missing'.\n[line 2]\n"
+    assert lox.had_runtime_error
+
+
+def test_syntax_error():
+    lox = Lox(out=StringIO(), err=StringIO(), engine="vm")
+
+    with pytest.raises(ParseError):
+        asyncio.run(lox.run_async("print 1"))
+
+    assert lox.had_error
+    assert lox.out.getvalue() == ""
+
+
+def test_awaits_async_natives():
+    async def fetch(key):
+        await asyncio.sleep(0.01)
+        return key + "!"
+
+    lox = run_async('var value = fetch("a"); print value + fetch("b");', fetch=fetch)
+
+    assert lox.out.getvalue() == "a!b!\n"
+
+
+def test_sync_natives():
+    lox = run_async("print twice(21); print twice();", twice=lambda n: (n or 0) * 2)
+
+    assert lox.out.getvalue() == "42\n0\n"
+
+
+@pytest.mark.filterwarnings("error")  # no coroutine left unawaited
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "source, line",
+    [("print fetch();", 1), ("fun f() {\n  return fetch();\n}\nprint f();", 2)],
+)
+def test_async_native_needs_run_async(engine: str, source: str, line: int):
+    async def fetch():
+        return 1
+
+    lox = Lox(out=StringIO(), err=StringIO(), engine=engine)
+    lox.interpreter.globals.define("fetch", NativeFunction("fetch", fetch))
+
+    lox.run(source)
+
+    assert lox.out.getvalue() == ""
+    assert lox.err.getvalue() == (
+        f"Can only call <native fn fetch> with run_async.\n[line {line}]\n"
+    )
+
+
+@pytest.mark.filterwarnings("error")
+@pytest.mark.parametrize("engine", ENGINES)
+def test_program_async_native_needs_run_async(engine: str):
+    async def f(n):
+        return n
+
+    program = pylox.compile("print f(21);", engine=engine)
+
+    with pytest.raises(LoxRuntimeError, match="with run_async"):
+        program.run({"f": NativeFunction("f", f)}, out=StringIO())
+
+
+def test_scripts_take_turns(monkeypatch):
+    # A script stuck in a loop mustn't keep one that's waiting from finishing
+    monkeypatch.setattr(vm, "YIELD_INTERVAL", 10)
+    finished = []
+
+    async def run(name: str, source: str):
+        lox = Lox(out=StringIO(), err=StringIO(), engine="vm")
+        await lox.run_async(source)
+        finished.append(name)
+
+    async def main():
+        await asyncio.gather(
+            run("long", "var i = 0; while (i < 10000) i = i + 1;"),
+            run("short", "var i = 0; while (i < 100) i = i + 1;"),
+        )
+
+    asyncio.run(main())
+
+    assert finished == ["short", "long"]
+
+
+def test_many_scripts_wait_concurrently():
+    async def sleep(seconds):
+        await asyncio.sleep(seconds)
+
+    async def main():
+        outs = [StringIO() for _ in range(200)]
+        programs = pylox.compile("sleep(0.05); print n;", engine="vm")
+        natives = {"sleep": NativeFunction("sleep", sleep)}
+        await asyncio.gather(
+            *(
+                programs.run_async({"n": n, **natives}, out=out)
+                for n, out in enumerate(outs)
+            )
+        )
+        return outs
+
+    start = time.monotonic()
+    outs = asyncio.run(main())
+
+    assert [out.getvalue() for out in outs] == [f"{n}\n" for n in range(200)]
+    # 10s if they ran one after another
+    assert time.monotonic() - start < 5
+
+
+def test_program_run_async_needs_vm():
+    program = pylox.compile("print 1;")
+
+    with pytest.raises(ValueError, match="vm engine"):
+        asyncio.run(program.run_async())
+
+
+def test_program_run_async_raises_runtime_errors():
+    program = pylox.compile("while (true) {}", engine="vm")
+
+    with pytest.raises(LoxLimitError):
+        asyncio.run(program.run_async(limits=Limits(steps=100)))
+
+
+def test_run_async_rejects_values_limits():
+    program = pylox.compile("print 1;", engine="vm")
+
+    with pytest.raises(ValueError, match="values"):
+        asyncio.run(program.run_async(out=StringIO(), limits=Limits(values=1000)))
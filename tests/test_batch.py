@@ -0,0 +1,162 @@
+from pathlib import Path
+
+import pytest
+
+from pylox.batch import (
+    EX_DATAERR,
+    EX_NOINPUT,
+    EX_OK,
+    EX_SOFTWARE,
+    Options,
+    Result,
+    expand,
+    run_batch,
+    run_script,
+    status_of,
+    summarize,
+)
+
+
+@pytest.fixture
+def corpus(tmp_path) -> Path:
+    (tmp_path / "b.lox").write_text("print 2;")
+    (tmp_path / "a.lox").write_text("print 1;")
+    (tmp_path / "notes.txt").write_text("not a script")
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "c.lox").write_text("print 3;")
+    return tmp_path
+
+
+def test_expand_directory(corpus: Path):
+    assert expand([str(corpus)]) == [
+        corpus / "a.lox",
+        corpus / "b.lox",
+        corpus / "nested" / "c.lox",
+    ]
+
+
+def test_expand_glob(corpus: Path):
+    assert expand([str(corpus / "*.lox")]) == [corpus / "a.lox", corpus / "b.lox"]
+
+
+def test_expand_keeps_order_given_and_drops_repeats(corpus: Path):
+    b, a = str(corpus / "b.lox"), str(corpus / "a.lox")
+
+    assert expand([b, a, b]) == [Path(b), Path(a)]
+
+
+def test_expand_keeps_patterns_without_scripts(corpus: Path):
+    (corpus / "empty").mkdir()
+    empty, unmatched = corpus / "empty", corpus / "*.py"
+
+    assert expand([str(empty), str(unmatched)]) == [empty, unmatched]
+
+
+@pytest.mark.parametrize(
+    "pattern, err", [("empty", "No .lox scripts in"), ("*.py", "No scripts match")]
+)
+def test_run_script_reports_patterns_without_scripts(
+    corpus: Path, pattern: str, err: str
+):
+    (corpus / "empty").mkdir()
+    [path] = expand([str(corpus / pattern)])
+
+    result = run_script(path, Options())
+
+    assert result.status == EX_NOINPUT
+    assert result.err.startswith(err)
+
+
+def test_run_script(corpus: Path):
+    result = run_script(corpus / "a.lox", Options(no_cache=True))
+
+    assert result == Result(corpus / "a.lox", EX_OK, "1\n", "")
+
+
+@pytest.mark.parametrize(
+    "source,status,err",
+    [
+        ("var = 1;", EX_DATAERR, "[line 1] Error at '=': Expect variable name.\n"),
+        ("{ var a = a; }", EX_DATAERR, "Can't read local variable"),
+        ('print 1;\nprint "a" < 1;', EX_SOFTWARE, "Operands must be numbers\n"),
+    ],
+)
+def test_run_script_errors(tmp_path, source: str, status: int, err: str):
+    path = tmp_path / "script.lox"
+    path.write_text(source)
+
+    result = run_script(path, Options(no_cache=True))
+
+    assert result.status == status
+    assert err in result.err
+
+
+def test_run_script_unreadable(tmp_path):
+    result = run_script(tmp_path / "missing.lox", Options())
+
+    assert result.status == EX_NOINPUT
+    assert "No such file" in result.err
+
+
+def test_run_script_options(tmp_path):
+    path = tmp_path / "script.lox"
+    path.write_text("fun f(n) { if (n < 1) return 0; return 1 + f(n - 1); } f(50);")
+
+    result = run_script(path, Options(engine="vm", max_depth=10, no_cache=True))
+
+    assert result.status == EX_SOFTWARE
+    assert "Stack overflow." in result.err
+
+
+def test_run_script_caches(corpus: Path, tmp_path):
+    cache_dir = tmp_path / "cache"
+
+    run_script(corpus / "a.lox", Options(cache_dir=str(cache_dir)))
+
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_run_batch_keeps_order(tmp_path, jobs: int):
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"{i}.lox"
+        path.write_text(f"print {i};" if i != 4 else "print x;")
+        paths.append(path)
+
+    results = list(run_batch(paths, Options(no_cache=True), jobs=jobs))
+
+    assert [result.path for result in results] == paths
+    assert [result.out for result in results] == [
+        f"{i}\n" if i != 4 else "" for i in range(10)
+    ]
+    assert results[4].status == EX_SOFTWARE
+
+
+def test_summarize():
+    results = [
+        Result(Path("a.lox"), EX_OK, "", ""),
+        Result(Path("b.lox"), EX_DATAERR, "", ""),
+        Result(Path("c.lox"), EX_OK, "", ""),
+        Result(Path("d.lox"), EX_SOFTWARE, "", ""),
+    ]
+
+    assert summarize(results) == (
+        "4 scripts: 2 passed, 1 with errors (65), 1 with runtime errors (70)\n"
+        "  65 b.lox\n"
+        "  70 d.lox"
+    )
+
+
+def test_status_of():
+    assert status_of([]) == EX_OK
+    assert status_of([Result(Path("a.lox"), EX_OK, "", "")]) == EX_OK
+    assert (
+        status_of(
+            [
+                Result(Path("a.lox"), EX_SOFTWARE, "", ""),
+                Result(Path("b.lox"), EX_DATAERR, "", ""),
+            ]
+        )
+        == EX_SOFTWARE
+    )
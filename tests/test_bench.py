@@ -0,0 +1,111 @@
+from io import StringIO
+
+import pytest
+
+from pylox import bench
+from pylox.bench import (
+    BenchmarkError,
+    benchmarks,
+    compare,
+    load,
+    run_suite,
+    save,
+    slower_probability,
+    summarize,
+)
+from pylox.lox import Lox
+
+
+@pytest.fixture
+def suite(tmp_path, monkeypatch):
+    (tmp_path / "small.lox").write_text("// A small one\nvar a = 1; print a + 1;")
+    monkeypatch.setattr(bench, "SUITE", tmp_path)
+    return tmp_path
+
+
+def test_suite_has_classic_workloads():
+    assert set(benchmarks()) >= {
+        "fib",
+        "loops",
+        "strings",
+        "closures",
+        "nesting",
+        "equality",
+    }
+
+
+@pytest.mark.parametrize("name", sorted(benchmarks()))
+def test_benchmarks_are_valid(name: str):
+    lox = Lox(out=StringIO(), err=StringIO())
+
+    statements = lox.parse(benchmarks()[name].read_text())
+    lox.resolve(statements)
+
+    assert not lox.had_error, lox.err.getvalue()
+
+
+def test_run_suite(suite):
+    report = run_suite(["tree", "vm"], warmup=1, repeat=3)
+
+    assert report["repeat"] == 3
+    assert set(report["results"]) == {"small/tree", "small/vm"}
+    result = report["results"]["small/tree"]
+    assert len(result["times"]) == 3
+    assert result["min"] <= result["median"] <= result["max"]
+
+
+def test_run_suite_unknown_benchmark(suite):
+    with pytest.raises(BenchmarkError):
+        run_suite(["tree"], ["missing"])
+
+
+def test_run_suite_failing_benchmark(suite):
+    (suite / "broken.lox").write_text("print undefined;")
+
+    with pytest.raises(BenchmarkError, match="Undefined variable"):
+        run_suite(["tree"], ["broken"])
+
+
+def test_save_and_load(suite, tmp_path):
+    report = run_suite(["tree"], repeat=2)
+
+    save(report, tmp_path / "results.json")
+
+    assert load(tmp_path / "results.json") == report
+
+
+def test_slower_probability():
+    base = [1.0, 1.1, 1.2, 1.3, 1.4]
+
+    assert slower_probability(base, [2.0, 2.1, 2.2, 2.3, 2.4]) < 0.01
+    assert slower_probability(base, [0.5, 0.6, 0.7, 0.8, 0.9]) > 0.99
+    assert 0.3 < slower_probability(base, list(base)) < 0.7
+    assert slower_probability([1.0, 1.0], [1.0, 1.0]) == 1.0
+
+
+def report(*times):
+    return {"results": {"fib/tree": summarize(list(times))}}
+
+
+def test_compare_flags_significant_regressions():
+    rows = compare(
+        report(1.0, 1.01, 0.99, 1.02, 0.98), report(1.2, 1.21, 1.19, 1.22, 1.18)
+    )
+
+    assert len(rows) == 1
+    assert rows[0]["change"] == pytest.approx(0.2)
+    assert rows[0]["regression"]
+
+
+def test_compare_ignores_noise_and_small_changes():
+    noisy = compare(report(1.0, 1.5, 0.7, 1.2, 0.9), report(1.1, 0.8, 1.6, 1.3, 1.0))
+    small = compare(
+        report(1.0, 1.01, 0.99, 1.02, 0.98), report(1.02, 1.03, 1.01, 1.04, 1.0)
+    )
+
+    assert not noisy[0]["regression"]
+    assert not small[0]["regression"]
+
+
+def test_compare_skips_benchmarks_not_in_both():
+    assert compare(report(1.0, 1.1), {"results": {}}) == []
@@ -0,0 +1,67 @@
+from pylox.bytecode import Chunk, GlobalSite, OpCode, disassemble
+from pylox.token import Token
+from pylox.token import TokenType as T
+
+
+def test_literal_constants_are_deduplicated():
+    chunk = Chunk("test")
+
+    assert chunk.add_constant("a") == chunk.add_constant("a")
+    assert chunk.add_constant(1) != chunk.add_constant(1.0)
+
+
+def test_signed_zero_constants_stay_distinct():
+    chunk = Chunk("test")
+
+    assert chunk.add_constant(-0.0) != chunk.add_constant(0.0)
+    assert chunk.add_constant(-0.0) == chunk.add_constant(-0.0)
+
+
+def test_token_constants_are_not_deduplicated():
+    chunk = Chunk("test")
+    token = Token(T.IDENTIFIER, "a", None, 1)
+
+    assert chunk.add_constant(token) != chunk.add_constant(token)
+
+
+def test_global_sites_are_not_deduplicated():
+    chunk = Chunk("test")
+    token = Token(T.IDENTIFIER, "a", None, 1)
+
+    assert chunk.add_constant(GlobalSite(token)) != chunk.add_constant(
+        GlobalSite(token)
+    )
+
+
+def test_disassemble():
+    chunk = Chunk("test")
+    constant = chunk.add_constant(1.5)
+    chunk.write(OpCode.CONSTANT, 1)
+    chunk.write(constant, 1)
+    chunk.write(OpCode.PRINT, 1)
+    chunk.write(OpCode.NIL, 2)
+    chunk.write(OpCode.RETURN, 2)
+
+    output = disassemble(chunk)
+
+    assert output.splitlines() == [
+        "== test ==",
+        "0000    1 CONSTANT        0 (1.5)",
+        "0002    | PRINT",
+        "0003    2 NIL",
+        "0004    | RETURN",
+    ]
+
+
+def test_disassemble_includes_functions():
+    function = Chunk("inner")
+    function.write(OpCode.NIL, 1)
+    function.write(OpCode.RETURN, 1)
+    chunk = Chunk("script")
+    chunk.write(OpCode.CLOSURE, 1)
+    chunk.write(chunk.add_constant(function), 1)
+
+    output = disassemble(chunk)
+
+    assert "== script ==" in output
+    assert "== inner ==" in output
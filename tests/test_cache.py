@@ -0,0 +1,137 @@
+import os
+from io import StringIO
+
+import pytest
+
+from pylox import cache
+from pylox.cache import ProgramCache, dumps, loads
+from pylox.exceptions import ParseError
+from pylox.lox import Lox
+from pylox.scanner import RegexScanner
+
+SOURCE = """
+fun add(a, b) { return a + b; }
+var total = 0;
+for (var i = 0; i < 3; i = i + 1) { total = add(total, i * 1.5); }
+if (total > 1 and !false) print "total: " + "ok"; else print nothing;
+print total;
+"""
+
+
+def parse(source: str = SOURCE):
+    return Lox().parse(source)
+
+
+def test_round_trip():
+    statements = parse()
+
+    loaded = loads(dumps(statements))
+
+    assert repr(loaded) == repr(statements)
+
+
+def test_round_trip_keeps_tokens_shared():
+    loaded = loads(dumps(parse("a + a;")))
+
+    binary = loaded[0].expression
+    assert binary.left.name is binary.right.name
+
+
+def test_loads_rejects_other_data():
+    with pytest.raises(ValueError):
+        loads(b"not a program")
+
+
+def test_loads_rejects_other_versions(monkeypatch):
+    data = dumps(parse())
+    monkeypatch.setattr(cache, "__version__", "0.0.0")
+
+    with pytest.raises(ValueError):
+        loads(data)
+
+
+def test_loads_rejects_other_formats(monkeypatch):
+    data = dumps(parse())
+    monkeypatch.setattr(cache, "FORMAT", cache.FORMAT + 1)
+
+    with pytest.raises(ValueError):
+        loads(data)
+
+
+def test_cache_keys_on_format(tmp_path, monkeypatch):
+    program_cache = ProgramCache(tmp_path)
+    program_cache.store(SOURCE, False, parse())
+
+    monkeypatch.setattr(cache, "FORMAT", cache.FORMAT + 1)
+
+    assert program_cache.load(SOURCE, False) is None
+
+
+def test_cache_hit(tmp_path):
+    program_cache = ProgramCache(tmp_path)
+    program_cache.store(SOURCE, False, parse())
+
+    loaded = program_cache.load(SOURCE, False)
+
+    assert repr(loaded) == repr(parse())
+
+
+def test_cache_miss(tmp_path):
+    program_cache = ProgramCache(tmp_path)
+    program_cache.store(SOURCE, False, parse())
+
+    assert program_cache.load(SOURCE + "print 1;", False) is None
+    assert program_cache.load(SOURCE, True) is None
+
+
+def test_cache_drops_corrupt_entries(tmp_path):
+    program_cache = ProgramCache(tmp_path)
+    path = program_cache.path(SOURCE, False)
+    path.write_bytes(cache.MAGIC + b"garbage")
+
+    assert program_cache.load(SOURCE, False) is None
+    assert not path.exists()
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    program_cache = ProgramCache(tmp_path)
+    sources = [f"print {i};" for i in range(3)]
+    for used, source in enumerate(sources):
+        program_cache.store(source, False, parse(source))
+        path = program_cache.path(source, False)
+        os.utime(path, (1000 + used, 1000 + used))
+
+    # Leave room for two entries
+    program_cache.max_size = 2 * program_cache.path(sources[0], False).stat().st_size
+    program_cache.evict()
+
+    assert [program_cache.path(s, False).exists() for s in sources] == [
+        False,
+        True,
+        True,
+    ]
+
+
+def test_lox_skips_parsing_on_cache_hit(tmp_path, monkeypatch):
+    first = Lox(out=StringIO(), cache=ProgramCache(tmp_path))
+    first.run(SOURCE)
+
+    def scan_buffer(self):
+        raise AssertionError("Scanned a cached program")
+
+    monkeypatch.setattr(RegexScanner, "scan_buffer", scan_buffer)
+    second = Lox(out=StringIO(), cache=ProgramCache(tmp_path))
+    second.run(SOURCE)
+
+    assert second.out.getvalue() == first.out.getvalue() == "total: ok\n4.5\n"
+
+
+def test_lox_does_not_cache_syntax_errors(tmp_path):
+    program_cache = ProgramCache(tmp_path)
+    lox = Lox(err=StringIO(), cache=program_cache)
+
+    with pytest.raises(ParseError):
+        lox.run("print ;")
+
+    assert lox.had_error
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import pylox
+
+SRC = str(Path(pylox.__file__).parent.parent)
+
+
+@pytest.fixture
+def script(tmp_path) -> Path:
+    path = tmp_path / "script.lox"
+    path.write_text("fun f() { return 1; }\nprint f();\n")
+    return path
+
+
+def run(*args: str) -> subprocess.CompletedProcess:
+    # As from the shell, since Lox writes to the sys.stdout it was imported with
+    env = dict(os.environ, PYTHONPATH=SRC)
+    return subprocess.run(
+        [sys.executable, "-m", "pylox.cli", "--no-cache", *args],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+
+
+def test_runs_script(script: Path):
+    result = run(str(script))
+
+    assert result.returncode == 0
+    assert result.stdout == "1\n"
+
+
+def test_profile_before_script(script: Path):
+    result = run("--profile", str(script))
+
+    assert result.returncode == 0
+    assert result.stdout == "1\n"
+    assert result.stderr.startswith("Profile (sampling): ")
+
+
+def test_profile_mode(script: Path):
+    result = run("--profile", "--profile-mode", "exact", str(script))
+
+    assert result.stderr.startswith("Profile (exact): ")
+
+
+def test_profile_mode_requires_profile(script: Path):
+    result = run("--profile-mode=exact", str(script))
+
+    assert result.returncode == 2
+    assert "--profile-mode requires --profile" in result.stderr
+
+
+def test_memoize_before_script(script: Path):
+    result = run("--memoize", "--memo-stats", str(script))
+
+    assert result.returncode == 0
+    assert result.stdout == "1\n"
+    assert "f: 0 hits, 1 misses" in result.stderr
+
+
+def test_memo_size(tmp_path: Path):
+    script = tmp_path / "twice.lox"
+    script.write_text("fun f(n) { return n; }\nf(1); f(2); f(1);\n")
+
+    result = run("--memoize", "--memo-size", "1", "--memo-stats", str(script))
+
+    assert result.returncode == 0
+    assert "f: 0 hits, 3 misses, 2 evictions, 1 results" in result.stderr
+
+
+def test_memo_size_requires_memoize(script: Path):
+    result = run("--memo-size=1", str(script))
+
+    assert result.returncode == 2
+    assert "--memo-size requires --memoize" in result.stderr
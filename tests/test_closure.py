@@ -0,0 +1,48 @@
+from io import StringIO
+
+import pytest
+
+from pylox.closure import ClosureFunction, ClosureInterpreter
+from pylox.lox import Lox
+
+
+def run(program: str, engine: str) -> Lox:
+    lox = Lox(out=StringIO(), err=StringIO(), engine=engine)
+    lox.run(program)
+    return lox
+
+
+def test_lox_uses_closure_interpreter():
+    lox = Lox(engine="closure")
+
+    assert isinstance(lox.interpreter, ClosureInterpreter)
+
+
+def test_functions_are_compiled():
+    lox = run("fun f(){} var g = f;", "closure")
+
+    assert isinstance(lox.interpreter.globals.values["g"], ClosureFunction)
+
+
+@pytest.mark.parametrize(
+    "program",
+    [
+        "print 1 / 0;",
+        'print 1 < "a";',
+        'print "a" + 1;',
+        "print undefined;",
+        "undefined = 1;",
+        "var a = 1; a();",
+        "fun f(a){} f(1, 2);",
+        "fun f(a, b){ print b; } f(1);",
+        "fun f(n){ if (n > 2) return n; print n; return f(n + 1); } print f(0);",
+        "var i = 0; while (true) { i = i + 1; if (i > 3) print 1 / (i - i); }",
+    ],
+)
+def test_matches_tree_interpreter(program: str):
+    tree = run(program, "tree")
+    closure = run(program, "closure")
+
+    assert closure.out.getvalue() == tree.out.getvalue()
+    assert closure.err.getvalue() == tree.err.getvalue()
+    assert closure.had_runtime_error == tree.had_runtime_error
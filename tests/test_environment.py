@@ -2,7 +2,7 @@ from typing import Tuple
 
 import pytest
 
-from pylox.environment import Environment
+from pylox.environment import CompactEnvironment, Environment
 from pylox.exceptions import LoxRuntimeError
 from pylox.token import Token
 from pylox.token import TokenType as T
@@ -29,6 +29,22 @@ def test_define_var(environments: Tuple[Environment, Environment]):
     assert outer.values["a"] == value
 
 
+def test_define_and_assign_change_version(
+    environments: Tuple[Environment, Environment]
+):
+    outer, _ = environments
+    versions = [outer.version]
+
+    outer.define("a", 1)
+    versions.append(outer.version)
+    outer.assign(get_token("a"), 2)
+    versions.append(outer.version)
+    outer.get(get_token("a"))
+    versions.append(outer.version)
+
+    assert versions[0] < versions[1] < versions[2] == versions[3]
+
+
 def test_can_redefine_var(environments: Tuple[Environment, Environment]):
     outer, _ = environments
     value1 = object()
@@ -94,3 +110,45 @@ def test_get_undefined_var_raises(environments: Tuple[Environment, Environment])
 
     with pytest.raises(LoxRuntimeError):
         outer.get(token)
+
+
+@pytest.fixture
+def compact_environments() -> Tuple[CompactEnvironment, CompactEnvironment]:
+    outer = CompactEnvironment(2, enclosing=Environment())
+    inner = CompactEnvironment(1, enclosing=outer)
+    return outer, inner
+
+
+def test_compact_get_at_skips_shadowing_scopes(
+    compact_environments: Tuple[CompactEnvironment, CompactEnvironment]
+):
+    outer, inner = compact_environments
+    outer_val = object()
+    inner_val = object()
+    outer.define(1, outer_val)
+    inner.define(0, inner_val)
+    a = get_token("a")
+
+    assert inner.get_at(0, 0, a) == inner_val
+    assert inner.get_at(1, 1, a) == outer_val
+
+
+def test_compact_assign_at(
+    compact_environments: Tuple[CompactEnvironment, CompactEnvironment]
+):
+    outer, inner = compact_environments
+    value = object()
+
+    inner.assign_at(1, 0, value)
+
+    assert outer.values[0] == value
+    assert inner.values[0] != value
+
+
+def test_compact_get_at_undefined_var_raises(
+    compact_environments: Tuple[CompactEnvironment, CompactEnvironment]
+):
+    _, inner = compact_environments
+
+    with pytest.raises(LoxRuntimeError):
+        inner.get_at(0, 0, get_token("a"))
@@ -0,0 +1,128 @@
+from io import StringIO
+
+import pytest
+
+from pylox.hooks import HookedInterpreter, Hooks
+from pylox.interpreter import Interpreter
+from pylox.lox import Lox
+
+
+@pytest.fixture
+def lox() -> Lox:
+    return Lox(out=StringIO(), err=StringIO())
+
+
+def record(lox: Lox, *events: str):
+    seen = []
+    for event in events:
+        lox.add_hook(event, lambda *args, event=event: seen.append((event, *args)))
+    return seen
+
+
+def test_calls_and_returns(lox: Lox):
+    seen = record(lox, "call", "return")
+
+    lox.run(
+        "fun add(a, b) { return a + b; } fun twice(a) { return add(a, a); }"
+        " print twice(2) + add(1, 2);"
+    )
+
+    assert [
+        (event, function.declaration.name.lexeme, *rest)
+        for event, function, *rest in seen
+    ] == [
+        ("call", "twice", [2.0], False),
+        ("call", "add", [2.0, 2.0], True),
+        ("return", "add", 4.0),
+        ("call", "add", [1.0, 2.0], False),
+        ("return", "add", 3.0),
+    ]
+    assert lox.out.getvalue() == "7\n"
+
+
+def test_tail_calls_stay_in_constant_stack(lox: Lox):
+    calls = record(lox, "call")
+
+    lox.run(
+        "fun loop(n) { if (n == 0) return 0; return loop(n - 1); } print loop(20000);"
+    )
+
+    assert lox.out.getvalue() == "0\n"
+    assert len(calls) == 20001
+
+
+def test_statements(lox: Lox):
+    seen = record(lox, "statement")
+
+    lox.run("var a = 1;\nif (a > 0)\n  print a;\n")
+
+    assert [(type(stmt).__name__, line) for _, stmt, line in seen] == [
+        ("VarStmt", 1),
+        ("IfStmt", 2),
+        ("PrintStmt", 3),
+    ]
+
+
+def test_print(lox: Lox):
+    seen = record(lox, "print")
+
+    lox.run('print 1; print "a" + "b"; print true;')
+
+    assert seen == [("print", "1"), ("print", "ab"), ("print", "true")]
+    assert lox.out.getvalue() == "1\nab\ntrue\n"
+
+
+def test_error(lox: Lox):
+    seen = record(lox, "error")
+
+    lox.run('print 1;\nprint "a" < 1;')
+
+    assert [str(error) for _, error in seen] == ["Operands must be numbers"]
+    assert lox.err.getvalue() == "Operands must be numbers\n[line 2]\n"
+
+
+def test_stack_overflow(lox: Lox):
+    record(lox, "call")
+
+    lox.run("fun f(n) {\n return 1 + f(n);\n}\nf(1);")
+
+    assert lox.err.getvalue() == "Stack overflow.\n[line 2]\n"
+
+
+def test_hooks_are_only_installed_while_there_are_some(lox: Lox):
+    def hook(text):
+        pass
+
+    assert type(lox.interpreter) is Interpreter
+
+    lox.add_hook("print", hook)
+    lox.run("var a = 1;")
+    assert type(lox.interpreter) is HookedInterpreter
+
+    lox.remove_hook("print", hook)
+    assert type(lox.interpreter) is Interpreter
+    # State survives the switch
+    lox.run("print a;")
+    assert lox.out.getvalue() == "1\n"
+
+
+def test_unknown_event(lox: Lox):
+    with pytest.raises(ValueError):
+        lox.add_hook("jump", print)
+
+
+def test_only_tree_engine_has_hooks():
+    lox = Lox(engine="vm")
+
+    with pytest.raises(ValueError):
+        lox.add_hook("print", print)
+
+    assert not lox.hooks
+
+
+def test_hooks_bool():
+    hooks = Hooks()
+    assert not hooks
+
+    hooks.add("call", print)
+    assert hooks
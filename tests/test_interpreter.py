@@ -4,8 +4,14 @@ from unittest.mock import MagicMock
 import pytest
 
 from pylox import ast
-from pylox.interpreter import Interpreter, LoxDivisionByZero, LoxRuntimeError
+from pylox.interpreter import (
+    Interpreter,
+    LoxDivisionByZero,
+    LoxRuntimeError,
+    NativeFunction,
+)
 from pylox.lox import Lox
+from pylox.parser import ARGUMENT_LIMIT
 from pylox.token import Token
 from pylox.token import TokenType as T
 
@@ -274,3 +280,68 @@ def test_visit_binary_expr_star(interpreter: Interpreter, left, right, expected)
     value = interpreter.visit_binary_expr(expr)
 
     assert value == expected
+
+
+def test_return_completes_statements(interpreter: Interpreter):
+    keyword = Token(T.RETURN, "return", None, line=1)
+    stmt = ast.WhileStmt(
+        ast.LiteralExpr(True),
+        ast.BlockStmt([ast.ReturnStmt(keyword, ast.LiteralExpr(1))]),
+    )
+
+    assert interpreter.execute(stmt) == (1,)
+    assert interpreter.execute(ast.ExpressionStmt(ast.LiteralExpr(1))) is None
+
+
+def run_with(source: str, **natives: NativeFunction) -> Lox:
+    lox = Lox(out=StringIO(), err=StringIO())
+    for name, native in natives.items():
+        lox.interpreter.globals.define(name, native)
+    lox.run(source)
+    return lox
+
+
+def test_native_function_arity():
+    def add(a, b=10, *, scale=1):
+        return (a + b) * scale
+
+    native = NativeFunction("add", add)
+    lox = run_with("print add(1); print add(1, 2);", add=native)
+
+    assert native.arity() == 2
+    assert lox.out.getvalue() == "11\n3\n"
+
+
+def test_native_function_missing_arguments_are_nil():
+    native = NativeFunction("given", lambda a, b=1: a is not None)
+
+    lox = run_with("print given(); print given(1);", given=native)
+
+    assert lox.out.getvalue() == "false\ntrue\n"
+
+
+def test_native_function_without_signature():
+    native = NativeFunction("max", max)
+
+    lox = run_with("print max(1, 3, 2);", max=native)
+
+    assert native.arity() == ARGUMENT_LIMIT
+    assert lox.out.getvalue() == "3\n"
+
+
+def test_native_function_with_varargs():
+    native = NativeFunction("count", lambda *values: len(values))
+
+    lox = run_with("print count(); print count(1, 2, 3);", count=native)
+
+    assert native.arity() == ARGUMENT_LIMIT
+    assert lox.out.getvalue() == "0\n3\n"
+
+
+def test_native_function_explicit_arity():
+    native = NativeFunction("count", lambda *values: len(values), arity=1)
+
+    lox = run_with("print count(1);\nprint count(1, 2);", count=native)
+
+    assert lox.out.getvalue() == "1\n"
+    assert lox.err.getvalue() == "Expected 1 arguments but got 2.\n[line 2]\n"
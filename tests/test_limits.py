@@ -0,0 +1,168 @@
+import time
+from io import StringIO
+
+import pytest
+
+import pylox
+from pylox.exceptions import LoxRuntimeError
+from pylox.limits import CHECK_INTERVAL, MAX_STRING_LENGTH, Limits, LoxLimitError
+from pylox.lox import Lox
+
+ENGINES = ["tree", "closure", "vm", "python"]
+
+COUNT_TO_FIVE = "var a = 0;\nfor (var i = 0; i < 5; i = i + 1)\n  a = a + 1;\nprint a;"
+
+
+def run(source: str, limits: Limits, engine: str = "tree") -> Lox:
+    lox = Lox(out=StringIO(), err=StringIO(), engine=engine)
+    lox.interpreter.limits = limits
+    lox.run(source)
+    return lox
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_steps_stop_infinite_loop(engine: str):
+    lox = run("var i = 0;\nwhile (true) i = i + 1;", Limits(steps=10_000), engine)
+
+    assert lox.had_runtime_error
+    assert lox.err.getvalue() == "Exceeded the limit of 10000 steps.\n[line 2]\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_each_loop_iteration_is_a_step(engine: str):
+    assert run(COUNT_TO_FIVE, Limits(steps=5), engine).out.getvalue() == "5\n"
+
+    lox = run(COUNT_TO_FIVE, Limits(steps=4), engine)
+    assert lox.out.getvalue() == ""
+    assert lox.err.getvalue() == "Exceeded the limit of 4 steps.\n[line 2]\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_each_call_is_a_step(engine: str):
+    source = "fun f() {}\nf();\nf();\nf();\nprint 1;"
+
+    assert run(source, Limits(steps=3), engine).out.getvalue() == "1\n"
+    assert run(source, Limits(steps=2), engine).err.getvalue() == (
+        "Exceeded the limit of 2 steps.\n[line 4]\n"
+    )
+
+
+def test_tail_calls_are_steps():
+    # The tree engine runs tail calls in constant stack, so this never overflows
+    lox = run("fun f(n) {\n  return f(n + 1);\n}\nf(0);", Limits(steps=50_000))
+
+    assert lox.err.getvalue() == "Exceeded the limit of 50000 steps.\n[line 2]\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_timeout(engine: str):
+    lox = run("while (true) {}", Limits(timeout=0.05), engine)
+
+    assert lox.err.getvalue() == "Exceeded the time limit of 0.05s.\n[line 1]\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_string_length(engine: str):
+    source = 'var s = "ab";\nwhile (true)\n  s = s + s;'
+
+    lox = run(source, Limits(string_length=1000), engine)
+
+    assert lox.err.getvalue() == (
+        "Exceeded the limit of 1000 characters in a string.\n[line 3]\n"
+    )
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_any_limits_bound_strings(engine: str):
+    source = 'var s = "a";\nwhile (true)\n  s = s + s;'
+
+    lox = run(source, Limits(timeout=0.5), engine)
+
+    assert lox.err.getvalue() == (
+        f"Exceeded the limit of {MAX_STRING_LENGTH} characters in a string."
+        "\n[line 3]\n"
+    )
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_strings_within_length(engine: str):
+    lox = run('print "ab" + "cd";', Limits(string_length=4), engine)
+
+    assert lox.out.getvalue() == "abcd\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_live_values(engine: str):
+    # Builds an ever longer chain of closures
+    source = (
+        "fun link(next) { fun f() { return next; } return f; }\n"
+        "var chain = false;\n"
+        "while (true) chain = link(chain);"
+    )
+
+    lox = run(source, Limits(values=50_000), engine)
+
+    assert lox.err.getvalue() == (
+        "Exceeded the limit of 50000 live values.\n[line 3]\n"
+    )
+
+
+def test_limit_errors_are_runtime_errors():
+    program = pylox.compile("while (true) {}")
+
+    with pytest.raises(LoxLimitError) as info:
+        program.run(limits=Limits(steps=100))
+
+    assert isinstance(info.value, LoxRuntimeError)
+    assert info.value.limit == "steps"
+
+
+def test_program_runs_reset_limits():
+    program = pylox.compile("var i = 0; while (i < 50) i = i + 1;")
+    limits = Limits(steps=100, timeout=0.05)
+    time.sleep(0.1)
+
+    # Neither the time since the limits were made nor the steps of the
+    # runs before count against a run
+    for _ in range(3):
+        program.run(limits=limits)
+
+
+def test_no_limits_by_default():
+    assert Lox().interpreter.limits is None
+
+
+def test_steps_are_counted_exactly_across_checks():
+    limits = Limits(steps=CHECK_INTERVAL * 2 + 10)
+
+    taken = 0
+    with pytest.raises(LoxLimitError):
+        while True:
+            limits.fuel -= 1
+            if limits.fuel < 0:
+                limits.check(None)
+            taken += 1
+
+    assert taken == CHECK_INTERVAL * 2 + 10
+
+
+def test_unbounded_limits_never_run_out():
+    limits = Limits()
+
+    for _ in range(CHECK_INTERVAL * 3):
+        limits.fuel -= 1
+        if limits.fuel < 0:
+            limits.check(None)
+
+
+def test_transpiled_program_with_limits_runs_without():
+    limited = Lox(out=StringIO(), err=StringIO(), engine="python")
+    limited.interpreter.limits = Limits(steps=100, string_length=10)
+    statements = limited.parse(COUNT_TO_FIVE)
+    limited.resolve(statements)
+    program = limited.interpreter.transpile(statements)
+
+    other = Lox(out=StringIO(), err=StringIO(), engine="python")
+    program.run(other.interpreter)
+
+    assert other.out.getvalue() == "5\n"
@@ -2,14 +2,14 @@ from io import StringIO
 
 import pytest
 
-from pylox.lox import Lox
+from pylox.lox import ENGINES, Lox
 
 
-@pytest.fixture
-def lox():
+@pytest.fixture(params=ENGINES)
+def lox(request):
     out = StringIO()
     err = StringIO()
-    return Lox(out=out, err=err)
+    return Lox(out=out, err=err, engine=request.param)
 
 
 @pytest.mark.parametrize(
@@ -56,6 +56,39 @@ def test_run_valid_programs(lox: Lox, program):
             "fun out(){ var a = 1; fun in(){ return a; } return in;  } print out()();",
             "1",
         ),
+        (
+            'var a = "global";{ fun show() { print a; } show(); var a = "block";'
+            " show(); }",
+            "global\nglobal",
+        ),
+        (
+            "fun counter(){ var n = 0; fun inc(){ n = n + 1; return n; } return inc; }"
+            "var c = counter(); c(); print c();",
+            "2",
+        ),
+        ("fun f(a, b){ var c = a + b; { var d = c; print d; } } f(1, 2);", "3"),
+        (
+            "fun f(n){ while (true) { { var m = n; if (m > 2) return m; } n = n + 1; }"
+            " } print f(0); print f(5);",
+            "3\n5",
+        ),
+        (
+            "fun f(){ for (var i = 0; i < 5; i = i + 1) { if (i == 2) return; } "
+            'print "unreachable"; } print f();',
+            "nil",
+        ),
+        ("fun f(){ var a = 1; } print f();", "nil"),
+        (
+            "var a = 1; fun f(){ return a; } print f(); a = 2; print f();"
+            " var a = 3; print f();",
+            "1\n2\n3",
+        ),
+        (
+            "fun f(){ return g(); } fun g(){ return 1; } print f();"
+            " fun g(){ return 2; } print f();",
+            "1\n2",
+        ),
+        ("{ var i = 0; while (i < 2) { { var j = i; print j; } i = i + 1; } }", "0\n1"),
     ],
 )
 def test_program_for_expected_output(lox: Lox, program: str, expected: str):
@@ -64,3 +97,94 @@ def test_program_for_expected_output(lox: Lox, program: str, expected: str):
     out = lox.out.getvalue()[:-1]  # Strip the newline
 
     assert out == expected
+
+
+@pytest.mark.parametrize(
+    "program",
+    ["{ var a = 1; var a = 2; }", "{ var a = a; }", "return 1;"],
+)
+def test_resolution_errors(lox: Lox, program: str):
+    lox.run(program)
+
+    assert lox.had_error
+    assert lox.out.getvalue() == ""
+
+
+def test_run_stream_matches_run(lox: Lox):
+    program = (
+        "fun add(a, b) { return a + b; }\n"
+        "var total = 0;\n"
+        "for (var i = 0; i < 3; i = i + 1) { total = add(total, i); }\n"
+        'print "total: " + "ok";\n'
+        "print total;\n"
+    )
+    chunks = [program[i : i + 7] for i in range(0, len(program), 7)]
+    lox.run_stream(chunks)
+
+    assert lox.err.getvalue() == ""
+    assert lox.out.getvalue() == "total: ok\n3\n"
+
+
+def test_run_stream_runs_declarations_before_an_error(lox: Lox):
+    lox.run_stream(["print 1;\nprint 2\nprint 3;\n", "print 4;"])
+
+    assert lox.out.getvalue() == "1\n"
+    assert (
+        lox.err.getvalue() == "[line 3] Error at 'print': Expect \";\" after value.\n"
+    )
+    assert lox.had_error
+
+
+def test_run_stream_stops_at_runtime_error(lox: Lox):
+    lox.run_stream(['print 1;\nprint 1 < "a";\nprint 2;'])
+
+    assert lox.out.getvalue() == "1\n"
+    assert lox.err.getvalue() == "Operands must be numbers\n[line 2]\n"
+    assert lox.had_runtime_error
+
+
+def test_run_stream_releases_resolved_statements(lox: Lox):
+    lox.run_stream(["{ var a = 1; print a; }\n", "fun f() { var b = 2; return b; }"])
+
+    interpreter = lox.interpreter
+    # Only what the function body needs is left
+    assert len(interpreter.locals) == 1
+    assert len(interpreter.scope_sizes) == 1
+
+
+@pytest.mark.parametrize(
+    "program,expected",
+    [
+        (
+            "fun loop(n, acc) { if (n == 0) return acc; return loop(n - 1, acc + n); }"
+            " print loop(20000, 0);",
+            "200010000",
+        ),
+        (
+            "fun even(n) { if (n == 0) return true; return (odd(n - 1)); }"
+            " fun odd(n) { if (n == 0) return false; return even(n - 1); }"
+            " print even(20001);",
+            "false",
+        ),
+    ],
+)
+def test_tail_calls_run_in_constant_stack(program: str, expected: str):
+    lox = Lox(out=StringIO(), err=StringIO())
+
+    lox.run(program)
+
+    assert lox.err.getvalue() == ""
+    assert lox.out.getvalue().strip() == expected
+
+
+def test_tail_call_errors(lox: Lox):
+    lox.run("fun f(a) { return a; } fun g() { return f(1, 2); } g();")
+
+    assert lox.err.getvalue() == "Expected 1 arguments but got 2.\n[line 1]\n"
+
+
+def test_deep_recursion_is_stack_overflow(lox: Lox):
+    lox.run("fun f(n) {\n if (n == 0) return 0;\n return 1 + f(n - 1);\n}\nf(100000);")
+
+    assert lox.had_runtime_error
+    assert lox.err.getvalue() == "Stack overflow.\n[line 3]\n"
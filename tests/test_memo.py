@@ -0,0 +1,142 @@
+from io import StringIO
+
+import pytest
+
+from pylox.lox import Lox
+from pylox.memo import Memo
+
+
+def run(program: str, size=16, policy="lru") -> Lox:
+    lox = Lox(out=StringIO(), err=StringIO())
+    lox.interpreter.memo_size = size
+    lox.interpreter.memo_policy = policy
+    lox.run(program)
+    assert lox.err.getvalue() == ""
+    return lox
+
+
+def stats(lox: Lox):
+    return {stats["function"]: stats for stats in lox.interpreter.memo_stats()}
+
+
+@pytest.mark.parametrize(
+    "program",
+    [
+        "fun f(n) { return n * 2; }",
+        "fun f(n) { var a = n; { var b = a; a = b + 1; } return a; }",
+        "fun f(n) { var i = 0; while (i < n) i = i + 1; return i; }",
+        "var k = 2; fun f(n) { return n * k; }",
+        "fun f(n) { if (n < 2) return n; return f(n - 1) + f(n - 2); }",
+    ],
+)
+def test_pure_functions_are_memoized(program: str):
+    lox = run(program)
+
+    assert [stats["function"] for stats in lox.interpreter.memo_stats()] == ["f"]
+
+
+@pytest.mark.parametrize(
+    "program",
+    [
+        "fun f(n) { print n; }",
+        "var a = 1; fun f(n) { a = n; }",
+        "fun f(n) { fun g() { return n; } return g; }",
+        "fun f(g) { return g(); }",
+        "fun f() { return f()(); }",
+        "fun f() { var a = 1; fun g() { return a; } return g(); }",
+        "fun outer(a) { fun f() { return a; } } outer(1);",
+        "fun outer() { var a = 1; fun f() { a = 2; } } outer();",
+    ],
+)
+def test_impure_functions_are_not_memoized(program: str):
+    lox = run(program)
+
+    assert "f" not in stats(lox)
+
+
+def test_memoized_results():
+    lox = run(
+        "fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }"
+        " print fib(30); print fib(30);"
+    )
+
+    assert lox.out.getvalue() == "832040\n832040\n"
+    assert stats(lox)["fib"] == {
+        "function": "fib",
+        "hits": 29,
+        "misses": 31,
+        "evictions": 15,
+        "size": 16,
+    }
+
+
+def test_memoization_is_off_by_default():
+    lox = Lox(out=StringIO())
+
+    lox.run("fun f(n) { return n; } print f(1);")
+
+    assert lox.interpreter.memo_stats() == []
+
+
+def test_arguments_are_keyed_by_type():
+    lox = run("fun id(x) { return x; } print id(1); print id(true); print id(1);")
+
+    assert lox.out.getvalue() == "1\ntrue\n1\n"
+    assert stats(lox)["id"]["hits"] == 1
+
+
+def test_results_depend_on_globals_read():
+    lox = run(
+        "var k = 2; fun f(n) { return n * k; } print f(1);"
+        " k = 3; print f(1); k = 4; print f(1);"
+    )
+
+    assert lox.out.getvalue() == "2\n3\n4\n"
+    assert stats(lox)["f"]["hits"] == 0
+
+
+def test_results_depend_on_globals_callees_read():
+    lox = run(
+        "var k = 2; fun g(n) { return n * k; } fun f(n) { return g(n) + 1; }"
+        " print f(1); k = 3; print f(1);"
+    )
+
+    assert lox.out.getvalue() == "3\n4\n"
+
+
+def test_calls_to_impure_functions_are_not_memoized():
+    lox = run(
+        "fun g() { return 1; } fun f() { return g(); } print f(); print f();"
+        " fun g() { print 2; return 3; } print f(); print f();"
+    )
+
+    assert lox.out.getvalue() == "1\n1\n2\n3\n2\n3\n"
+
+
+def test_calls_to_natives_are_not_memoized():
+    lox = run("fun f() { return clock(); } f(); f();")
+
+    assert stats(lox)["f"]["hits"] == 0
+
+
+def test_tail_calls_memoize_each_call():
+    lox = run(
+        "fun loop(n, acc) { if (n == 0) return acc; return loop(n - 1, acc + n); }"
+        " print loop(20000, 0); print loop(10, 200009945);",
+        size=None,
+    )
+
+    assert lox.out.getvalue() == "200010000\n200010000\n"
+    assert stats(lox)["loop"]["hits"] == 1
+
+
+@pytest.mark.parametrize("policy,kept", [("lru", ["a", "c"]), ("fifo", ["b", "c"])])
+def test_eviction_policy(policy: str, kept: list):
+    memo = Memo("f", frozenset(), frozenset(), 2, policy)
+    memo.put("a", 1)
+    memo.put("b", 2)
+    memo.get("a")
+    memo.put("c", 3)
+
+    assert memo.evictions == 1
+    assert sorted(memo.results) == kept
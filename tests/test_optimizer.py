@@ -0,0 +1,100 @@
+from io import StringIO
+from typing import List
+
+import pytest
+
+from pylox import ast
+from pylox.lox import ENGINES, Lox
+from pylox.optimizer import Optimizer
+from pylox.parser import Parser
+
+
+def optimize(source: str) -> List[ast.Stmt]:
+    lox = Lox(out=StringIO(), err=StringIO())
+    statements = Parser(lox, lox.scan(source)).parse()
+    return Optimizer().optimize(statements)
+
+
+def expression(source: str) -> ast.Expr:
+    (statement,) = optimize(f"print {source};")
+    assert isinstance(statement, ast.PrintStmt)
+    return statement.expression
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [
+        ("1 + 2 * 3", 7),
+        ("(1 + 2) * 3", 9),
+        ("4 / 2", 2.0),
+        ('"a" + "b"', "ab"),
+        ('"a" + 1', None),
+        ("1 < 2", True),
+        ("1 == 1.0", True),
+        ("!true", False),
+        ("-(2 - 3)", 1),
+        ("false or 2", 2),
+        ("1 and 2", 2),
+        ("false and a", False),
+        ("1 or a", 1),
+    ],
+)
+def test_folds_literal_expressions(source: str, expected):
+    expr = expression(source)
+
+    assert isinstance(expr, ast.LiteralExpr)
+    assert expr.value == expected
+    assert type(expr.value) is type(expected)
+
+
+@pytest.mark.parametrize("source", ["1 / 0", '1 < "a"', '-"a"', "1 + a"])
+def test_leaves_runtime_errors_and_variables(source: str):
+    assert not isinstance(expression(source), ast.LiteralExpr)
+
+
+def test_logical_with_literal_left_is_replaced_by_right_operand():
+    expr = expression("true and a")
+
+    assert isinstance(expr, ast.VariableExpr)
+
+
+def test_prunes_constant_if():
+    (statement,) = optimize("if (1 < 2) print 1; else print 2;")
+
+    assert isinstance(statement, ast.PrintStmt)
+    assert statement.expression.value == 1
+
+
+def test_removes_constant_false_if_and_while():
+    assert optimize("if (false) print 1; while (!true) print 2; 1 + 2;") == []
+
+
+def test_drops_statements_after_return():
+    (function,) = optimize("fun f() { print 1; return 2; print 3; { print 4; } }")
+
+    assert len(function.body) == 2
+    assert isinstance(function.body[-1], ast.ReturnStmt)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "program",
+    [
+        "print 2 * (3 + 4) - 1;",
+        'if ("a" + "b" == "ab") print "folded"; else print "wrong";',
+        "while (false) print 1; print 2;",
+        "fun f() { return 1; print 2; } print f();",
+        "print 1;\nprint 1 / 0;",
+        'if (false) print 1 < "a"; print 2;',
+        "print -0.0; print 0.0;",
+    ],
+)
+def test_optimized_programs_behave_the_same(engine: str, program: str):
+    plain = Lox(out=StringIO(), err=StringIO(), engine=engine)
+    optimized = Lox(out=StringIO(), err=StringIO(), engine=engine, optimize=True)
+
+    plain.run(program)
+    optimized.run(program)
+
+    assert optimized.out.getvalue() == plain.out.getvalue()
+    assert optimized.err.getvalue() == plain.err.getvalue()
@@ -1,11 +1,13 @@
-from typing import Any, List
+from io import StringIO
+from typing import Any, List, Optional
 
 import pytest
 
 from pylox import ast
-from pylox.lox import Lox
-from pylox.parser import ParseError, Parser
+from pylox.lox import ENGINES, Lox
+from pylox.parser import MAX_NESTING, BufferParser, ParseError, Parser, StreamingParser
 from pylox.printer import AstPrinter
+from pylox.scanner import RegexScanner
 from pylox.token import Token, TokenType
 
 
@@ -158,3 +160,105 @@ def test_parser_return_value():
     assert isinstance(stmt, ast.ReturnStmt)
     assert isinstance(stmt.value, ast.LiteralExpr)
     assert stmt.value.value == 1
+
+
+def test_streaming_parser_matches_parser():
+    source = "var a = 1; fun f(b) { return a + b; } if (f(2) > 2) print -f(3); else {}"
+    lox = Lox()
+
+    statements = Parser(lox, lox.scan(source)).parse()
+    streamed = StreamingParser(lox, iter(lox.scan(source))).parse()
+
+    assert repr(streamed) == repr(statements)
+
+
+def test_buffer_parser_matches_parser():
+    source = "var a = 1; fun f(b) { return a + b; } if (f(2) > 2) print -f(3); else {}"
+    lox = Lox()
+
+    statements = Parser(lox, lox.scan(source)).parse()
+    buffered = BufferParser(lox, RegexScanner(lox, source).scan_buffer()).parse()
+
+    assert repr(buffered) == repr(statements)
+
+
+def parse_expression(source: str, lox: Optional[Lox] = None) -> ast.Expr:
+    lox = lox or Lox()
+    return Parser(lox, lox.scan(source)).expression()
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [
+        ("1 - 2 - 3", "(- (- 1 2) 3)"),
+        ("1 + 2 * 3", "(+ 1 (* 2 3))"),
+        ("-1 * 2", "(* (- 1) 2)"),
+        ("!!true", "(! (! True))"),
+        ("1 < 2 == true", "(== (< 1 2) True)"),
+        ("true or false and 1", "(or True (and False 1))"),
+        ("(1 + 2) * 3", "(* (group (+ 1 2)) 3)"),
+        ('-"f"(1)(2)', "(- (call (call f)))"),
+    ],
+)
+def test_precedence(source: str, expected: str):
+    assert AstPrinter().print(parse_expression(source)) == expected
+
+
+def test_assignment_is_right_associative():
+    expr = parse_expression("a = b = 1")
+
+    assert isinstance(expr, ast.AssignExpr)
+    assert expr.name.lexeme == "a"
+    assert isinstance(expr.value, ast.AssignExpr)
+    assert expr.value.name.lexeme == "b"
+
+
+def test_invalid_assignment_target():
+    lox = Lox(err=StringIO())
+
+    expr = parse_expression("1 + 2 = 3", lox)
+
+    assert AstPrinter().print(expr) == "(+ 1 2)"
+    assert lox.err.getvalue() == "[line 1] Error at '=': Invalid assignment target.\n"
+
+
+def test_long_unary_chain_does_not_recurse():
+    expr = parse_expression("!" * (MAX_NESTING - 1) + "true")
+
+    for _ in range(MAX_NESTING - 1):
+        assert isinstance(expr, ast.UnaryExpr)
+        expr = expr.right
+    assert isinstance(expr, ast.LiteralExpr)
+
+
+def nested(shape: str, height: int) -> str:
+    # An expression whose syntax tree is height levels deep
+    if shape == "chain":
+        return " + ".join(["1"] * height)
+    opening = {"grouping": "(", "call": "f(", "unary": "-"}[shape]
+    closing = "" if shape == "unary" else ")"
+    return opening * (height - 1) + "1" + closing * (height - 1)
+
+
+SHAPES = ["chain", "grouping", "call", "unary"]
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_too_much_nesting(shape: str):
+    lox = Lox(out=StringIO(), err=StringIO())
+
+    with pytest.raises(ParseError):
+        lox.run(f"print {nested(shape, 300)};")
+
+    assert "Can't nest expressions more than 128 levels deep." in lox.err.getvalue()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("shape", SHAPES)
+def test_nesting_limit_runs_everywhere(shape: str, engine: str):
+    lox = Lox(out=StringIO(), err=StringIO(), engine=engine)
+
+    lox.run(f"fun f(x) {{ return x; }}\nprint {nested(shape, MAX_NESTING)};")
+
+    assert lox.err.getvalue() == ""
+    assert lox.out.getvalue() == {"chain": "128\n", "unary": "-1\n"}.get(shape, "1\n")
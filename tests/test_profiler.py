@@ -0,0 +1,122 @@
+from io import StringIO
+
+import pytest
+
+from pylox.hooks import HookedInterpreter, line_of
+from pylox.lox import Lox
+from pylox.profiler import SCRIPT, Profiler
+
+PROGRAM = """fun fib(n) {
+  if (n < 2) return n;
+  return fib(n - 1) + fib(n - 2);
+}
+fun count(n) {
+  if (n == 0) return 0;
+  return count(n - 1);
+}
+var i = 0;
+while (i < 300) {
+  fib(6);
+  i = i + 1;
+}
+print count(100);
+"""
+
+
+def profile(mode: str, **kwargs) -> Profiler:
+    lox = Lox(out=StringIO(), err=StringIO())
+    profiler = Profiler(mode, **kwargs)
+    profiler.attach(lox)
+
+    with profiler:
+        lox.run(PROGRAM)
+
+    assert lox.out.getvalue() == "0\n"
+    assert lox.err.getvalue() == ""
+    return profiler
+
+
+def test_exact_mode_counts_calls():
+    profiler = profile("exact")
+
+    assert profiler.calls == {"fib:1": 300 * 25, "count:5": 101}
+
+
+def test_exact_mode_attributes_time():
+    profiler = profile("exact")
+
+    functions = profiler.functions()
+    assert set(functions) == {SCRIPT, "fib:1", "count:5"}
+    _, total_time = functions[SCRIPT]
+    assert total_time == pytest.approx(sum(profiler.weights.values()))
+    # fib calls nothing else, so all its time is its own
+    assert total_time > functions["fib:1"][1] == functions["fib:1"][0] > 0
+
+    assert set(profiler.line_times()) >= {2, 3, 6, 7, 10, 11, 12, 14}
+
+
+def test_exact_mode_tail_calls_replace_the_caller():
+    profiler = profile("exact")
+
+    # count's tail calls run in place of each other, so are never nested
+    stacks = {stack for stack, _ in profiler.weights}
+    assert (SCRIPT, "count:5") in stacks
+    assert (SCRIPT, "count:5", "count:5") not in stacks
+    assert (SCRIPT, "fib:1", "fib:1", "fib:1") in stacks
+
+
+def test_sampling_mode():
+    profiler = profile("sampling", interval=0.0001)
+
+    stacks = {stack for stack, _ in profiler.weights}
+    assert stacks <= {(SCRIPT,)} | {(SCRIPT,) + ("fib:1",) * n for n in range(1, 7)} | {
+        (SCRIPT, "count:5")
+    }
+    assert any(len(stack) > 1 for stack in stacks)
+    assert sum(profiler.line_times().values()) == pytest.approx(profiler.elapsed)
+    assert not profiler.calls
+
+
+def test_collapsed_stacks():
+    profiler = profile("exact")
+
+    lines = profiler.collapsed().splitlines()
+
+    assert lines
+    for line in lines:
+        frames, weight = line.rsplit(" ", 1)
+        assert frames.startswith(SCRIPT)
+        assert int(weight) > 0
+    assert any(line.startswith(f"{SCRIPT};fib:1;line 2 ") for line in lines)
+
+
+def test_report():
+    report = profile("exact").report()
+
+    assert report.startswith("Profile (exact): ")
+    assert "fib:1" in report
+    assert "7500" in report
+
+
+def test_attach_replaces_interpreter_in_exact_mode():
+    lox = Lox()
+
+    Profiler("exact").attach(lox)
+
+    assert isinstance(lox.interpreter, HookedInterpreter)
+
+
+def test_attach_needs_tree_engine():
+    with pytest.raises(ValueError):
+        Profiler().attach(Lox(engine="vm"))
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        Profiler("guess")
+
+
+def test_line_of():
+    statements = Lox().parse('print\n1 + 2;\nprint "a";')
+
+    assert [line_of(statement) for statement in statements] == [2, None]
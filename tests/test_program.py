@@ -0,0 +1,178 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+import pytest
+
+import pylox
+from pylox.exceptions import LoxRuntimeError
+from pylox.interpreter import Callable
+from pylox.limits import Limits
+from pylox.lox import ENGINES as ENGINE_CLASSES
+from pylox.program import CompileError, Diagnostic
+
+ENGINES = ["tree", "closure", "vm", "python"]
+
+SOURCE = """
+fun scale(n) {
+  var scaled = n * factor;
+  return scaled;
+}
+var result = scale(input);
+print result;
+"""
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_run_many_times(engine: str):
+    program = pylox.compile(SOURCE, engine=engine)
+
+    for input in range(3):
+        out = StringIO()
+        results = program.run(globals={"input": input, "factor": 10}, out=out)
+
+        assert out.getvalue() == f"{input * 10}\n"
+        assert results["result"] == input * 10
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_runs_start_fresh(engine: str):
+    program = pylox.compile(
+        "var count = 0; count = count + 1; print count;", engine=engine
+    )
+
+    for _ in range(2):
+        out = StringIO()
+        results = program.run(globals={"extra": 1}, out=out)
+        assert out.getvalue() == "1\n"
+    assert "extra" in results
+    assert "extra" not in program.run(out=StringIO())
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_prepares_once(engine: str, monkeypatch):
+    program = pylox.compile(SOURCE, engine=engine)
+    limits = Limits(steps=100)
+    program.run(globals={"input": 1, "factor": 2}, out=StringIO(), limits=limits)
+
+    def fail(*args):
+        raise AssertionError("prepared again")
+
+    monkeypatch.setattr(ENGINE_CLASSES[engine], "prepare", fail)
+
+    for input in range(3):
+        out = StringIO()
+        program.run(globals={"input": input, "factor": 2}, out=out)
+        program.run(globals={"input": input, "factor": 2}, out=out, limits=limits)
+        assert out.getvalue() == f"{input * 2}\n" * 2
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_runs_from_threads(engine: str):
+    program = pylox.compile(
+        "var total = 0;\n"
+        "for (var i = 0; i < 2000; i = i + 1) total = total + input;\n"
+        "print total;",
+        engine=engine,
+    )
+
+    def run(input: int) -> str:
+        out = StringIO()
+        program.run(globals={"input": input}, out=out)
+        return out.getvalue()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        outputs = list(executor.map(run, range(40)))
+
+    assert outputs == [f"{input * 2000}\n" for input in range(40)]
+
+
+def test_skips_scanning_and_parsing(monkeypatch):
+    program = pylox.compile(SOURCE)
+
+    def fail(*args):
+        raise AssertionError("scanned again")
+
+    monkeypatch.setattr("pylox.scanner.RegexScanner.scan_buffer", fail)
+    monkeypatch.setattr("pylox.parser.Parser.parse", fail)
+
+    program.run(globals={"input": 1, "factor": 2}, out=StringIO())
+
+
+def test_optimize():
+    program = pylox.compile("print 1 + 2 * x;", optimize=True)
+    out = StringIO()
+
+    program.run(globals={"x": 3}, out=out)
+
+    assert out.getvalue() == "7\n"
+
+
+def test_native_function_global():
+    class double(Callable):
+        def arity(self):
+            return 1
+
+        def call(self, interpreter, *args):
+            return args[0] * 2
+
+    out = StringIO()
+
+    pylox.compile("print double(21);").run(globals={"double": double()}, out=out)
+
+    assert out.getvalue() == "42\n"
+
+
+def test_globals_must_be_lox_values():
+    program = pylox.compile("print x;")
+
+    with pytest.raises(TypeError, match="Global 'x' is a list"):
+        program.run(globals={"x": []})
+
+
+def test_programs_are_immutable():
+    program = pylox.compile("print 1;")
+
+    with pytest.raises(AttributeError):
+        program.engine = "vm"
+    assert isinstance(program.statements, tuple)
+    with pytest.raises(TypeError):
+        program.locals[None] = (0, 0)  # type: ignore[index]
+
+
+def test_compile_errors():
+    with pytest.raises(CompileError) as info:
+        pylox.compile('var a = ;\nprint 1\nprint "unterminated')
+
+    assert info.value.errors == [
+        Diagnostic(3, "", "Unterminated string."),
+        Diagnostic(1, " at ';'", "Expect expression."),
+        Diagnostic(3, " at 'print'", 'Expect ";" after value.'),
+    ]
+    assert (
+        str(info.value).splitlines()[1] == "[line 1] Error at ';': Expect expression."
+    )
+
+
+def test_resolution_errors():
+    with pytest.raises(CompileError) as info:
+        pylox.compile("{ var a = a; }")
+
+    assert [error.message for error in info.value.errors] == [
+        "Can't read local variable in its own initializer."
+    ]
+
+
+def test_runtime_errors_are_raised():
+    program = pylox.compile('print 1;\nprint "a" < 1;')
+    out = StringIO()
+
+    with pytest.raises(LoxRuntimeError, match="Operands must be numbers") as info:
+        program.run(out=out)
+
+    assert info.value.token.line == 2
+    assert out.getvalue() == "1\n"
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        pylox.compile("print 1;", engine="jit")
@@ -0,0 +1,118 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from pylox import ast
+from pylox.interpreter import Interpreter
+from pylox.lox import Lox
+from pylox.resolver import Resolver
+from pylox.token import Token
+from pylox.token import TokenType as T
+
+
+@pytest.fixture
+def lox() -> Lox:
+    return MagicMock(spec=Lox)
+
+
+@pytest.fixture
+def interpreter(lox) -> Interpreter:
+    return Interpreter(lox)
+
+
+def get_token(lexeme: str) -> Token:
+    return Token(T.IDENTIFIER, lexeme=lexeme, literal=None, line=1)
+
+
+def test_global_variable_is_not_resolved(lox, interpreter: Interpreter):
+    expr = ast.VariableExpr(get_token("a"))
+    statements = [
+        ast.VarStmt(get_token("a"), None),
+        ast.ExpressionStmt(expr),
+    ]
+
+    Resolver(lox, interpreter).resolve(statements)
+
+    assert expr not in interpreter.locals
+
+
+def test_local_variable_depth_and_slot(lox, interpreter: Interpreter):
+    inner = ast.VariableExpr(get_token("b"))
+    outer = ast.AssignExpr(get_token("b"), ast.LiteralExpr(1))
+    statements = [
+        ast.BlockStmt(
+            [
+                ast.VarStmt(get_token("a"), None),
+                ast.VarStmt(get_token("b"), None),
+                ast.ExpressionStmt(outer),
+                ast.BlockStmt(
+                    [
+                        ast.VarStmt(get_token("c"), None),
+                        ast.ExpressionStmt(inner),
+                    ]
+                ),
+            ]
+        )
+    ]
+
+    Resolver(lox, interpreter).resolve(statements)
+
+    assert interpreter.locals[outer] == (0, 1)
+    assert interpreter.locals[inner] == (1, 1)
+    assert interpreter.scope_sizes[statements[0]] == 2
+
+
+def test_block_without_declarations_has_no_scope(lox, interpreter: Interpreter):
+    expr = ast.VariableExpr(get_token("a"))
+    block = ast.BlockStmt([ast.ExpressionStmt(expr)])
+    statements = [ast.BlockStmt([ast.VarStmt(get_token("a"), None), block])]
+
+    Resolver(lox, interpreter).resolve(statements)
+
+    assert interpreter.locals[expr] == (0, 0)
+    assert block not in interpreter.scope_sizes
+
+
+def test_function_parameter_slots(lox, interpreter: Interpreter):
+    expr = ast.VariableExpr(get_token("b"))
+    function = ast.FunctionStmt(
+        get_token("f"),
+        [get_token("a"), get_token("b")],
+        [ast.VarStmt(get_token("c"), expr)],
+    )
+
+    Resolver(lox, interpreter).resolve([function])
+
+    assert interpreter.locals[expr] == (0, 1)
+    assert interpreter.scope_sizes[function] == 3
+    assert function not in interpreter.slots
+
+
+def test_read_in_own_initializer_errors(lox, interpreter: Interpreter):
+    statements = [
+        ast.BlockStmt([ast.VarStmt(get_token("a"), ast.VariableExpr(get_token("a")))])
+    ]
+
+    Resolver(lox, interpreter).resolve(statements)
+
+    lox.error.assert_called_once()
+
+
+def test_redeclare_in_local_scope_errors(lox, interpreter: Interpreter):
+    statements = [
+        ast.BlockStmt(
+            [ast.VarStmt(get_token("a"), None), ast.VarStmt(get_token("a"), None)]
+        )
+    ]
+
+    Resolver(lox, interpreter).resolve(statements)
+
+    lox.error.assert_called_once()
+
+
+def test_top_level_return_errors(lox, interpreter: Interpreter):
+    statements = [ast.ReturnStmt(Token(T.RETURN, "return", None, 1), None)]
+
+    Resolver(lox, interpreter).resolve(statements)
+
+    lox.error.assert_called_once()
@@ -1,7 +1,9 @@
+import io
+
 import pytest
 
 from pylox.lox import Lox
-from pylox.scanner import Scanner
+from pylox.scanner import RegexScanner, Scanner
 from pylox.token import TokenType as T
 
 
@@ -120,3 +122,52 @@ def test_scan_tokens(source, expected_token_types):
     tokens = scanner.scan_tokens()
     token_types = [t.type for t in tokens]
     assert token_types == expected_token_types
+
+
+def scan_with(scanner_class, source: str):
+    lox = Lox(err=io.StringIO())
+    tokens = scanner_class(lox, source).scan_tokens()
+    return (
+        [(t.type, t.lexeme, t.literal, type(t.literal), t.line) for t in tokens],
+        lox.err.getvalue(),
+    )
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "",
+        "var a = 1;\nprint a + 2.5;",
+        "fun f(x) { return x >= 10 and !nil; }\n// done",
+        'print "multi\nline";\nprint after;',
+        "a.b, c-d /e //comment\n*f",
+        "12.34.5 7. _under score_9",
+        '"unterminated\nstring',
+        "var @ = 1;\n#",
+        "\n\n\t\r classy orchid fortune",
+    ],
+)
+def test_regex_scanner_matches_scanner(source):
+    assert scan_with(RegexScanner, source) == scan_with(Scanner, source)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "",
+        "var a = 1;\nprint a + 2.5;",
+        'print "multi\nline";\nprint after;',
+        '"unterminated\nstring',
+        "var @ = 1;\n#",
+    ],
+)
+def test_scan_buffer_matches_scanner(source):
+    lox = Lox(err=io.StringIO())
+    buffer = RegexScanner(lox, source).scan_buffer()
+    tokens = [buffer[i] for i in range(len(buffer))]
+
+    expected_tokens, expected_errors = scan_with(Scanner, source)
+    assert [
+        (t.type, t.lexeme, t.literal, type(t.literal), t.line) for t in tokens
+    ] == expected_tokens
+    assert lox.err.getvalue() == expected_errors
@@ -0,0 +1,135 @@
+from io import StringIO
+
+import pytest
+
+from pylox.cache import ProgramCache
+from pylox.lox import Lox
+from pylox.scanner import RegexScanner
+from pylox.timings import count_nodes
+
+SOURCE = "var a = 1;\nfor (var i = 0; i < 3; i = i + 1) a = a * 2;\nprint a;\n"
+
+
+def timed(**kwargs) -> Lox:
+    return Lox(out=StringIO(), err=StringIO(), timings=True, **kwargs)
+
+
+def test_timings_are_off_by_default():
+    assert Lox().timings is None
+
+
+def test_phases_and_sizes():
+    lox = timed()
+
+    lox.run(SOURCE)
+
+    assert lox.out.getvalue() == "8\n"
+    report = lox.timings.report()
+    assert list(report["phases"]) == ["scan", "parse", "resolve", "interpret"]
+    for phase in report["phases"].values():
+        assert phase["wall"] >= 0 and phase["cpu"] >= 0
+    assert report["total"]["wall"] == sum(
+        phase["wall"] for phase in report["phases"].values()
+    )
+    assert report["sizes"]["source_bytes"] == len(SOURCE)
+    assert report["sizes"]["tokens"] == len(RegexScanner(Lox(), SOURCE).scan_buffer())
+    assert report["sizes"]["nodes"] == count_nodes(Lox().parse(SOURCE))
+
+
+def test_sizes():
+    lox = timed()
+
+    lox.run("print 1 + 2;")
+
+    # print, binary and two literals; and the tokens include EOF
+    assert lox.timings.nodes == 4
+    assert lox.timings.tokens == 6
+    assert lox.timings.statements == 1
+
+
+def test_statements_executed():
+    lox = timed()
+
+    lox.run(SOURCE)
+
+    # The for loop desugars to a block holding its initializer and a while,
+    # whose body is a block of the loop's body and its increment
+    assert lox.timings.statements == 2 + 2 + 3 * 3 + 1
+    assert not lox.hooks
+
+
+FIB = "fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }"
+
+
+@pytest.mark.parametrize("engine", ["tree", "closure", "vm", "python"])
+@pytest.mark.parametrize("source", [SOURCE, FIB + " print fib(10);"])
+def test_statements_counted_alike_by_every_engine(engine: str, source: str):
+    tree, lox = timed(), timed(engine=engine)
+
+    tree.run(source)
+    lox.run(source)
+
+    assert lox.timings.statements == tree.timings.statements > 0
+    assert lox.out.getvalue() == tree.out.getvalue()
+
+
+def test_timings_keep_memoization():
+    lox = timed()
+    lox.interpreter.memo_size = 100
+
+    lox.run(FIB + " print fib(20);")
+
+    [stats] = lox.interpreter.memo_stats()
+    assert stats["hits"] > 0
+    # Each call to fib runs its body's if, and one return, once
+    assert lox.timings.statements == 1 + 1 + 21 * 2
+
+
+def test_statements_counted_with_hooks():
+    lox = timed()
+    seen = []
+    lox.add_hook("statement", lambda stmt, line: seen.append(stmt))
+
+    lox.run(SOURCE)
+
+    assert lox.timings.statements == len(seen) == 2 + 2 + 3 * 3 + 1
+
+
+def test_optimize_phase():
+    lox = timed(optimize=True)
+
+    lox.run(SOURCE)
+
+    assert "optimize" in lox.timings.phases
+
+
+def test_cache_hit_skips_scan_and_parse(tmp_path):
+    timed(cache=ProgramCache(tmp_path)).run(SOURCE)
+    lox = timed(cache=ProgramCache(tmp_path))
+
+    lox.run(SOURCE)
+
+    assert lox.out.getvalue() == "8\n"
+    assert "scan" not in lox.timings.phases
+    assert "parse" not in lox.timings.phases
+    assert "cache" in lox.timings.phases
+    assert lox.timings.tokens == 0
+    assert lox.timings.nodes > 0
+
+
+def test_stream():
+    lox = timed()
+
+    lox.run_stream(iter([SOURCE[:20], SOURCE[20:]]))
+
+    assert lox.out.getvalue() == "8\n"
+    assert list(lox.timings.phases) == ["parse", "resolve", "interpret"]
+    assert lox.timings.source_bytes == len(SOURCE)
+    assert lox.timings.tokens == len(RegexScanner(Lox(), SOURCE).scan_buffer())
+    assert lox.timings.nodes == count_nodes(Lox().parse(SOURCE))
+
+
+def test_count_nodes():
+    lox = Lox()
+
+    assert count_nodes(lox.parse("print -(1 + 2);")) == 6
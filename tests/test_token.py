@@ -1,4 +1,4 @@
-from pylox.token import Token
+from pylox.token import Token, TokenBuffer
 from pylox.token import TokenType as T
 
 
@@ -32,3 +32,28 @@ def test_token_str_with_literal():
     value = str(token)
 
     assert value == 'STRING["string"]'
+
+
+def test_token_buffer():
+    buffer = TokenBuffer('var a =\n"one\ntwo";')
+    buffer.newlines.extend([7, 12])
+    buffer.append(T.VAR, 0, 3)
+    buffer.append(T.STRING, 8, 9)
+    buffer.append(T.EOF, 19, 0)
+
+    assert len(buffer) == 3
+    assert buffer.type(0) == T.VAR
+    assert buffer.lexeme(1) == '"one\ntwo"'
+    assert buffer.literal(1) == "one\ntwo"
+    assert [buffer.line(i) for i in range(3)] == [1, 3, 3]
+    assert repr(buffer[1]) == repr(Token(T.STRING, '"one\ntwo"', "one\ntwo", 3))
+
+
+def test_token_buffer_shares_tokens():
+    buffer = TokenBuffer("a + a")
+    buffer.append(T.IDENTIFIER, 0, 1)
+    buffer.append(T.PLUS, 2, 1)
+    buffer.append(T.IDENTIFIER, 4, 1)
+
+    assert buffer[0] is buffer[2]
+    assert buffer[0] is not buffer[1]
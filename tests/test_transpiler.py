@@ -0,0 +1,141 @@
+from io import StringIO
+
+import pytest
+
+from pylox.lox import Lox
+from pylox.parser import Parser
+from pylox.transpiler import TranspiledProgram, TranspilingInterpreter
+
+
+def run(program: str, engine: str) -> Lox:
+    lox = Lox(out=StringIO(), err=StringIO(), engine=engine)
+    lox.run(program)
+    return lox
+
+
+def transpile(lox: Lox, source: str) -> TranspiledProgram:
+    statements = Parser(lox, lox.scan(source)).parse()
+    lox.resolve(statements)
+    return lox.interpreter.transpile(statements)
+
+
+def test_lox_uses_transpiling_interpreter():
+    lox = Lox(engine="python")
+
+    assert isinstance(lox.interpreter, TranspilingInterpreter)
+
+
+def test_transpiles_to_python_source():
+    lox = Lox(out=StringIO(), err=StringIO(), engine="python")
+
+    program = transpile(lox, "fun add(a, b) { return a + b; } print add(1, 2);")
+
+    assert "def _fn0_add(env):" in program.source
+    assert "def _main(env):" in program.source
+
+
+@pytest.mark.filterwarnings("error::SyntaxWarning")
+def test_literal_conditions_compile_cleanly():
+    source = (
+        "if (1) print 1;\n"
+        "if ((false)) print 2; else print 3;\n"
+        'print !1; print !("s");\n'
+        "fun f() { var i = 0; while (1) { i = i + 1; if (i > 2) return i; } }\n"
+        "print f();\n"
+    )
+
+    lox = run(source, "python")
+
+    assert lox.out.getvalue() == "1\n3\nfalse\nfalse\n3\n"
+
+
+def test_program_can_be_cached_and_reused():
+    lox = Lox(out=StringIO(), err=StringIO(), engine="python")
+    data = transpile(lox, 'var a = "cached"; print a;').dumps()
+
+    for _ in range(2):
+        other = Lox(out=StringIO(), err=StringIO(), engine="python")
+        TranspiledProgram.loads(data).run(other.interpreter)
+        assert other.out.getvalue() == "cached\n"
+
+
+def test_loads_rejects_other_data():
+    with pytest.raises(ValueError):
+        TranspiledProgram.loads(b"not a program")
+
+
+def test_runtime_error_reports_lox_line():
+    lox = run("var a = 1;\nvar b = 0;\n\nprint a\n  / b;", "python")
+
+    assert lox.err.getvalue() == "Divison by zero\n[line 5]\n"
+
+
+@pytest.mark.parametrize(
+    "program",
+    [
+        "print 1 / 0;",
+        'print 1 < "a";',
+        'print "a" + 1;',
+        "print undefined;",
+        "undefined = 1;",
+        "var a = 1; a();",
+        "fun f(a){} f(1, 2);",
+        "fun f(a, b){ print b; } f(1);",
+        "fun f(n){ if (n > 2) return n; print n; return f(n + 1); } print f(0);",
+        "var i = 0; while (true) { i = i + 1; if (i > 3) print 1 / (i - i); }",
+        "print clock;",
+        "fun f(){} print f;",
+        "print !true == !false and 1 or 2;",
+        "fun f(){ print 1; return 2; } print f() < f() or f();",
+        "var a = 1; { var b = a = 2; print b; } print a;",
+        "for (var i = 0; i < 3; i = i + 1) { if (i == 1) {} else print i; }",
+    ],
+)
+def test_matches_tree_interpreter(program: str):
+    tree = run(program, "tree")
+    python = run(program, "python")
+
+    assert python.out.getvalue() == tree.out.getvalue()
+    assert python.err.getvalue() == tree.err.getvalue()
+    assert python.had_runtime_error == tree.had_runtime_error
+
+
+HUGE = "1" + "0" * 400 + ".0"
+
+
+@pytest.mark.parametrize("engine", ["tree", "closure", "vm", "python"])
+@pytest.mark.parametrize("optimize", [False, True])
+def test_non_finite_literals(engine: str, optimize: bool):
+    lox = Lox(out=StringIO(), err=StringIO(), engine=engine, optimize=optimize)
+
+    lox.run(f"print {HUGE}; print -{HUGE}; print {HUGE} - {HUGE};")
+
+    assert lox.err.getvalue() == ""
+    assert lox.out.getvalue() == "inf\n-inf\nnan\n"
+
+
+def nested(depth: int, opening: str) -> str:
+    return (
+        "var n = 0;\n"
+        + "".join(f"{opening} {{\n" for _ in range(depth))
+        + "n = n + 1;\n"
+        + "}\n" * depth
+        + "print n;"
+    )
+
+
+@pytest.mark.filterwarnings("error")
+@pytest.mark.parametrize(
+    "source",
+    [
+        nested(25, "for (var i = 0; i < 1; i = i + 1)"),
+        nested(120, "if (true)"),
+        "fun f() {\n" + nested(25, "while (n < 1)") + "\n}\nf();",
+    ],
+)
+def test_nested_deeper_than_python_allows(source: str):
+    tree = run(source, "tree")
+    python = run(source, "python")
+
+    assert python.err.getvalue() == ""
+    assert python.out.getvalue() == tree.out.getvalue() == "1\n"
@@ -0,0 +1,98 @@
+from io import StringIO
+
+import pytest
+
+from pylox.bytecode import OpCode
+from pylox.lox import Lox
+from pylox.parser import Parser
+from pylox.vm import VMInterpreter
+
+
+def run(program: str, engine: str) -> Lox:
+    lox = Lox(out=StringIO(), err=StringIO(), engine=engine)
+    lox.run(program)
+    return lox
+
+
+def test_lox_uses_vm_interpreter():
+    lox = Lox(engine="vm")
+
+    assert isinstance(lox.interpreter, VMInterpreter)
+
+
+def test_compiles_to_bytecode():
+    lox = Lox(out=StringIO(), err=StringIO(), engine="vm")
+    statements = Parser(lox, lox.scan("print 1 + 2;")).parse()
+    lox.resolve(statements)
+
+    chunk = lox.interpreter.compiler.compile(statements)
+
+    assert [OpCode(op) for op in chunk.code] == [
+        OpCode.CONSTANT,
+        0,
+        OpCode.CONSTANT,
+        1,
+        OpCode.ADD,
+        2,
+        OpCode.PRINT,
+        OpCode.NIL,
+        OpCode.RETURN,
+    ]
+
+
+def test_disassemble_to():
+    lox = Lox(out=StringIO(), err=StringIO(), engine="vm")
+    lox.interpreter.disassemble_to = StringIO()
+
+    lox.run("fun f(a) { return a; } print f(1);")
+
+    listing = lox.interpreter.disassemble_to.getvalue()
+    assert "== script ==" in listing
+    assert "== f ==" in listing
+    assert lox.out.getvalue() == "1\n"
+
+
+def test_stack_overflow_is_runtime_error():
+    lox = run("fun f() { f(); } f();", "vm")
+
+    assert lox.had_runtime_error
+    assert lox.err.getvalue() == "Stack overflow.\n[line 1]\n"
+
+
+def test_max_depth_is_configurable():
+    program = "fun f(n) {\n if (n == 0) return 0;\n return 1 + f(n - 1);\n}\n"
+    lox = Lox(out=StringIO(), err=StringIO(), engine="vm")
+    lox.interpreter.max_depth = 100_000
+
+    lox.run(program + "print f(50000);")
+    assert lox.out.getvalue() == "50000\n"
+
+    lox.run(program + "print f(100000);")
+    assert lox.err.getvalue() == "Stack overflow.\n[line 3]\n"
+
+
+@pytest.mark.parametrize(
+    "program",
+    [
+        "print 1 / 0;",
+        'print 1 < "a";',
+        'print "a" + 1;',
+        "print undefined;",
+        "undefined = 1;",
+        "var a = 1; a();",
+        "fun f(a){} f(1, 2);",
+        "fun f(a, b){ print b; } f(1);",
+        "fun f(n){ if (n > 2) return n; print n; return f(n + 1); } print f(0);",
+        "var i = 0; while (true) { i = i + 1; if (i > 3) print 1 / (i - i); }",
+        "print clock;",
+        "fun f(){} print f;",
+        "print !true == !false and 1 or 2;",
+    ],
+)
+def test_matches_tree_interpreter(program: str):
+    tree = run(program, "tree")
+    vm = run(program, "vm")
+
+    assert vm.out.getvalue() == tree.out.getvalue()
+    assert vm.err.getvalue() == tree.err.getvalue()
+    assert vm.had_runtime_error == tree.had_runtime_error